@@ -0,0 +1,118 @@
+import time
+import asyncio
+from collections import deque
+from telegram import Bot
+from telegram.constants import MessageLimit
+from telegram.error import RetryAfter, TelegramError
+from config import LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL, LOG_MESSAGES_PER_FLUSH
+
+SEPARATOR = "\n"
+
+
+# Очередь логов для LOG_CHANNEL_ID. Обработчики только кладут запись в
+# очередь и не ждут сеть; фоновая задача склеивает записи в сообщения
+# до 4096 символов и отправляет их по таймеру. При переполнении
+# выбрасываются самые старые записи, так что недоступность канала
+# не замедляет и не ломает обработчики.
+class ActionLogQueue:
+    def __init__(self, chat_id: int, max_size: int = LOG_QUEUE_SIZE,
+                 flush_interval: float = LOG_FLUSH_INTERVAL,
+                 messages_per_flush: int = LOG_MESSAGES_PER_FLUSH):
+        self.chat_id = chat_id
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.messages_per_flush = messages_per_flush
+        self._queue = deque()
+        self._bot = None
+        self._task = None
+        self._stopping = False
+        self._paused_until = 0.0
+
+        # Счётчики
+        self.enqueued = 0
+        self.dropped = 0
+        self.sent_messages = 0
+        self.send_errors = 0
+        self._dropped_reported = 0
+
+    def put(self, text: str):
+        self._queue.append(text)
+        self.enqueued += 1
+        self._trim()
+
+    def _trim(self):
+        while len(self._queue) > self.max_size:
+            self._queue.popleft()
+            self.dropped += 1
+
+    def start(self, bot: Bot):
+        self._bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Последняя попытка отправить то, что осталось
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # Склеивает записи из начала очереди в одно сообщение
+    def _pack(self, header: str) -> list:
+        entries = [header] if header else []
+        length = len(header)
+
+        while self._queue:
+            text = self._queue[0]
+            if len(text) > MessageLimit.MAX_TEXT_LENGTH:
+                text = text[:MessageLimit.MAX_TEXT_LENGTH - 1] + "…"
+            extra = len(text) + (len(SEPARATOR) if entries else 0)
+            if entries and length + extra > MessageLimit.MAX_TEXT_LENGTH:
+                break
+            self._queue.popleft()
+            entries.append(text)
+            length += extra
+        return entries
+
+    async def flush(self):
+        if self._bot is None or time.monotonic() < self._paused_until:
+            return
+
+        for _ in range(self.messages_per_flush):
+            if not self._queue:
+                return
+
+            # Сообщаем в канал, сколько записей было выброшено при переполнении
+            dropped = self.dropped - self._dropped_reported
+            header = f"⚠️ Пропущено записей лога: {dropped}" if dropped else ""
+            entries = self._pack(header)
+            try:
+                await self._bot.send_message(chat_id=self.chat_id, text=SEPARATOR.join(entries))
+                self.sent_messages += 1
+                self._dropped_reported += dropped
+            except asyncio.CancelledError:
+                self._requeue(entries, header)
+                raise
+            except TelegramError as e:
+                self.send_errors += 1
+                print(f"Ошибка при отправке лога: {e}")
+                if isinstance(e, RetryAfter):
+                    self._paused_until = time.monotonic() + float(e.retry_after)
+                self._requeue(entries, header)
+                return
+
+    # Возвращает записи в начало очереди; лишнее отсечётся как самое старое
+    def _requeue(self, entries: list, header: str):
+        if header:
+            entries = entries[1:]
+        self._queue.extendleft(reversed(entries))
+        self._trim()
@@ -0,0 +1,219 @@
+# Сквозной бенчмарк: настоящее Application из main.build_application() против
+# локальной замены Bot API (fake_bot_api.py). Для каждого сценария в очередь
+# getUpdates кладётся пачка синтетических обновлений; задержка обработчика -
+# от выдачи обновления боту до его ответа в тот же чат.
+# Работает без сети, база создаётся во временном каталоге.
+# Запуск из корня репозитория:
+#   python benchmarks/bench_e2e.py [--updates 500] [--users 200] [--latency-ms 30]
+#                                  [--rate 0] [--scenario start check_user ...]
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI, message_update, callback_update
+
+SCENARIOS = ['start', 'check_user', 'user_list', 'suggestion', 'broadcast']
+REPLY_METHODS = ('sendMessage', 'editMessageText', 'sendDocument')
+FIRST_USER_ID = 5_000_000_000
+LISTED_USERS = 10_000
+STATUSES = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
+SUGGESTION_TEXT = (
+    "1. Желаемый статус: media\n"
+    "2. Доказательство (фото или ссылка): https://example.com/proof.jpg\n"
+    "3. Причина/Обоснование: бенчмарк\n"
+    "4. Юзернейм (если предлагаете другого пользователя): @bench_suggested"
+)
+
+
+# Сопоставляет ответы бота с обновлениями: ответ в чат закрывает самое
+# старое выданное и ещё не отвеченное обновление этого чата
+class LatencyTracker:
+    def __init__(self):
+        self.pending = {}  # chat_id -> [update_id, ...]
+        self.delivered = {}  # update_id -> время выдачи боту
+        self.latencies = []
+        self.first_delivery = None
+        self.last_reply = None
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def expect(self, chat_id: int, update_id: int):
+        self.pending.setdefault(chat_id, []).append(update_id)
+        self.expected += 1
+
+    def on_delivered(self, update: dict, timestamp: float):
+        self.delivered.setdefault(update['update_id'], timestamp)
+        if self.first_delivery is None:
+            self.first_delivery = timestamp
+
+    def on_call(self, method: str, params: dict, timestamp: float):
+        if method not in REPLY_METHODS:
+            return
+        queue = self.pending.get(int(params.get('chat_id', 0) or 0))
+        if not queue or queue[0] not in self.delivered:
+            return
+
+        update_id = queue.pop(0)
+        self.latencies.append(timestamp - self.delivered[update_id])
+        self.last_reply = timestamp
+        if len(self.latencies) == self.expected:
+            self.done.set()
+
+
+def percentile(values: list, share: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def report(name: str, tracker: LatencyTracker, extra: str = ""):
+    latencies = sorted(tracker.latencies)
+    if not latencies:
+        print(f"{name:<12} нет ответов")
+        return
+    elapsed = tracker.last_reply - tracker.first_delivery
+    print(
+        f"{name:<12} {len(latencies):>6} обн. {len(latencies) / elapsed:>8.0f} обн/с   "
+        f"p50 {percentile(latencies, 0.50) * 1000:>7.1f}   p95 {percentile(latencies, 0.95) * 1000:>7.1f}   "
+        f"p99 {percentile(latencies, 0.99) * 1000:>7.1f} мс{extra}"
+    )
+
+
+def build_updates(scenario: str, count: int, users: int, admin_id: int, rnd: random.Random) -> list:
+    user_ids = [FIRST_USER_ID + i for i in range(users)]
+    if scenario == 'start':
+        return [message_update(rnd.choice(user_ids), '/start') for _ in range(count)]
+    if scenario == 'check_user':
+        # Половина запросов - внесённые пользователи, половина - промахи с подсказками
+        return [
+            message_update(rnd.choice(user_ids), f"@bench_listed{rnd.randrange(LISTED_USERS)}"
+                           if rnd.random() < 0.5 else f"bench_lsted{rnd.randrange(LISTED_USERS)}")
+            for _ in range(count)
+        ]
+    if scenario == 'user_list':
+        pages = LISTED_USERS // 20
+        return [callback_update(rnd.choice(user_ids), f"user_list_{rnd.randint(1, pages)}") for _ in range(count)]
+    if scenario == 'suggestion':
+        updates = []
+        # Пары идут от пользователей по кругу: предложки одного пользователя
+        # подряд упираются в лимит флуда (FLOOD_LIMITS['suggestion'])
+        for i in range(count // 2):
+            user_id = user_ids[i % users]
+            updates.append(callback_update(user_id, 'suggest_user'))
+            updates.append(message_update(user_id, SUGGESTION_TEXT))
+        return updates
+    if scenario == 'broadcast':
+        return [message_update(admin_id, '/broadcast Бенчмарк рассылки')]
+    raise ValueError(scenario)
+
+
+async def run_scenario(api: FakeBotAPI, scenario: str, args, admin_id: int, rnd: random.Random):
+    tracker = LatencyTracker()
+    api.on_call = tracker.on_call
+    api.on_delivered = tracker.on_delivered
+    calls_before = api.calls
+
+    broadcast = asyncio.create_task(wait_broadcast(api, args)) if scenario == 'broadcast' else None
+    # Без --rate все обновления приходят разом; с ним - равномерно, и задержка
+    # показывает обработку без очереди, пока бот успевает
+    for update in build_updates(scenario, args.updates, args.users, admin_id, rnd):
+        chat_id = (update.get('message') or update['callback_query']['message'])['chat']['id']
+        tracker.expect(chat_id, api.push(update))
+        if args.rate:
+            await asyncio.sleep(1 / args.rate)
+
+    try:
+        await asyncio.wait_for(tracker.done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"{scenario:<12} таймаут: ответов {len(tracker.latencies)} из {tracker.expected}")
+
+    extra = await broadcast if broadcast else ""
+    report(scenario, tracker, extra)
+    print(f"{'':<12} вызовов Bot API: {api.calls - calls_before}")
+
+
+# Рассылка идёт в фоне после ответа админу; ждём, пока движок отправит
+# сообщения всем получателям
+async def wait_broadcast(api: FakeBotAPI, args) -> str:
+    recipients = range(FIRST_USER_ID, FIRST_USER_ID + args.users)
+    sent = []
+    finished = asyncio.Event()
+    reply_tracker = api.on_call
+
+    def on_call(method: str, params: dict, timestamp: float):
+        reply_tracker(method, params, timestamp)
+        if method == 'sendMessage' and int(params.get('chat_id', 0)) in recipients:
+            sent.append(timestamp)
+            if len(sent) == args.users:
+                finished.set()
+
+    started = time.perf_counter()
+    api.on_call = on_call
+    try:
+        await asyncio.wait_for(finished.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        pass
+    if not sent:
+        return f"\n{'':<12} рассылка: нет отправок"
+    elapsed = sent[-1] - started
+    return f"\n{'':<12} рассылка: {len(sent)}/{args.users} получателей за {elapsed:.1f} с ({len(sent) / elapsed:.1f} сообщ/с)"
+
+
+async def run(args):
+    api = FakeBotAPI(latency=args.latency_ms / 1000)
+    await api.start()
+
+    # main создаёт базу в текущем каталоге при импорте
+    os.chdir(tempfile.mkdtemp(prefix='bench_e2e_'))
+    import main
+    from config import ADMIN_IDS
+
+    statuses = random.Random(0)
+    await main.db.add_users([(f'bench_listed{i}', statuses.choice(STATUSES)) for i in range(LISTED_USERS)])
+    for i in range(args.users):
+        main.bot_users.touch(str(FIRST_USER_ID + i))
+    await main.bot_users.flush()
+
+    application = main.build_application('123:bench', api.base_url)
+    await application.initialize()
+    await application.post_init(application)
+    await application.updater.start_polling(poll_interval=0.0, timeout=10)
+    await application.start()
+
+    print(
+        f"Обновлений на сценарий: {args.updates}, пользователей: {args.users}, "
+        f"задержка API: {args.latency_ms} мс, поток: {f'{args.rate:g} обн/с' if args.rate else 'все сразу'}"
+    )
+    rnd = random.Random(1)
+    try:
+        for scenario in args.scenario:
+            await run_scenario(api, scenario, args, ADMIN_IDS[0], rnd)
+    finally:
+        # Тот же порядок, что в run_polling
+        await application.updater.stop()
+        await application.stop()
+        await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк бота против локального Bot API")
+    parser.add_argument('--updates', type=int, default=500, help="обновлений на сценарий")
+    parser.add_argument('--users', type=int, default=200, help="разных пользователей и получателей рассылки")
+    parser.add_argument('--latency-ms', type=float, default=30, help="задержка ответа Bot API")
+    parser.add_argument('--rate', type=float, default=0, help="обновлений в секунду (0 - все сразу)")
+    parser.add_argument('--timeout', type=float, default=120, help="предел на сценарий, с")
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
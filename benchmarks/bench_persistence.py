@@ -0,0 +1,115 @@
+# Бенчмарк SQLitePersistence против PicklePersistence из PTB на 100k активных
+# пользователей. Повторяет то, что делает Application: раз в update_interval
+# вызывает update_user_data для каждого пользователя, от которого были
+# обновления, а при остановке - flush().
+# Запуск из корня репозитория:
+#   python benchmarks/bench_persistence.py [--users 100000] [--changed 0.01]
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import PicklePersistence, PersistenceInput
+from database import Database
+from persistence import SQLitePersistence
+
+
+def user_data(rnd: random.Random) -> dict:
+    return {
+        'lang': 'ru',
+        'checks': rnd.randrange(1000),
+        'last_query': f"user{rnd.randrange(10 ** 6)}",
+        'favorites': [f"fav{rnd.randrange(1000)}" for _ in range(3)]
+    }
+
+
+# Время вызовов update_user_data (в основном это gather самого PTB) и
+# отдельно - записи на диск
+async def update_round(persistence, data: dict) -> tuple:
+    started = time.perf_counter()
+    await asyncio.gather(*(persistence.update_user_data(user_id, value) for user_id, value in data.items()))
+    updated = time.perf_counter()
+    await persistence.flush()
+    return updated - started, time.perf_counter() - updated
+
+
+def change_some(data: dict, share: float, rnd: random.Random) -> dict:
+    changed = dict(data)
+    for user_id in rnd.sample(list(data), int(len(data) * share)):
+        changed[user_id] = dict(data[user_id], checks=data[user_id]['checks'] + 1)
+    return changed
+
+
+async def bench_sqlite(data: dict, changed: dict, directory: str):
+    db = Database(os.path.join(directory, 'users.db'))
+    persistence = SQLitePersistence(db)
+    first = await update_round(persistence, data)
+    # Все пользователи затронуты, но у большинства данные не изменились
+    steady = await update_round(persistence, changed)
+    # До checkpoint часть данных лежит в -wal
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if name.startswith('users.db'))
+
+    started = time.perf_counter()
+    loaded = await SQLitePersistence(db).get_user_data()
+    load = time.perf_counter() - started
+    db.close()
+    assert loaded == changed
+    return first, steady, load, size, ""
+
+
+async def bench_pickle(data: dict, changed: dict, directory: str):
+    path = os.path.join(directory, 'persistence.pickle')
+    # on_flush=True - лучший случай: по умолчанию файл переписывается
+    # целиком на каждое изменённое значение
+    persistence = PicklePersistence(path, store_data=PersistenceInput(callback_data=False), on_flush=True)
+    await persistence.get_user_data()
+    first = await update_round(persistence, data)
+    steady = await update_round(persistence, changed)
+    size = os.path.getsize(path)
+
+    started = time.perf_counter()
+    persistence._dump_singlefile()
+    note = (
+        f"\n{'':<10} без on_flush файл переписывается на каждое изменённое значение: "
+        f"{(time.perf_counter() - started) * 1000:.0f} мс за раз"
+    )
+
+    started = time.perf_counter()
+    loaded = await PicklePersistence(path, store_data=PersistenceInput(callback_data=False)).get_user_data()
+    load = time.perf_counter() - started
+    assert loaded == changed
+    return first, steady, load, size, note
+
+
+async def run(args):
+    rnd = random.Random(0)
+    data = {5_000_000_000 + i: user_data(rnd) for i in range(args.users)}
+    changed = change_some(data, args.changed, rnd)
+    print(f"Пользователей: {args.users}, изменилось за интервал: {args.changed:.1%}")
+    print(f"{'':<10} {'первая запись':>20} {'интервал':>20} {'загрузка':>10} {'размер':>10}")
+    print(f"{'':<10} {'update_*':>10}{'flush':>10} {'update_*':>10}{'flush':>10}")
+    results = []
+    for name, bench in (('sqlite', bench_sqlite), ('pickle', bench_pickle)):
+        results.append((name, await bench(data, changed, tempfile.mkdtemp(prefix='bench_persistence_'))))
+    for name, (first, steady, load, size, note) in results:
+        print(
+            f"{name:<10} {first[0] * 1000:>7.0f} мс{first[1] * 1000:>7.0f} мс "
+            f"{steady[0] * 1000:>7.0f} мс{steady[1] * 1000:>7.0f} мс "
+            f"{load * 1000:>7.0f} мс {size / 1024 / 1024:>7.1f} МБ{note}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLitePersistence против PicklePersistence")
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--changed', type=float, default=0.01, help="доля пользователей с изменёнными данными")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
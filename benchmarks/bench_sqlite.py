@@ -0,0 +1,140 @@
+# Пропускная способность SQLite до и после миграций (user_version 0 -> актуальная).
+# "До" - схема и настройки соединения как в исходном database.py: журнал DELETE,
+# synchronous FULL, без вторичных индексов. "После" - та же база после
+# run_migrations() и с соединением, настроенным configure_connection().
+# Запуск из корня репозитория: python benchmarks/bench_sqlite.py [пользователей] [предложек]
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import (
+    MIGRATIONS,
+    run_migrations,
+    configure_connection,
+    status_rank,
+    _migration_initial_schema
+)
+
+STATUSES = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
+WRITES = 2000
+READS = 2000
+PAGE_SIZE = 20
+
+ORDER_BY_CASE = '''
+    ORDER BY CASE status
+        WHEN "admin" THEN 1
+        WHEN "verify" THEN 2
+        WHEN "garant" THEN 3
+        WHEN "media" THEN 4
+        WHEN "fame" THEN 5
+        WHEN "scam" THEN 6
+        WHEN "beach" THEN 7
+        WHEN "new" THEN 8
+        ELSE 9
+    END
+'''
+
+
+def fill(conn: sqlite3.Connection, users: int, suggestions: int, rnd: random.Random):
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT OR IGNORE INTO users (username, status) VALUES (?, ?)',
+        ((f'user{i}', rnd.choice(STATUSES)) for i in range(users))
+    )
+    conn.executemany(
+        'INSERT INTO suggestions (username, desired_status, proof, reason, suggested_by, suggested_at, status) '
+        'VALUES (?, ?, ?, ?, ?, datetime(?, "unixepoch"), ?)',
+        (
+            (f'user{i}', rnd.choice(STATUSES), 'https://example.com/proof.jpg', 'причина', 'someone',
+             1_700_000_000 + i, 'pending' if rnd.random() < 0.2 else 'approved')
+            for i in range(suggestions)
+        )
+    )
+    conn.execute('COMMIT')
+
+
+def timed(label: str, count: int, fn):
+    started = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<42} {count / elapsed:>10.0f} оп/с")
+
+
+def run(conn: sqlite3.Connection, migrated: bool, rnd: random.Random, users: int):
+    # Запись: по одной транзакции на операцию, как add_user в обработчике /add
+    def write(i):
+        status = rnd.choice(STATUSES)
+        conn.execute('INSERT OR REPLACE INTO users (username, status) VALUES (?, ?)', (f'new{i}', status))
+        conn.commit()
+
+    def lookup(i):
+        conn.execute('SELECT status FROM users WHERE username = ?', (f'user{rnd.randrange(users)}',)).fetchone()
+
+    def pending_page(i):
+        conn.execute(
+            "SELECT * FROM suggestions WHERE status = 'pending' ORDER BY suggested_at DESC LIMIT ?",
+            (PAGE_SIZE,)
+        ).fetchall()
+
+    def user_list_page(i):
+        if migrated:
+            conn.execute(
+                'SELECT status_rank, username, status FROM users WHERE (status_rank, username) > (?, ?) '
+                'ORDER BY status_rank, username LIMIT ?',
+                (status_rank(rnd.choice(STATUSES)), 'user', PAGE_SIZE)
+            ).fetchall()
+        else:
+            conn.execute(
+                f'SELECT username, status FROM users {ORDER_BY_CASE} LIMIT ? OFFSET ?',
+                (PAGE_SIZE, rnd.randrange(users))
+            ).fetchall()
+
+    timed('запись (commit на каждую операцию)', WRITES, write)
+    timed('поиск статуса по username', READS * 10, lookup)
+    timed('страница очереди предложек', READS // 10, pending_page)
+    timed('страница списка пользователей', READS // 10, user_list_page)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    suggestions = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+
+        conn = sqlite3.connect(path)
+        _migration_initial_schema(conn)
+        conn.commit()
+        conn.close()
+
+        conn = sqlite3.connect(path, isolation_level=None)
+        fill(conn, users, suggestions, random.Random(1))
+        conn.close()
+
+        print(f"Пользователей: {users}, предложек: {suggestions}")
+        print("До миграций (user_version 0):")
+        conn = sqlite3.connect(path)
+        run(conn, False, random.Random(2), users)
+        conn.close()
+
+        conn = sqlite3.connect(path, isolation_level=None)
+        started = time.perf_counter()
+        run_migrations(conn)
+        print(f"Миграции до версии {MIGRATIONS[-1][0]}: {time.perf_counter() - started:.2f} с")
+        conn.close()
+
+        print("После миграций:")
+        conn = sqlite3.connect(path)
+        configure_connection(conn)
+        run(conn, True, random.Random(2), users)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Выборка истории статусов пользователя (Database.get_status_history) при
+# миллионах записей в status_history. История наполняется через users, как
+# в работе бота: каждое изменение пишут триггеры.
+# Запуск из корня репозитория:
+#   python benchmarks/bench_status_history.py [--users 200000] [--changes 10]
+import os
+import sys
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+STATUSES = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
+
+
+async def run(args):
+    rnd = random.Random(0)
+    usernames = [f'bench_user{i}' for i in range(args.users)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'users.db'))
+        started = time.perf_counter()
+        for _ in range(args.changes):
+            await db.add_users([(username, rnd.choice(STATUSES)) for username in usernames])
+        fill_time = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+
+        lookups = [rnd.choice(usernames) for _ in range(args.lookups)]
+        latencies = []
+        for username in lookups:
+            started = time.perf_counter()
+            await db.get_status_history(username)
+            latencies.append(time.perf_counter() - started)
+        db.close()
+
+        conn = sqlite3.connect(os.path.join(tmp, 'users.db'))
+        rows = conn.execute('SELECT COUNT(*) FROM status_history').fetchone()[0]
+        conn.close()
+
+    latencies.sort()
+    print(f"Пользователей: {args.users}, записей истории: {rows}, база: {size / 1024 / 1024:.0f} МБ")
+    print(f"Наполнение: {fill_time:.1f} с ({rows / fill_time:.0f} записей/с)")
+    print(
+        f"get_status_history: p50 {latencies[len(latencies) // 2] * 1e6:.0f} мкс, "
+        f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} мкс"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="История статусов на миллионах записей")
+    parser.add_argument('--users', type=int, default=200_000)
+    parser.add_argument('--changes', type=int, default=10, help="проходов смены статусов всех пользователей")
+    parser.add_argument('--lookups', type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
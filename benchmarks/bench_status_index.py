@@ -0,0 +1,67 @@
+# Замер памяти и скорости индекса статусов (Database.status_index).
+# Запуск из корня репозитория: python benchmarks/bench_status_index.py [кол-во]
+import os
+import sys
+import time
+import random
+import string
+import sqlite3
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+STATUSES = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
+
+
+def random_username(rnd: random.Random) -> str:
+    alphabet = string.ascii_lowercase + string.digits + '_'
+    return rnd.choice(string.ascii_lowercase) + ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(4, 15)))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rnd = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE users (username TEXT PRIMARY KEY, status TEXT NOT NULL)')
+        conn.executemany(
+            'INSERT OR IGNORE INTO users VALUES (?, ?)',
+            ((random_username(rnd), rnd.choice(STATUSES)) for _ in range(count))
+        )
+        conn.commit()
+        conn.close()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        db = Database(path)
+        load_time = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Память самого индекса: словарь + строки ключей (значения интернированы)
+        index = db.status_index
+        size = sys.getsizeof(index) + sum(sys.getsizeof(key) for key in index)
+
+        keys = list(index)
+        lookups = [rnd.choice(keys) for _ in range(200_000)]
+        started = time.perf_counter()
+        for username in lookups:
+            db.lookup_status(username)
+        lookup_time = time.perf_counter() - started
+
+        db.close()
+
+    entries = len(index)
+    print(f"Записей в индексе: {entries}")
+    print(f"Загрузка при старте: {load_time * 1000:.1f} мс (пик памяти {peak / 2**20:.1f} МиБ)")
+    print(f"Память индекса: {size / 2**20:.2f} МиБ, {size / entries * 100_000 / 2**20:.2f} МиБ на 100k записей")
+    print(f"Поиск: {lookup_time / len(lookups) * 1e9:.0f} нс на запрос")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Замер индекса подсказок по похожим username (username_search.UsernameIndex):
+# время построения, память и задержка поиска на 100k и 1M имён.
+# Запуск из корня репозитория: python benchmarks/bench_username_search.py [кол-во ...]
+import os
+import sys
+import time
+import random
+import string
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from username_search import UsernameIndex
+
+STATUSES = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
+WORDS = ['user', 'crypto', 'shop', 'official', 'team', 'real', 'bot', 'admin', 'garant', 'media']
+QUERIES = 20000
+
+
+def random_username(rnd: random.Random) -> str:
+    # Часть имён с общими префиксами, чтобы корзины индекса не были одиночными
+    if rnd.random() < 0.2:
+        return rnd.choice(WORDS) + str(rnd.randrange(100_000))
+    alphabet = string.ascii_lowercase + string.digits + '_'
+    return rnd.choice(string.ascii_lowercase) + ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(4, 15)))
+
+
+def typo(username: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(username))
+    kind = rnd.randrange(5)
+    if kind == 0:
+        return username[:i] + rnd.choice(string.ascii_lowercase) + username[i + 1:]
+    if kind == 1:
+        return username[:i] + rnd.choice(string.ascii_lowercase) + username[i:]
+    if kind == 2 and len(username) > 1:
+        return username[:i] + username[i + 1:]
+    if kind == 3 and i + 1 < len(username):
+        return username[:i] + username[i + 1] + username[i] + username[i + 2:]
+    return username.replace('o', '0').replace('l', '1')
+
+
+def measure(label: str, index: UsernameIndex, queries: list):
+    timings = []
+    found = 0
+    for query in queries:
+        started = time.perf_counter()
+        found += bool(index.suggest(query))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"  {label:<28} p50 {p50:>7.1f} мкс   p99 {p99:>7.1f} мкс   с подсказкой {found / len(queries):>5.1%}")
+
+
+def run(count: int):
+    rnd = random.Random(42)
+    status_index = {}
+    while len(status_index) < count:
+        status_index[random_username(rnd)] = rnd.choice(STATUSES)
+
+    # Вместо Database - только то, что индекс берёт из неё
+    db = SimpleNamespace(
+        status_index=status_index,
+        admin_usernames={},
+        add_listener=lambda callback: None,
+        lookup_status=status_index.get
+    )
+
+    started = time.perf_counter()
+    index = UsernameIndex(db)
+    build_time = time.perf_counter() - started
+
+    # Словарь корзин, строки ключей и множества (сами username уже в status_index)
+    buckets = index._buckets
+    size = sys.getsizeof(buckets) + sum(
+        sys.getsizeof(key) + (sys.getsizeof(bucket) if isinstance(bucket, set) else 0)
+        for key, bucket in buckets.items()
+    )
+
+    usernames = list(status_index)
+    print(f"Имён: {count}")
+    print(f"  построение индекса: {build_time:.2f} с, ключей {len(buckets)}, память {size / 1024 / 1024:.1f} МиБ")
+
+    measure('опечатка (1 правка)', index, [typo(rnd.choice(usernames), rnd) for _ in range(QUERIES)])
+    measure('случайное отсутствующее', index, [random_username(rnd) + 'zz' for _ in range(QUERIES)])
+
+    # Инкрементальное обновление, как при add_user/remove_user
+    added = [f'new_user_{i}' for i in range(QUERIES)]
+    started = time.perf_counter()
+    for username in added:
+        index.add(username)
+    for username in added:
+        index.remove(username)
+    elapsed = time.perf_counter() - started
+    print(f"  добавление + удаление имени: {elapsed / QUERIES * 1e6:.1f} мкс")
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for count in counts:
+        run(count)
+
+
+if __name__ == '__main__':
+    main()
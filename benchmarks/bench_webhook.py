@@ -0,0 +1,132 @@
+# Сравнение задержки "обновление появилось у Telegram -> ответ бота" при
+# long polling и в режиме webhook под одинаковой нагрузкой. Ответы бота
+# принимает fake_bot_api.py; в режиме webhook локальный отправитель шлёт
+# обновления POST-запросами в WebhookServer, как это делает Telegram
+# (до WEBHOOK_MAX_CONNECTIONS соединений, с секретным токеном).
+# Запуск из корня репозитория:
+#   python benchmarks/bench_webhook.py [--updates 1000] [--rate 50] [--latency-ms 30]
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI
+from bench_e2e import LatencyTracker, build_updates, report, FIRST_USER_ID, LISTED_USERS, STATUSES
+
+SECRET_TOKEN = 'bench-secret'
+
+
+def chat_of(update: dict) -> int:
+    return (update.get('message') or update['callback_query']['message'])['chat']['id']
+
+
+async def run_polling(api: FakeBotAPI, application, updates: list, args) -> LatencyTracker:
+    tracker = LatencyTracker()
+    api.on_call = tracker.on_call
+    await application.updater.start_polling(poll_interval=0.0, timeout=10)
+    try:
+        for update in updates:
+            update_id = api.push(update)
+            tracker.expect(chat_of(update), update_id)
+            # Отсчёт - с момента, когда обновление появилось у Telegram
+            tracker.on_delivered(update, time.perf_counter())
+            await asyncio.sleep(1 / args.rate)
+        await wait_done(tracker, args)
+    finally:
+        await application.updater.stop()
+    return tracker
+
+
+async def run_webhook(api: FakeBotAPI, server, updates: list, args) -> LatencyTracker:
+    from config import WEBHOOK_MAX_CONNECTIONS
+    tracker = LatencyTracker()
+    api.on_call = tracker.on_call
+    url = f"http://127.0.0.1:{server.port}{server.path}"
+    limits = httpx.Limits(max_connections=WEBHOOK_MAX_CONNECTIONS)
+    semaphore = asyncio.Semaphore(WEBHOOK_MAX_CONNECTIONS)
+
+    async with httpx.AsyncClient(limits=limits) as client:
+        async def post(update: dict):
+            async with semaphore:
+                await asyncio.sleep(args.latency_ms / 1000)
+                response = await client.post(url, json=update, headers={'X-Telegram-Bot-Api-Secret-Token': SECRET_TOKEN})
+                response.raise_for_status()
+
+        posts = []
+        for update_id, update in enumerate(updates, 1_000_000):
+            update['update_id'] = update_id
+            tracker.expect(chat_of(update), update_id)
+            tracker.on_delivered(update, time.perf_counter())
+            posts.append(asyncio.create_task(post(update)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*posts)
+        await wait_done(tracker, args)
+    return tracker
+
+
+async def wait_done(tracker: LatencyTracker, args):
+    try:
+        await asyncio.wait_for(tracker.done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f"таймаут: ответов {len(tracker.latencies)} из {tracker.expected}")
+
+
+async def run(args):
+    api = FakeBotAPI(latency=args.latency_ms / 1000)
+    await api.start()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_webhook_'))
+    import main
+    from config import ADMIN_IDS
+    from webhook import WebhookServer
+
+    statuses = random.Random(0)
+    await main.db.add_users([(f'bench_listed{i}', statuses.choice(STATUSES)) for i in range(LISTED_USERS)])
+
+    application = main.build_application('123:bench', api.base_url)
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    server = WebhookServer(application, listen='127.0.0.1', port=0, secret_token=SECRET_TOKEN)
+    await server.start()
+
+    print(
+        f"Сценарий {args.scenario}: {args.updates} обновлений, {args.rate:g} обн/с, "
+        f"задержка сети {args.latency_ms} мс"
+    )
+    try:
+        rnd = random.Random(1)
+        polling = await run_polling(api, application, build_updates(args.scenario, args.updates, args.users, ADMIN_IDS[0], rnd), args)
+        report('polling', polling)
+        webhook = await run_webhook(api, server, build_updates(args.scenario, args.updates, args.users, ADMIN_IDS[0], rnd), args)
+        report('webhook', webhook)
+        print(f"{'':<12} /health: {server.health()}")
+    finally:
+        await server.stop()
+        await application.stop()
+        await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка ответа: long polling против webhook")
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=20, help="обновлений в секунду")
+    parser.add_argument('--latency-ms', type=float, default=30, help="задержка сети до Telegram")
+    parser.add_argument('--scenario', default='check_user', choices=['start', 'check_user', 'user_list'])
+    parser.add_argument('--timeout', type=float, default=120)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
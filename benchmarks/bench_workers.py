@@ -0,0 +1,105 @@
+# Масштабирование supervisor.py: пропускная способность при 1..N воркерах.
+# Фронт (ShardingWebhookServer) и замена Bot API (fake_bot_api.py) работают
+# в процессе бенчмарка, воркеры - отдельными процессами над общей базой во
+# временном каталоге. Обновления отправляются POST-запросами так же, как это
+# делает Telegram (до WEBHOOK_MAX_CONNECTIONS соединений).
+# Запуск из корня репозитория:
+#   python benchmarks/bench_workers.py [--workers 1 2 4] [--updates 2000] [--scenario check_user]
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeBotAPI
+from bench_e2e import LatencyTracker, build_updates, report, LISTED_USERS, STATUSES
+from bench_webhook import chat_of, SECRET_TOKEN
+from config import ADMIN_IDS
+
+
+async def prepare_database(directory: str):
+    from database import Database
+    db = Database(os.path.join(directory, 'users.db'))
+    statuses = random.Random(0)
+    await db.add_users([(f'bench_listed{i}', statuses.choice(STATUSES)) for i in range(LISTED_USERS)])
+    db.close()
+
+
+async def run_workers(api: FakeBotAPI, workers: int, args) -> LatencyTracker:
+    from config import WEBHOOK_MAX_CONNECTIONS
+    from supervisor import Supervisor, ShardingWebhookServer
+
+    supervisor = Supervisor(workers, '123:bench', api.base_url)
+    server = ShardingWebhookServer(supervisor, listen='127.0.0.1', port=0, secret_token=SECRET_TOKEN)
+    supervisor.start()
+    await server.start()
+    try:
+        if not await supervisor.wait_ready():
+            raise RuntimeError("воркеры не запустились")
+
+        tracker = LatencyTracker()
+        api.on_call = tracker.on_call
+        url = f"http://127.0.0.1:{server.port}{server.path}"
+        semaphore = asyncio.Semaphore(WEBHOOK_MAX_CONNECTIONS)
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=WEBHOOK_MAX_CONNECTIONS)) as client:
+            async def post(update: dict):
+                async with semaphore:
+                    tracker.on_delivered(update, time.perf_counter())
+                    response = await client.post(url, json=update, headers={'X-Telegram-Bot-Api-Secret-Token': SECRET_TOKEN})
+                    response.raise_for_status()
+
+            updates = build_updates(args.scenario, args.updates, args.users, ADMIN_IDS[0], random.Random(1))
+            for update_id, update in enumerate(updates, 1):
+                update['update_id'] = update_id
+                tracker.expect(chat_of(update), update_id)
+            await asyncio.gather(*(post(update) for update in updates))
+
+            try:
+                await asyncio.wait_for(tracker.done.wait(), args.timeout)
+            except asyncio.TimeoutError:
+                print(f"таймаут: ответов {len(tracker.latencies)} из {tracker.expected}")
+        print(f"{'':<12} по воркерам: {supervisor.dispatched}")
+        return tracker
+    finally:
+        await server.stop()
+        await supervisor.stop()
+
+
+async def run(args):
+    api = FakeBotAPI(latency=args.latency_ms / 1000)
+    await api.start()
+    directory = tempfile.mkdtemp(prefix='bench_workers_')
+    os.chdir(directory)
+    await prepare_database(directory)
+
+    print(
+        f"Сценарий {args.scenario}: {args.updates} обновлений от {args.users} пользователей, "
+        f"задержка API {args.latency_ms} мс, ядер: {os.cpu_count()}"
+    )
+    try:
+        for workers in args.workers:
+            report(f"{workers} воркер(а)", await run_workers(api, workers, args))
+    finally:
+        await api.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность supervisor.py от числа воркеров")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--scenario', default='check_user', choices=['start', 'check_user', 'user_list'])
+    parser.add_argument('--timeout', type=float, default=120)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# Локальная замена Telegram Bot API для бенчмарков. Отдаёт getUpdates из
+# синтетического потока обновлений и записывает вызовы sendMessage,
+# editMessageText, getChatMember и остальных с настраиваемой задержкой.
+# Зависимостей нет: HTTP-слой общий с webhook.py.
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook import read_request, write_response
+
+BOT_USER = {'id': 1000000001, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+MULTIPART_FIELD = re.compile(rb'name="(\w+)"\r\n\r\n([^\r]*)\r\n')
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.port = None
+        self.calls = 0
+        self.counts = {}  # метод -> число вызовов
+        self.on_call = None  # callback(method, params, timestamp)
+        self.on_delivered = None  # callback(update, timestamp)
+        self._updates = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._has_updates = asyncio.Event()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, '127.0.0.1', 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def push(self, update: dict) -> int:
+        update['update_id'] = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(update)
+        self._has_updates.set()
+        return update['update_id']
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                _, path, headers, body = request
+                method = path.rsplit('/', 1)[-1]
+                params = _parse_params(headers.get('content-type', ''), body)
+
+                result = await self._call(method, params)
+                write_response(writer, 200, json.dumps({'ok': True, 'result': result}).encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # CancelledError - остановка сервера посреди долгого getUpdates
+            pass
+        finally:
+            writer.close()
+
+    async def _call(self, method: str, params: dict):
+        if method == 'getUpdates':
+            return await self._get_updates(params)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls += 1
+        self.counts[method] = self.counts.get(method, 0) + 1
+        if self.on_call:
+            self.on_call(method, params, time.perf_counter())
+
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getChatMember':
+            user = {'id': int(params.get('user_id', 0)), 'is_bot': False, 'first_name': 'User'}
+            return {'status': 'member', 'user': user}
+        if method in ('sendMessage', 'editMessageText', 'sendDocument'):
+            return self._message(params)
+        return True
+
+    async def _get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset', 0) or 0)
+        limit = int(params.get('limit', 100) or 100)
+        timeout = float(params.get('timeout', 0) or 0)
+
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates and timeout:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+
+        batch = self._updates[:limit]
+        now = time.perf_counter()
+        if self.on_delivered:
+            for update in batch:
+                self.on_delivered(update, now)
+        # Ответ getUpdates идёт по той же сети, что и остальные
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return batch
+
+    def _message(self, params: dict) -> dict:
+        message_id = int(params.get('message_id', 0) or 0)
+        if not message_id:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        chat_id = int(params.get('chat_id', 0) or 0)
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'channel'},
+            'from': BOT_USER,
+            'text': params.get('text', '')
+        }
+
+
+def _parse_params(content_type: str, body: bytes) -> dict:
+    if content_type.startswith('multipart/form-data'):
+        return {name.decode(): value.decode('utf-8', 'replace') for name, value in MULTIPART_FIELD.findall(body)}
+    if content_type.startswith('application/json'):
+        return json.loads(body or b'{}')
+    return {name: values[0] for name, values in parse_qs(body.decode()).items()}
+
+
+# Синтетические обновления
+def user(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'username': f'bench{user_id}'}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    message = {
+        'message_id': 1,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': user(user_id),
+        'text': text
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'message': message}
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {
+        'callback_query': {
+            'id': f'{user_id}{time.perf_counter_ns()}',
+            'from': user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': 'menu'
+            }
+        }
+    }
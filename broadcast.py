@@ -0,0 +1,196 @@
+import time
+import asyncio
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from config import (
+    BROADCAST_RATE_LIMIT,
+    BROADCAST_CONCURRENCY,
+    BROADCAST_BATCH_SIZE,
+    BROADCAST_PROGRESS_INTERVAL,
+    BROADCAST_MAX_RETRIES
+)
+from database import Database
+
+# Заголовки сообщений о прогрессе для разных типов рассылки
+PROGRESS_TITLES = {
+    'broadcast': "📢 Рассылка на {total} пользователей...",
+    'maintenance': "🔧 Рассылка уведомления о техработах на {total} пользователей..."
+}
+DONE_TITLES = {
+    'broadcast': "📢 Рассылка завершена:",
+    'maintenance': "✅ Уведомление о технических работах разослано всем пользователям."
+}
+
+
+# Общий для всех рассылок token bucket. RetryAfter от Telegram
+# приостанавливает выдачу токенов для всех отправителей сразу. Корзина
+# стартует пустой, а ёмкость по умолчанию - один токен: за любую секунду
+# уходит не больше rate сообщений, без всплеска в начале рассылки.
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = 0.0
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if self.paused_until > now:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+# Результаты отправки одному получателю
+SENT, FAILED, BLOCKED = 'sent', 'failed', 'blocked'
+
+
+# Движок рассылок: ограничение скорости, ограниченная конкурентность,
+# прогресс в SQLite (после каждой пачки) и продолжение после перезапуска.
+# Итоги доставки пишутся в bot_users, и недоступные получатели в следующие
+# рассылки уже не попадают.
+class BroadcastEngine:
+    def __init__(self, db: Database):
+        self.db = db
+        self.bucket = TokenBucket(BROADCAST_RATE_LIMIT)
+        self.semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        self._tasks = set()
+        self._stopping = False
+
+    async def start_job(self, bot: Bot, kind: str, text: str, chat_id: int, message_id: int,
+                        total: int, skipped: int = 0) -> int:
+        job_id = await self.db.create_broadcast_job(kind, text, chat_id, message_id, total, skipped)
+        job = {
+            'id': job_id, 'kind': kind, 'text': text,
+            'chat_id': chat_id, 'message_id': message_id,
+            'cursor': '', 'total': total, 'sent': 0, 'failed': 0, 'blocked': 0, 'skipped': skipped
+        }
+        self._spawn(bot, job)
+        return job_id
+
+    # Продолжение рассылок, прерванных перезапуском
+    async def resume(self, bot: Bot):
+        for job in await self.db.get_unfinished_broadcast_jobs():
+            print(f"Продолжение рассылки #{job['id']} с {job['sent'] + job['failed']}/{job['total']}")
+            self._spawn(bot, job)
+
+    def _spawn(self, bot: Bot, job: dict):
+        task = asyncio.create_task(self._run_job(bot, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        # Задания доотправляют текущую пачку и сохраняют курсор
+        self._stopping = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_job(self, bot: Bot, job: dict):
+        reporter = asyncio.create_task(self._report_progress(bot, job))
+        try:
+            finished = await self._send_batches(bot, job)
+            if finished:
+                await self.db.finish_broadcast_job(job['id'])
+        except Exception as e:
+            print(f"Ошибка рассылки #{job['id']}: {e}")
+            return
+        finally:
+            reporter.cancel()
+
+        if finished:
+            await self._edit_progress(bot, job, done=True)
+
+    # Возвращает False, если рассылку прервала остановка бота
+    async def _send_batches(self, bot: Bot, job: dict) -> bool:
+        while not self._stopping:
+            recipients = await self.db.get_broadcast_recipients(job['cursor'], BROADCAST_BATCH_SIZE)
+            if not recipients:
+                return True
+
+            results = await asyncio.gather(*(
+                self._send(bot, user_id, job['text']) for user_id in recipients
+            ))
+            outcomes = {SENT: [], FAILED: [], BLOCKED: []}
+            for user_id, result in zip(recipients, results):
+                outcomes[result].append(user_id)
+            job['sent'] += len(outcomes[SENT])
+            job['failed'] += len(outcomes[FAILED]) + len(outcomes[BLOCKED])
+            job['blocked'] += len(outcomes[BLOCKED])
+            job['cursor'] = recipients[-1]
+            await self.db.record_deliveries(outcomes[SENT], outcomes[FAILED], outcomes[BLOCKED])
+            await self.db.update_broadcast_progress(
+                job['id'], job['cursor'], job['sent'], job['failed'], job['blocked']
+            )
+        return False
+
+    async def _send(self, bot: Bot, user_id: str, text: str) -> str:
+        async with self.semaphore:
+            for _ in range(BROADCAST_MAX_RETRIES + 1):
+                await self.bucket.acquire()
+                try:
+                    await bot.send_message(chat_id=user_id, text=text)
+                    return SENT
+                except RetryAfter as e:
+                    print(f"Флуд-контроль при рассылке, пауза {e.retry_after} с")
+                    self.bucket.pause(float(e.retry_after))
+                except Forbidden:
+                    # Пользователь заблокировал бота или удалил аккаунт
+                    return BLOCKED
+                except TelegramError as e:
+                    print(f"Ошибка рассылки: {e}")
+                    return FAILED
+            return FAILED
+
+    async def _report_progress(self, bot: Bot, job: dict):
+        last_processed = None
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            processed = job['sent'] + job['failed']
+            if processed != last_processed:
+                last_processed = processed
+                await self._edit_progress(bot, job)
+
+    async def _edit_progress(self, bot: Bot, job: dict, done: bool = False):
+        if not job['chat_id'] or not job['message_id']:
+            return
+
+        total = job['total']
+        if done:
+            processed = job['sent'] + job['failed']
+            wasted = int(job['failed'] / processed * 100) if processed else 0
+            text = (
+                f"{DONE_TITLES[job['kind']]}\n"
+                f"👤 Всего пользователей: {total}\n"
+                f"✅ Успешно: {job['sent']}\n"
+                f"❌ Неудачно: {job['failed']} (заблокировали бота: {job['blocked']})\n"
+                f"🗑 Впустую: {wasted}% отправок\n"
+                f"💤 Пропущено недоступных: {job['skipped']}"
+            )
+        else:
+            processed = job['sent'] + job['failed']
+            percent = min(100, int(processed / total * 100)) if total else 100
+            progress = "🟢" * (percent // 10) + "⚪" * (10 - percent // 10)
+            text = (
+                f"{PROGRESS_TITLES[job['kind']].format(total=total)}\n"
+                f"🔄 Отправлено: {processed}/{total} ({percent}%)\n"
+                f"{progress}\n"
+                f"✅ Успешно: {job['sent']} | ❌ Ошибок: {job['failed']}"
+            )
+
+        try:
+            await bot.edit_message_text(chat_id=job['chat_id'], message_id=job['message_id'], text=text)
+        except TelegramError as e:
+            print(f"Ошибка обновления прогресса рассылки: {e}")
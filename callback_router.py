@@ -0,0 +1,70 @@
+from typing import Awaitable, Callable, Optional
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import ADMIN_IDS
+
+ACCESS_DENIED = "❌ У вас нет прав для выполнения этой команды."
+
+
+# Ответ на callback query: Telegram ждёт ровно один answerCallbackQuery на
+# нажатие. Обработчик может ответить сам (с текстом или заранее, перед долгой
+# работой), иначе роутер ответит пустым ответом после обработчика.
+class CallbackAnswer:
+    def __init__(self, query):
+        self.query = query
+        self.answered = False
+
+    async def __call__(self, text: Optional[str] = None, show_alert: bool = False):
+        if self.answered:
+            return
+        self.answered = True
+        await self.query.answer(text, show_alert=show_alert)
+
+
+# Таблица маршрутов callback_data -> обработчик(update, context, answer).
+# Маршрут задаётся точным значением или префиксом; для каждого объявляется,
+# нужен ли администратор и нужна ли проверка guard (подписка на каналы).
+# Возвращает результат обработчика, поэтому годится как entry point
+# ConversationHandler.
+class CallbackRouter:
+    def __init__(self, guard: Optional[Callable[..., Awaitable[bool]]] = None):
+        self.guard = guard
+        self._exact = {}  # callback_data -> (обработчик, admin, guarded)
+        self._prefixes = []  # (префикс, обработчик, admin, guarded)
+
+    def route(self, data: str, handler: Callable, admin: bool = False, guarded: bool = True, prefix: bool = False):
+        if prefix:
+            self._prefixes.append((data, handler, admin, guarded))
+        else:
+            self._exact[data] = (handler, admin, guarded)
+
+    def resolve(self, data: str) -> Optional[tuple]:
+        route = self._exact.get(data)
+        if route is not None:
+            return route
+        for prefix, handler, admin, guarded in self._prefixes:
+            if data.startswith(prefix):
+                return handler, admin, guarded
+        return None
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        answer = CallbackAnswer(query)
+        try:
+            route = self.resolve(query.data or '')
+            if route is None:
+                return None
+            handler, admin, guarded = route
+
+            if admin and update.effective_user.id not in ADMIN_IDS:
+                await answer(ACCESS_DENIED, show_alert=True)
+                return None
+            if guarded and self.guard and not await self.guard(update, context, answer):
+                return None
+            return await handler(update, context, answer)
+        finally:
+            if not answer.answered:
+                try:
+                    await answer()
+                except Exception as e:
+                    print(f"Ошибка ответа на callback query: {e}")
@@ -1,4 +1,20 @@
 BOT_TOKEN = "7588644534:AAHLlv677blhTwvn_owqJMgzCtOf8jZE2PY"  # Замените на реальный токен бота
+
+# Режим получения обновлений: если WEBHOOK_URL пуст - long polling (run_polling),
+# иначе бот поднимает свой HTTP-сервер и регистрирует webhook на этот адрес
+WEBHOOK_URL = ''                    # внешний https-адрес, например 'https://bot.example.com'
+WEBHOOK_LISTEN = '0.0.0.0'
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = '/telegram'
+WEBHOOK_SECRET_TOKEN = ''           # сверяется с заголовком X-Telegram-Bot-Api-Secret-Token; пусто - случайный при запуске
+WEBHOOK_MAX_CONNECTIONS = 40
+HEALTH_PATH = '/health'
+
+# Метрики в формате Prometheus
+METRICS_LISTEN = '127.0.0.1'     # только локально; снаружи - через обратный прокси или агент
+METRICS_PORT = 9464              # 0 - не запускать
+METRICS_PATH = '/metrics'
+
 ADMIN_IDS = [770395684, 7916096765]  # Замените на реальные ID администраторов
 
 ADMIN_USERNAMES = {
@@ -6,14 +22,69 @@ ADMIN_USERNAMES = {
     '770395684': 'godkivalovskiy'
 }
 DATABASE_FILE = 'users.db'
+DATABASE_READ_THREADS = 4  # Потоки для чтения из SQLite
+
+# Настройки соединений SQLite (база работает в режиме WAL)
+SQLITE_SYNCHRONOUS = 'NORMAL'       # в WAL не теряет целостность, fsync только на checkpoint
+SQLITE_CACHE_SIZE_KB = 16384        # кэш страниц на соединение
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Отложенная запись пользователей бота
+BOT_USERS_FLUSH_INTERVAL_MS = 2000
+BOT_USERS_FLUSH_SIZE = 500
+
+# Журнал изменений users/blocked_users для других процессов (supervisor.py)
+# и ручных правок базы
+CHANGELOG_POLL_INTERVAL = 1        # секунд между проверками
+CHANGELOG_RETENTION = 100000       # записей журнала, которые не удаляются
+CHANGELOG_PRUNE_INTERVAL = 3600    # секунд между очистками журнала
+
+# Сохранение состояния разговоров и user_data/chat_data в базе
+PERSISTENCE_UPDATE_INTERVAL = 10  # секунд между записями изменений
+
+# Параллельная обработка обновлений
+UPDATE_CONCURRENCY = 32        # обновлений разных пользователей одновременно
+UPDATE_MAX_PENDING = 1024      # принятых обновлений, включая ждущих своей очереди у пользователя
+ADMIN_JOB_CONCURRENCY = 1      # долгих админских действий (импорт, выгрузка, статистика) одновременно
+WORKERS = 4                    # процессов-обработчиков в режиме supervisor.py
+WORKER_RESTART_DELAY = 1       # секунд до перезапуска упавшего воркера
+
+# Ограничение флуда: (ёмкость корзины, токенов в секунду) на пользователя
+FLOOD_LIMITS = {
+    'lookup': (10, 0.5),          # проверки юзернеймов текстом
+    'navigation': (20, 2.0),      # кнопки и команды
+    'suggestion': (5, 1 / 30)     # начало и отправка предложки
+}
+FLOOD_TRACKED_BUCKETS = 50000     # корзин в памяти, старые вытесняются
+
+# Заблокированные пользователи и режим техработ (проверяются до обработчиков)
+GATEKEEPER_NOTICE_INTERVAL = 60   # секунд между ответами одному пользователю
+GATEKEEPER_TRACKED_USERS = 50000  # пользователей, которым недавно ответили
+
+# Рассылки
+BROADCAST_RATE_LIMIT = 25         # сообщений в секунду на всех (лимит Telegram ~30)
+BROADCAST_CONCURRENCY = 10        # одновременных запросов send_message
+BROADCAST_BATCH_SIZE = 100        # получателей между сохранениями прогресса
+BROADCAST_PROGRESS_INTERVAL = 5   # секунд между обновлениями сообщения с прогрессом
+BROADCAST_MAX_RETRIES = 3         # повторов после RetryAfter
+BROADCAST_MAX_DELIVERY_FAILURES = 3  # неудач подряд, после которых получатель пропускается
 
 SUGGESTION_CHANNEL_ID = -1002288664747  # Замените на реальный ID канала для предложек
 LOG_CHANNEL_ID = -1002416925696         # Замените на реальный ID канала для логов
+LOG_QUEUE_SIZE = 1000        # записей лога в очереди, при переполнении теряются самые старые
+LOG_FLUSH_INTERVAL = 3       # секунд между отправками в канал логов
+LOG_MESSAGES_PER_FLUSH = 3   # сообщений в канал за одну отправку
 
 CHANNEL_IDS = {
     "hatakibalova": -1002528108618  # Оставлен только один канал
 }
 
+# Кэш проверки подписки (секунды)
+SUBSCRIPTION_CACHE_TTL = 600          # пользователь подписан
+SUBSCRIPTION_CACHE_NEGATIVE_TTL = 30  # пользователь не подписан
+SUBSCRIPTION_CACHE_SIZE = 50000
+
 STATUS_EMOJIS = {
     'admin': '👑',
     'verify': '✅',
@@ -26,6 +97,47 @@ STATUS_EMOJIS = {
     'pdf': '🔞'
 }
 
+# Порядок статусов в списке пользователей
+STATUS_RANKS = {
+    'admin': 1,
+    'verify': 2,
+    'garant': 3,
+    'media': 4,
+    'fame': 5,
+    'scam': 6,
+    'beach': 7,
+    'new': 8
+}
+DEFAULT_STATUS_RANK = 9
+
+# Список пользователей
+USER_LIST_PAGE_SIZE = 20
+USER_LIST_CACHE_SIZE = 200     # отрисованных страниц в кэше
+USER_LIST_BOUNDARIES = 10000   # запомненных границ страниц для keyset-переходов
+
+# Очередь предложек в админ-панели
+REVIEW_PAGE_SIZE = 5          # предложек на странице; id всех попадают в callback_data (до 64 байт)
+
+# Импорт и выгрузка списка пользователей
+USERS_IMPORT_CHUNK = 1000       # строк на одну транзакцию
+USERS_IMPORT_PROGRESS_INTERVAL = 3  # секунд между обновлениями прогресса
+USERS_IMPORT_MAX_ERRORS = 20    # ошибок в итоговом отчёте
+USERS_EXPORT_CHUNK = 5000       # строк на один запрос при выгрузке
+USERS_EXPORT_SPOOL_SIZE = 8 * 1024 * 1024  # выгрузка больше этого уходит во временный файл
+
+# Подсказки "возможно, вы имели в виду" при проверке пользователя
+USERNAME_SUGGESTIONS = 3
+
+# Последних изменений статуса в карточке проверки и профиле
+STATUS_HISTORY_LIMIT = 10
+
+# Инлайн-режим (@bot username)
+INLINE_RESULTS = 10
+INLINE_CACHE_SIZE = 5000       # запросов в кэше результатов
+INLINE_CACHE_TTL = 300         # секунд жизни результата в кэше бота
+INLINE_CACHE_TIME = 60         # cache_time для кэша на стороне Telegram
+INLINE_DEBOUNCE = 0.4          # секунд ожидания следующего нажатия перед запросом к базе
+
 STATUS_NAMES = {
     'admin': 'Администратор',
     'verify': 'Проверенный',
@@ -1,166 +1,1107 @@
+import os
+import sys
+import time
 import sqlite3
-from config import DATABASE_FILE, ADMIN_IDS, ADMIN_USERNAMES
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.request import pathname2url
+from config import DATABASE_FILE, DATABASE_READ_THREADS, ADMIN_USERNAMES, STATUS_RANKS, DEFAULT_STATUS_RANK, STATUS_EMOJIS
+from config import BOT_USERS_FLUSH_INTERVAL_MS, BOT_USERS_FLUSH_SIZE, STATUS_HISTORY_LIMIT
+from config import CHANGELOG_POLL_INTERVAL, CHANGELOG_PRUNE_INTERVAL, CHANGELOG_RETENTION
+from config import BROADCAST_MAX_DELIVERY_FAILURES
+from config import SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT_MS
+from metrics import DB_QUERY_LATENCY, DB_QUERY_ERRORS
 
-class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect(DATABASE_FILE)
-        self.cursor = self.conn.cursor()
-        self._create_tables()
-
-    def _create_tables(self):
-        # Таблица пользователей
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                status TEXT NOT NULL
-            )
-        ''')
-        
-        # Таблица предложений
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS suggestions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL,
-                desired_status TEXT NOT NULL,
-                proof TEXT NOT NULL,
-                reason TEXT NOT NULL,
-                suggested_by TEXT NOT NULL,
-                suggested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'pending'
-            )
-        ''')
-        
-        # Таблица заблокированных пользователей
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS blocked_users (
-                user_id TEXT PRIMARY KEY
-            )
+
+# Должно совпадать с выражением столбца users.status_rank (см.
+# _migration_status_rank_generated): по нему считаются границы страниц
+def status_rank(status: str) -> int:
+    return STATUS_RANKS.get(status, DEFAULT_STATUS_RANK)
+
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+# Миграции схемы. Текущая версия хранится в PRAGMA user_version; каждая
+# миграция выполняется один раз, в своей транзакции вместе с новым номером
+# версии. Существующий users.db (версия 0) доводится до актуальной схемы
+# на месте, поэтому миграции не должны падать на уже созданных объектах.
+
+def _migration_initial_schema(conn: sqlite3.Connection):
+    # Таблица пользователей
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            status TEXT NOT NULL
+        )
+    ''')
+
+    # Таблица предложений
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS suggestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            desired_status TEXT NOT NULL,
+            proof TEXT NOT NULL,
+            reason TEXT NOT NULL,
+            suggested_by TEXT NOT NULL,
+            suggested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'pending'
+        )
+    ''')
+
+    # Таблица заблокированных пользователей
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blocked_users (
+            user_id TEXT PRIMARY KEY
+        )
+    ''')
+
+    # Таблица пользователей бота
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bot_users (
+            user_id TEXT PRIMARY KEY
+        )
+    ''')
+
+def _migration_bot_users_seen(conn: sqlite3.Connection):
+    _ensure_column(conn, 'bot_users', 'first_seen', 'TIMESTAMP')
+    _ensure_column(conn, 'bot_users', 'last_seen', 'TIMESTAMP')
+
+def _migration_users_status_rank(conn: sqlite3.Connection):
+    _ensure_column(conn, 'users', 'status_rank', 'INTEGER')
+    for status, rank in STATUS_RANKS.items():
+        conn.execute(
+            'UPDATE users SET status_rank = ? WHERE status_rank IS NULL AND status = ?',
+            (rank, status)
+        )
+    conn.execute(
+        'UPDATE users SET status_rank = ? WHERE status_rank IS NULL',
+        (DEFAULT_STATUS_RANK,)
+    )
+    # Порядок списка пользователей: по рангу статуса, затем по username
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_users_rank_username ON users (status_rank, username)'
+    )
+
+def _migration_broadcast_jobs(conn: sqlite3.Connection):
+    # Задания рассылки; cursor - последний обработанный user_id
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            text TEXT NOT NULL,
+            chat_id INTEGER,
+            message_id INTEGER,
+            cursor TEXT NOT NULL DEFAULT '',
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'running',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+def _migration_suggestions_queue_index(conn: sqlite3.Connection):
+    # Очередь предложек: WHERE status = ? ORDER BY suggested_at
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_suggestions_status_suggested_at '
+        'ON suggestions (status, suggested_at)'
+    )
+
+def _migration_wal(conn: sqlite3.Connection):
+    # Режим журнала сохраняется в самом файле базы
+    conn.execute('PRAGMA journal_mode = WAL')
+
+def _migration_persistence(conn: sqlite3.Connection):
+    # Данные PTB: kind - 'user', 'chat' или 'bot', data - pickle словаря
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS persistence_data (
+            kind TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (kind, id)
+        ) WITHOUT ROWID
+    ''')
+    # Состояния ConversationHandler; key - JSON-список ключа разговора
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state BLOB NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_changelog(conn: sqlite3.Connection):
+    # Журнал изменений users и blocked_users для других процессов. Пишется
+    # триггерами - в той же транзакции, что и само изменение, в том числе
+    # при ручной правке базы. AUTOINCREMENT: seq не переиспользуется после
+    # очистки старых записей.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tbl TEXT NOT NULL,
+            key TEXT NOT NULL
+        )
+    ''')
+    _create_changelog_triggers(conn, 'users', 'username')
+    _create_changelog_triggers(conn, 'blocked_users', 'user_id')
+
+def _create_changelog_triggers(conn: sqlite3.Connection, table: str, column: str):
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS changelog_{table}_insert AFTER INSERT ON {table}
+        BEGIN INSERT INTO changelog (tbl, key) VALUES ('{table}', NEW.{column}); END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS changelog_{table}_delete AFTER DELETE ON {table}
+        BEGIN INSERT INTO changelog (tbl, key) VALUES ('{table}', OLD.{column}); END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS changelog_{table}_update AFTER UPDATE ON {table}
+        BEGIN
+            INSERT INTO changelog (tbl, key) VALUES ('{table}', NEW.{column});
+            INSERT INTO changelog (tbl, key) SELECT '{table}', OLD.{column} WHERE OLD.{column} IS NOT NEW.{column};
+        END
+    ''')
+
+# Последний код статуса пользователя в истории (-1, если истории нет)
+_LATEST_STATUS_CODE = (
+    "COALESCE((SELECT code FROM status_history WHERE username = NEW.username "
+    "ORDER BY changed_at DESC, id DESC LIMIT 1), -1)"
+)
+_NEW_STATUS_CODE = "(SELECT code FROM status_codes WHERE status = NEW.status)"
+_NOW = "CAST(strftime('%s', 'now') AS INTEGER)"
+
+def _migration_status_history(conn: sqlite3.Connection):
+    # История статусов только дополняется. Статус хранится кодом из
+    # status_codes, код 0 - пользователь удалён из базы, changed_at - unix
+    # time (0 - статус был до появления истории). Пишется триггерами в той
+    # же транзакции, что и изменение users; INSERT OR REPLACE с тем же
+    # статусом новой записи не даёт. В триггерах нет конфликтов ключей:
+    # иначе к ним применился бы OR REPLACE внешнего запроса.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS status_codes (
+            code INTEGER PRIMARY KEY,
+            status TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS status_history (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            code INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL
+        )
+    ''')
+    conn.executemany(
+        'INSERT OR IGNORE INTO status_codes (code, status) VALUES (?, ?)',
+        list(enumerate(STATUS_EMOJIS, 1))
+    )
+    conn.execute('INSERT OR IGNORE INTO status_codes (status) SELECT DISTINCT status FROM users')
+
+    # Текущие статусы - первые записи истории; индекс строится после них
+    if conn.execute('SELECT 1 FROM status_history LIMIT 1').fetchone() is None:
+        conn.execute('''
+            INSERT INTO status_history (username, code, changed_at)
+            SELECT users.username, status_codes.code, 0
+            FROM users JOIN status_codes ON status_codes.status = users.status
         ''')
-        
-        # Таблица пользователей бота
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS bot_users (
-                user_id TEXT PRIMARY KEY
-            )
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_status_history_username_changed_at '
+        'ON status_history (username, changed_at)'
+    )
+
+    for event in ('INSERT', 'UPDATE OF username, status'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS status_history_{event.split()[0].lower()} AFTER {event} ON users
+            WHEN {_LATEST_STATUS_CODE} IS NOT {_NEW_STATUS_CODE}
+            BEGIN
+                INSERT INTO status_codes (status)
+                SELECT NEW.status WHERE NOT EXISTS (SELECT 1 FROM status_codes WHERE status = NEW.status);
+                INSERT INTO status_history (username, code, changed_at)
+                VALUES (NEW.username, {_NEW_STATUS_CODE}, {_NOW});
+            END
         ''')
-        
-        self.conn.commit()
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS status_history_rename AFTER UPDATE OF username ON users
+        WHEN OLD.username IS NOT NEW.username
+        BEGIN INSERT INTO status_history (username, code, changed_at) VALUES (OLD.username, 0, {_NOW}); END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS status_history_delete AFTER DELETE ON users
+        BEGIN INSERT INTO status_history (username, code, changed_at) VALUES (OLD.username, 0, {_NOW}); END
+    ''')
+
+def _migration_bot_users_delivery(conn: sqlite3.Connection):
+    # Состояние доставки: последняя успешная отправка, неудачи подряд и
+    # флаг "пользователь заблокировал бота" (Forbidden или my_chat_member).
+    # Рассылки идут по частичному индексу - заблокировавшие бота в него не
+    # попадают вовсе.
+    _ensure_column(conn, 'bot_users', 'last_delivered', 'TIMESTAMP')
+    _ensure_column(conn, 'bot_users', 'delivery_failures', 'INTEGER NOT NULL DEFAULT 0')
+    _ensure_column(conn, 'bot_users', 'blocked_bot', 'INTEGER NOT NULL DEFAULT 0')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_bot_users_reachable ON bot_users (user_id) WHERE blocked_bot = 0'
+    )
+    # Пропущенные недоступные получатели и отправки, упавшие на Forbidden
+    _ensure_column(conn, 'broadcast_jobs', 'skipped', 'INTEGER NOT NULL DEFAULT 0')
+    _ensure_column(conn, 'broadcast_jobs', 'blocked', 'INTEGER NOT NULL DEFAULT 0')
+
+def _migration_settings(conn: sqlite3.Connection):
+    # Настройки бота, которые меняются из админ-панели (режим техработ).
+    # Другие процессы узнают об изменениях из журнала changelog.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    _create_changelog_triggers(conn, 'settings', 'key')
+
+def _migration_status_rank_generated(conn: sqlite3.Connection):
+    # status_rank вычисляется самой базой из status, так что его получает
+    # любая запись в users, в том числе ручная или из другого процесса.
+    # Обычный столбец меняется на генерируемый: индекс по нему пересоздаётся.
+    ranks = ' '.join(f"WHEN '{status}' THEN {rank}" for status, rank in STATUS_RANKS.items())
+    conn.execute('DROP INDEX IF EXISTS idx_users_rank_username')
+    conn.execute('ALTER TABLE users DROP COLUMN status_rank')
+    conn.execute(
+        f'ALTER TABLE users ADD COLUMN status_rank INTEGER '
+        f'GENERATED ALWAYS AS (CASE status {ranks} ELSE {DEFAULT_STATUS_RANK} END) VIRTUAL'
+    )
+    conn.execute('CREATE INDEX idx_users_rank_username ON users (status_rank, username)')
+
+def _migration_counters(conn: sqlite3.Connection):
+    # Счётчики, которые ведут триггеры: чтение - одна строка по ключу, и
+    # значение общее для всех процессов. Upsert в bot_users при повторном
+    # /start вызывает UPDATE-триггеры, а не INSERT, и счётчик не меняет.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO counters (name, value) SELECT 'bot_users', COUNT(*) FROM bot_users
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS counters_bot_users_insert AFTER INSERT ON bot_users
+        BEGIN UPDATE counters SET value = value + 1 WHERE name = 'bot_users'; END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS counters_bot_users_delete AFTER DELETE ON bot_users
+        BEGIN UPDATE counters SET value = value - 1 WHERE name = 'bot_users'; END
+    ''')
+
+# (версия, миграция, выполнять ли в транзакции)
+MIGRATIONS = [
+    (1, _migration_initial_schema, True),
+    (2, _migration_bot_users_seen, True),
+    (3, _migration_users_status_rank, True),
+    (4, _migration_broadcast_jobs, True),
+    (5, _migration_suggestions_queue_index, True),
+    # journal_mode нельзя менять внутри транзакции
+    (6, _migration_wal, False),
+    (7, _migration_persistence, True),
+    (8, _migration_changelog, True),
+    (9, _migration_status_history, True),
+    (10, _migration_bot_users_delivery, True),
+    (11, _migration_settings, True),
+    (12, _migration_status_rank_generated, True),
+    (13, _migration_counters, True),
+]
 
-    def add_bot_user(self, user_id: str):
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+# conn должен быть открыт с isolation_level=None
+def run_migrations(conn: sqlite3.Connection):
+    for version, migrate, transactional in MIGRATIONS:
+        if not transactional:
+            if schema_version(conn) < version:
+                migrate(conn)
+                conn.execute(f'PRAGMA user_version = {version}')
+                print(f"База данных обновлена до версии {version}")
+            continue
+
+        # BEGIN IMMEDIATE и повторная проверка версии внутри транзакции,
+        # чтобы два процесса не применили одну миграцию дважды
+        conn.execute('BEGIN IMMEDIATE')
         try:
-            self.cursor.execute('''
-                INSERT OR IGNORE INTO bot_users (user_id) VALUES (?)
-            ''', (user_id,))
-            self.conn.commit()
-        except Exception as e:
-            print(f"Ошибка добавления пользователя бота: {e}")
-
-    def get_all_bot_users(self) -> list:
-        self.cursor.execute('SELECT user_id FROM bot_users')
-        return [row[0] for row in self.cursor.fetchall()]
-    
-    def get_total_bot_users(self) -> int:
-        self.cursor.execute('SELECT COUNT(*) FROM bot_users')
-        return self.cursor.fetchone()[0]
-    
-    def get_total_listed_users(self) -> int:
-        self.cursor.execute('SELECT COUNT(*) FROM users')
-        return self.cursor.fetchone()[0]
-    
-    def get_status_counts(self) -> dict:
-        self.cursor.execute('''
-            SELECT status, COUNT(*) as count 
-            FROM users 
-            GROUP BY status
-        ''')
-        return {row[0]: row[1] for row in self.cursor.fetchall()}
+            if schema_version(conn) >= version:
+                conn.execute('ROLLBACK')
+                continue
+            migrate(conn)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        print(f"База данных обновлена до версии {version}")
+
+# Настройки, которые SQLite не хранит в файле и которые нужно задавать
+# каждому соединению
+def configure_connection(conn: sqlite3.Connection):
+    conn.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA synchronous = {SQLITE_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+
+# Синхронные запросы. Выполняются только в потоках Database,
+# каждый поток работает со своим соединением и своим курсором.
+
+def _touch_bot_users(conn, rows: list):
+    # rows: (user_id, first_seen, last_seen); first_seen не перезаписывается.
+    # Раз пользователь пишет боту, сообщения до него снова доходят.
+    conn.executemany('''
+        INSERT INTO bot_users (user_id, first_seen, last_seen) VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET last_seen = excluded.last_seen, blocked_bot = 0, delivery_failures = 0
+    ''', rows)
+
+# Из счётчика, который ведут триггеры на bot_users, без COUNT(*)
+def _get_total_bot_users(conn) -> int:
+    return conn.execute("SELECT value FROM counters WHERE name = 'bot_users'").fetchone()[0]
 
-    def block_user(self, username: str) -> bool:
+# Получатели рассылки - по частичному индексу idx_bot_users_reachable, без
+# заблокировавших бота и тех, кому не доставлено max_failures раз подряд
+def _get_broadcast_recipients(conn, after: str, limit: int, max_failures: int) -> list:
+    rows = conn.execute('''
+        SELECT user_id FROM bot_users
+        WHERE blocked_bot = 0 AND user_id > ? AND delivery_failures < ?
+        ORDER BY user_id LIMIT ?
+    ''', (after, max_failures, limit))
+    return [row[0] for row in rows]
+
+# (получатели, недоступные)
+def _count_broadcast_audience(conn, max_failures: int) -> tuple:
+    return conn.execute('''
+        SELECT
+            SUM(blocked_bot = 0 AND delivery_failures < ?),
+            SUM(blocked_bot = 1 OR delivery_failures >= ?)
+        FROM bot_users
+    ''', (max_failures, max_failures)).fetchone()
+
+# Итоги пачки рассылки: доставлено, не доставлено, заблокировали бота
+def _record_deliveries(conn, delivered: list, failed: list, blocked: list):
+    now = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+    conn.executemany(
+        'UPDATE bot_users SET last_delivered = ?, delivery_failures = 0 WHERE user_id = ?',
+        [(now, user_id) for user_id in delivered]
+    )
+    conn.executemany(
+        'UPDATE bot_users SET delivery_failures = delivery_failures + 1 WHERE user_id = ?',
+        [(user_id,) for user_id in failed]
+    )
+    conn.executemany(
+        'UPDATE bot_users SET blocked_bot = 1, delivery_failures = delivery_failures + 1 WHERE user_id = ?',
+        [(user_id,) for user_id in blocked]
+    )
+
+# my_chat_member в личном чате: пользователь заблокировал или разблокировал бота.
+# Меняет только существующую строку: в bot_users попадают через /start, а не
+# по одному событию блокировки
+def _set_bot_blocked(conn, user_id: str, blocked: bool):
+    conn.execute(
+        'UPDATE bot_users SET blocked_bot = ?, delivery_failures = 0 WHERE user_id = ?',
+        (int(blocked), user_id)
+    )
+
+_BROADCAST_JOB_COLUMNS = (
+    'id', 'kind', 'text', 'chat_id', 'message_id', 'cursor', 'total', 'sent', 'failed', 'blocked', 'skipped'
+)
+
+def _create_broadcast_job(conn, kind: str, text: str, chat_id: int, message_id: int, total: int, skipped: int) -> int:
+    cursor = conn.execute('''
+        INSERT INTO broadcast_jobs (kind, text, chat_id, message_id, total, skipped)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (kind, text, chat_id, message_id, total, skipped))
+    return cursor.lastrowid
+
+def _update_broadcast_progress(conn, job_id: int, cursor: str, sent: int, failed: int, blocked: int):
+    conn.execute(
+        'UPDATE broadcast_jobs SET cursor = ?, sent = ?, failed = ?, blocked = ? WHERE id = ?',
+        (cursor, sent, failed, blocked, job_id)
+    )
+
+def _finish_broadcast_job(conn, job_id: int):
+    conn.execute(
+        'UPDATE broadcast_jobs SET status = "done", finished_at = CURRENT_TIMESTAMP WHERE id = ?',
+        (job_id,)
+    )
+
+def _get_unfinished_broadcast_jobs(conn) -> list:
+    rows = conn.execute(
+        f'SELECT {", ".join(_BROADCAST_JOB_COLUMNS)} FROM broadcast_jobs WHERE status = "running" ORDER BY id'
+    )
+    return [dict(zip(_BROADCAST_JOB_COLUMNS, row)) for row in rows]
+
+def _get_persistence_data(conn, kind: str) -> list:
+    return conn.execute('SELECT id, data FROM persistence_data WHERE kind = ?', (kind,)).fetchall()
+
+def _get_conversations(conn, name: str) -> list:
+    return conn.execute('SELECT key, state FROM conversations WHERE name = ?', (name,)).fetchall()
+
+def _save_persistence(conn, data: list, conversations: list):
+    # data: (kind, id, blob или None); conversations: (name, key, blob или None).
+    # None означает удаление записи.
+    conn.executemany(
+        'INSERT OR REPLACE INTO persistence_data (kind, id, data) VALUES (?, ?, ?)',
+        [row for row in data if row[2] is not None]
+    )
+    conn.executemany(
+        'DELETE FROM persistence_data WHERE kind = ? AND id = ?',
+        [row[:2] for row in data if row[2] is None]
+    )
+    conn.executemany(
+        'INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)',
+        [row for row in conversations if row[2] is not None]
+    )
+    conn.executemany(
+        'DELETE FROM conversations WHERE name = ? AND key = ?',
+        [row[:2] for row in conversations if row[2] is None]
+    )
+
+# Последний выданный seq; в отличие от MAX(seq) не сбрасывается очисткой
+def _get_changelog_seq(conn) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changelog'").fetchone()
+    return row[0] if row else 0
+
+def _prune_changelog(conn, keep: int):
+    conn.execute('DELETE FROM changelog WHERE seq <= (SELECT MAX(seq) FROM changelog) - ?', (keep,))
+
+def _get_settings(conn) -> dict:
+    return dict(conn.execute('SELECT key, value FROM settings'))
+
+def _set_setting(conn, key: str, value: str):
+    conn.execute(
+        'INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+        (key, value)
+    )
+
+def _get_blocked_users(conn) -> list:
+    return [row[0] for row in conn.execute('SELECT user_id FROM blocked_users')]
+
+# Текущее состояние ключей из журнала: (username, статус или None)
+# и (user_id, заблокирован ли)
+def _read_changed_rows(conn, usernames: list, blocked_ids: list) -> tuple:
+    statuses = {}
+    blocked = set()
+    for start in range(0, len(usernames), 500):
+        chunk = usernames[start:start + 500]
+        statuses.update(conn.execute(
+            f"SELECT username, status FROM users WHERE username IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    for start in range(0, len(blocked_ids), 500):
+        chunk = blocked_ids[start:start + 500]
+        blocked.update(row[0] for row in conn.execute(
+            f"SELECT user_id FROM blocked_users WHERE user_id IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    return (
+        [(username, statuses.get(username)) for username in usernames],
+        [(user_id, user_id in blocked) for user_id in blocked_ids]
+    )
+
+def _block_user(conn, username: str) -> bool:
+    cursor = conn.execute('INSERT OR IGNORE INTO blocked_users (user_id) VALUES (?)', (username,))
+    return cursor.rowcount > 0
+
+def _unblock_user(conn, username: str) -> bool:
+    cursor = conn.execute('DELETE FROM blocked_users WHERE user_id = ?', (username,))
+    return cursor.rowcount > 0
+
+def _add_suggestion(conn, username: str, desired_status: str, proof: str, reason: str, suggested_by: str):
+    conn.execute('''
+        INSERT INTO suggestions (username, desired_status, proof, reason, suggested_by)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (username.lower(), desired_status.lower(), proof, reason, suggested_by.lower()))
+
+SUGGESTION_COLUMNS = ('id', 'username', 'desired_status', 'proof', 'reason', 'suggested_by', 'suggested_at')
+
+# Страница очереди предложек: новые сверху, keyset по (suggested_at, id)
+# через индекс idx_suggestions_status_suggested_at
+def _get_pending_suggestions(conn, after_id: int, limit: int) -> list:
+    columns = ', '.join(SUGGESTION_COLUMNS)
+    if after_id:
+        rows = conn.execute(f'''
+            SELECT {columns} FROM suggestions
+            WHERE status = 'pending'
+              AND (suggested_at, id) < (SELECT suggested_at, id FROM suggestions WHERE id = ?)
+            ORDER BY suggested_at DESC, id DESC
+            LIMIT ?
+        ''', (after_id, limit))
+    else:
+        rows = conn.execute(f'''
+            SELECT {columns} FROM suggestions
+            WHERE status = 'pending'
+            ORDER BY suggested_at DESC, id DESC
+            LIMIT ?
+        ''', (limit,))
+    return [dict(zip(SUGGESTION_COLUMNS, row)) for row in rows]
+
+def _count_pending_suggestions(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM suggestions WHERE status = 'pending'").fetchone()[0]
+
+# Одобрение: отметка предложки и запись в users в одной транзакции
+def _approve_suggestions(conn, suggestion_ids: list) -> list:
+    approved = []
+    for suggestion_id in suggestion_ids:
+        row = conn.execute(
+            "SELECT username, desired_status FROM suggestions WHERE id = ? AND status = 'pending'",
+            (suggestion_id,)
+        ).fetchone()
+        if row is None:
+            continue
+        conn.execute("UPDATE suggestions SET status = 'approved' WHERE id = ?", (suggestion_id,))
+        _add_user(conn, row[0], row[1])
+        approved.append((row[0], row[1]))
+    return approved
+
+def _reject_suggestions(conn, suggestion_ids: list) -> int:
+    cursor = conn.executemany(
+        "UPDATE suggestions SET status = 'rejected' WHERE id = ? AND status = 'pending'",
+        [(suggestion_id,) for suggestion_id in suggestion_ids]
+    )
+    return cursor.rowcount
+
+def _add_user(conn, username: str, status: str):
+    conn.execute(
+        'INSERT OR REPLACE INTO users (username, status) VALUES (?, ?)',
+        (username.lower(), status)
+    )
+
+# Пакетная запись для импорта: rows - [(username, status)] в нижнем регистре
+def _add_users(conn, rows: list):
+    conn.executemany(
+        'INSERT OR REPLACE INTO users (username, status) VALUES (?, ?)',
+        rows
+    )
+
+# Keyset по первичному ключу для потоковой выгрузки
+def _export_users(conn, after: str, limit: int) -> list:
+    return conn.execute(
+        'SELECT username, status FROM users WHERE username > ? ORDER BY username LIMIT ?',
+        (after, limit)
+    ).fetchall()
+
+def _remove_user(conn, username: str):
+    conn.execute('DELETE FROM users WHERE username = ?', (username.lower(),))
+
+# Последние изменения статуса пользователя, новые первыми: [(статус или
+# None, если удалён, changed_at)]. Читается только диапазон индекса по username.
+def _get_status_history(conn, username: str, limit: int) -> list:
+    return conn.execute('''
+        SELECT status_codes.status, status_history.changed_at
+        FROM status_history LEFT JOIN status_codes ON status_codes.code = status_history.code
+        WHERE status_history.username = ?
+        ORDER BY status_history.changed_at DESC, status_history.id DESC
+        LIMIT ?
+    ''', (username.lower(), limit)).fetchall()
+
+# Имена, у которых в истории больше одной записи, - по индексу, без чтения строк
+def _get_usernames_with_history(conn) -> list:
+    return [row[0] for row in conn.execute(
+        'SELECT username FROM status_history GROUP BY username HAVING COUNT(*) > 1'
+    )]
+
+def _get_all_user_statuses(conn) -> list:
+    return conn.execute('SELECT username, status FROM users').fetchall()
+
+# Имена с заданным префиксом по первичному ключу (диапазон, без LIKE)
+def _search_usernames(conn, prefix: str, limit: int) -> list:
+    return conn.execute(
+        'SELECT username, status FROM users WHERE username >= ? AND username < ? ORDER BY username LIMIT ?',
+        (prefix, prefix + '\U0010ffff', limit)
+    ).fetchall()
+
+def _excluded_filter(excluded: tuple) -> str:
+    return f" AND username NOT IN ({', '.join('?' * len(excluded))})" if excluded else ""
+
+# Keyset-запросы по индексу (status_rank, username)
+def _get_users_page(conn, after: tuple, limit: int, excluded: tuple) -> list:
+    return conn.execute(
+        'SELECT status_rank, username, status FROM users '
+        'WHERE (status_rank, username) > (?, ?)' + _excluded_filter(excluded) +
+        ' ORDER BY status_rank, username LIMIT ?',
+        (*after, *excluded, limit)
+    ).fetchall()
+
+def _skip_users(conn, after: tuple, count: int, excluded: tuple) -> Optional[tuple]:
+    row = conn.execute(
+        'SELECT status_rank, username FROM users '
+        'WHERE (status_rank, username) > (?, ?)' + _excluded_filter(excluded) +
+        ' ORDER BY status_rank, username LIMIT 1 OFFSET ?',
+        (*after, *excluded, count - 1)
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+# Асинхронный фасад над SQLite: чтение идёт через небольшой пул потоков
+# с read-only соединениями, запись - через единственный поток-писатель.
+# Event loop никогда не ждёт диск, а у каждого потока свой курсор.
+class Database:
+    def __init__(self, path: str = DATABASE_FILE, read_threads: int = DATABASE_READ_THREADS):
+        self.path = path
+
+        # Миграции и индекс статусов выполняются синхронно при старте,
+        # до запуска event loop
+        conn = sqlite3.connect(path, isolation_level=None)
+        configure_connection(conn)
+        run_migrations(conn)
+
+        # Состояние в памяти и номер журнала - одним снимком базы: запись
+        # другого процесса между чтениями иначе не попала бы ни в снимок,
+        # ни в журнал после changelog_seq
+        conn.execute('BEGIN')
+        try:
+            self._load_status_index(conn)
+            # Кому может быть что показать в истории статусов: остальные
+            # проверки и профили обходятся без запроса к базе
+            self.history_usernames = {username.lower() for username in _get_usernames_with_history(conn)}
+            self.blocked_ids = set(_get_blocked_users(conn))
+            self.settings = _get_settings(conn)
+            self.changelog_seq = _get_changelog_seq(conn)
+        finally:
+            conn.execute('COMMIT')
+        conn.close()
+
+        self._listeners = []
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='db-writer',
+            initializer=self._open_connection,
+            initargs=(False,)
+        )
+        self._readers = ThreadPoolExecutor(
+            max_workers=read_threads,
+            thread_name_prefix='db-reader',
+            initializer=self._open_connection,
+            initargs=(True,)
+        )
+
+        # Отдельное соединение для опроса журнала изменений: PRAGMA
+        # data_version считается для каждого соединения
+        self._watcher = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='db-watcher',
+            initializer=self._open_connection,
+            initargs=(True,)
+        )
+        self._data_version = None
+
+        # Писатель открывается сразу: в режиме WAL read-only соединениям
+        # нужны уже созданные файлы -wal и -shm
+        self._writer.submit(lambda: None).result()
+
+    # Индекс статусов в памяти: нормализованный username -> статус из таблицы
+    # users, плюс администраторы из конфига. check_user и профиль читают
+    # только его и не ходят в SQLite.
+    def _load_status_index(self, conn: sqlite3.Connection):
+        self.status_index = {}
+        for username, status in _get_all_user_statuses(conn):
+            self.status_index[username.lower()] = sys.intern(status)
+
+        self.admin_usernames = {
+            admin_username.lower(): admin_username
+            for admin_username in ADMIN_USERNAMES.values()
+        }
+
+    def lookup_status(self, username: str) -> Optional[str]:
+        username = username.lower()
+        if username in self.admin_usernames:
+            return 'admin'
+        return self.status_index.get(username)
+
+    def is_listed(self, username: str) -> bool:
+        return username.lower() in self.status_index
+
+    # Подписчики на изменения users: callback(changes), где changes - список
+    # (username, old_status, new_status); пакетный импорт приходит одним вызовом
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def _apply_user_changes(self, updates: list) -> int:
+        changes = []
+        for username, status in updates:
+            old_status = self.status_index.get(username)
+            if old_status == status:
+                continue
+
+            if status is None:
+                del self.status_index[username]
+            else:
+                self.status_index[username] = sys.intern(status)
+            self.history_usernames.add(username)
+            changes.append((username, old_status, status))
+
+        if not changes:
+            return 0
+        for callback in self._listeners:
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"Ошибка обработчика изменений пользователей: {e}")
+        return len(changes)
+
+    # Выполняется в потоке db-watcher. PRAGMA data_version меняется, только
+    # если базу изменило другое соединение, так что без изменений опрос
+    # стоит одного PRAGMA. Возвращает None, если менять нечего.
+    def _poll_changelog(self, after_seq: int) -> Optional[tuple]:
+        conn = self._local.conn
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._data_version:
+            return None
+        self._data_version = version
+
+        # Чтение журнала и строк - одним снимком базы
+        conn.execute('BEGIN')
         try:
-            self.cursor.execute('''
-                INSERT OR IGNORE INTO blocked_users (user_id) VALUES (?)
-            ''', (username,))
-            self.conn.commit()
-            return self.cursor.rowcount > 0
+            last_seq = _get_changelog_seq(conn)
+            if last_seq <= after_seq:
+                return None
+            first_seq = conn.execute('SELECT MIN(seq) FROM changelog').fetchone()[0]
+            if first_seq is None or first_seq > after_seq + 1:
+                # Нужные записи уже удалены из журнала - перечитываем всё
+                return (
+                    last_seq, True, _get_all_user_statuses(conn), _get_blocked_users(conn), _get_settings(conn)
+                )
+
+            rows = conn.execute('SELECT tbl, key FROM changelog WHERE seq > ? ORDER BY seq', (after_seq,)).fetchall()
+            usernames = list(dict.fromkeys(key for table, key in rows if table == 'users'))
+            blocked_ids = list(dict.fromkeys(key for table, key in rows if table == 'blocked_users'))
+            user_rows, blocked_rows = _read_changed_rows(conn, usernames, blocked_ids)
+            # Настроек единицы, при любом изменении они перечитываются целиком
+            settings = _get_settings(conn) if any(table == 'settings' for table, _ in rows) else None
+            return last_seq, False, user_rows, blocked_rows, settings
+        finally:
+            conn.execute('COMMIT')
+
+    # Применяет изменения, сделанные другими процессами или вручную, к
+    # индексу статусов, блокировкам и настройкам; подписчики получают только
+    # изменённые строки. Собственные изменения уже применены и здесь ничего не меняют.
+    # Возвращает число изменённых статусов.
+    async def apply_changelog(self) -> int:
+        loop = asyncio.get_running_loop()
+        polled = await loop.run_in_executor(self._watcher, self._poll_changelog, self.changelog_seq)
+        if polled is None:
+            return 0
+        seq, full, user_rows, blocked, settings = polled
+        self.changelog_seq = max(self.changelog_seq, seq)
+        if settings is not None:
+            self.settings = settings
+
+        user_rows = [(username.lower(), status) for username, status in user_rows]
+        if full:
+            listed = {username for username, _ in user_rows}
+            user_rows += [(username, None) for username in self.status_index if username not in listed]
+            self.blocked_ids = set(blocked)
+        else:
+            # Статус мог смениться и вернуться между опросами: история всё равно есть
+            self.history_usernames.update(username for username, _ in user_rows)
+            for user_id, is_blocked in blocked:
+                if is_blocked:
+                    self.blocked_ids.add(user_id)
+                else:
+                    self.blocked_ids.discard(user_id)
+
+        return self._apply_user_changes(user_rows)
+
+    # Режим техработ: флаг в settings, читается из памяти
+    @property
+    def maintenance(self) -> bool:
+        return self.settings.get('maintenance') == '1'
+
+    async def set_maintenance(self, enabled: bool):
+        value = '1' if enabled else '0'
+        await self._write(_set_setting, 'maintenance', value)
+        self.settings = dict(self.settings, maintenance=value)
+
+    async def prune_changelog(self, keep: int = CHANGELOG_RETENTION):
+        await self._write(_prune_changelog, keep)
+
+    def _open_connection(self, readonly: bool):
+        if readonly:
+            uri = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        configure_connection(conn)
+        self._local.conn = conn
+        with self._connections_lock:
+            self._connections.append(conn)
+
+    # Время запроса меряется в потоке базы, без ожидания в очереди пула
+    def _run_read(self, fn, args):
+        query = fn.__name__.lstrip('_')
+        started = time.perf_counter()
+        try:
+            return fn(self._local.conn, *args)
+        except Exception:
+            DB_QUERY_ERRORS.inc((query,))
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe((query,), time.perf_counter() - started)
+
+    def _run_write(self, fn, args):
+        conn = self._local.conn
+        query = fn.__name__.lstrip('_')
+        started = time.perf_counter()
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            DB_QUERY_ERRORS.inc((query,))
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe((query,), time.perf_counter() - started)
+
+    async def _read(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, fn, args)
+
+    async def _write(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, self._run_write, fn, args)
+
+    async def touch_bot_users(self, rows: list):
+        await self._write(_touch_bot_users, rows)
+
+    async def get_total_bot_users(self) -> int:
+        return await self._read(_get_total_bot_users)
+
+    async def get_broadcast_recipients(self, after: str, limit: int,
+                                       max_failures: int = BROADCAST_MAX_DELIVERY_FAILURES) -> list:
+        return await self._read(_get_broadcast_recipients, after, limit, max_failures)
+
+    async def count_broadcast_audience(self, max_failures: int = BROADCAST_MAX_DELIVERY_FAILURES) -> tuple:
+        reachable, dead = await self._read(_count_broadcast_audience, max_failures)
+        return reachable or 0, dead or 0
+
+    async def record_deliveries(self, delivered: list, failed: list, blocked: list):
+        await self._write(_record_deliveries, delivered, failed, blocked)
+
+    async def set_bot_blocked(self, user_id: str, blocked: bool):
+        await self._write(_set_bot_blocked, user_id, blocked)
+
+    async def create_broadcast_job(self, kind: str, text: str, chat_id: int, message_id: int,
+                                   total: int, skipped: int = 0) -> int:
+        return await self._write(_create_broadcast_job, kind, text, chat_id, message_id, total, skipped)
+
+    async def update_broadcast_progress(self, job_id: int, cursor: str, sent: int, failed: int, blocked: int = 0):
+        await self._write(_update_broadcast_progress, job_id, cursor, sent, failed, blocked)
+
+    async def finish_broadcast_job(self, job_id: int):
+        await self._write(_finish_broadcast_job, job_id)
+
+    async def get_unfinished_broadcast_jobs(self) -> list:
+        return await self._read(_get_unfinished_broadcast_jobs)
+
+    async def get_persistence_data(self, kind: str) -> list:
+        return await self._read(_get_persistence_data, kind)
+
+    async def get_conversations(self, name: str) -> list:
+        return await self._read(_get_conversations, name)
+
+    async def save_persistence(self, data: list, conversations: list):
+        await self._write(_save_persistence, data, conversations)
+
+    async def block_user(self, username: str) -> bool:
+        try:
+            blocked = await self._write(_block_user, username)
         except Exception as e:
             print(f"Ошибка блокировки пользователя: {e}")
             return False
+        self.blocked_ids.add(username)
+        return blocked
 
-    def unblock_user(self, username: str) -> bool:
+    async def unblock_user(self, username: str) -> bool:
         try:
-            self.cursor.execute('''
-                DELETE FROM blocked_users WHERE user_id = ?
-            ''', (username,))
-            self.conn.commit()
-            return self.cursor.rowcount > 0
+            unblocked = await self._write(_unblock_user, username)
         except Exception as e:
             print(f"Ошибка разблокировки пользователя: {e}")
             return False
+        self.blocked_ids.discard(username)
+        return unblocked
 
-    def is_user_blocked(self, user_id: str) -> bool:
-        self.cursor.execute('''
-            SELECT 1 FROM blocked_users WHERE user_id = ?
-        ''', (user_id,))
-        return self.cursor.fetchone() is not None
-
-    def add_suggestion(self, username: str, desired_status: str, proof: str, reason: str, suggested_by: str):
-        self.cursor.execute('''
-            INSERT INTO suggestions (username, desired_status, proof, reason, suggested_by)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (username.lower(), desired_status.lower(), proof, reason, suggested_by.lower()))
-        self.conn.commit()
-
-    def get_pending_suggestions(self):
-        self.cursor.execute('SELECT * FROM suggestions WHERE status = "pending" ORDER BY suggested_at DESC')
-        return self.cursor.fetchall()
-
-    def update_suggestion_status(self, suggestion_id: int, status: str):
-        self.cursor.execute('''
-            UPDATE suggestions SET status = ? WHERE id = ?
-        ''', (status.lower(), suggestion_id))
-        self.conn.commit()
-
-    def add_user(self, username: str, status: str):
-        self.cursor.execute('INSERT OR REPLACE INTO users VALUES (?, ?)', (username.lower(), status))
-        self.conn.commit()
-
-    def remove_user(self, username: str):
-        self.cursor.execute('DELETE FROM users WHERE username = ?', (username.lower(),))
-        self.conn.commit()
-
-    def get_user_status(self, username: str) -> str:
-        self.cursor.execute('SELECT status FROM users WHERE username = ?', (username.lower(),))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
-
-    def get_all_users(self) -> list:
-        self.cursor.execute('''
-            SELECT username, status FROM users 
-            ORDER BY CASE status
-                WHEN "admin" THEN 1
-                WHEN "verify" THEN 2
-                WHEN "garant" THEN 3
-                WHEN "media" THEN 4
-                WHEN "fame" THEN 5
-                WHEN "scam" THEN 6
-                WHEN "beach" THEN 7
-                WHEN "new" THEN 8
-                ELSE 9
-            END
-        ''')
-        db_users = self.cursor.fetchall()
-        
-        admin_users = []
-        for admin_id in ADMIN_IDS:
-            username = ADMIN_USERNAMES.get(str(admin_id), str(admin_id))
-            admin_users.append((username, 'admin'))
-        
-        all_users = admin_users + [
-            user for user in db_users 
-            if user[0] not in {str(admin_id) for admin_id in ADMIN_IDS}
-        ]
-        
-        return all_users
+    # Проверка по множеству в памяти; изменения других процессов приносит
+    # ChangeLogWatcher. В blocked_users лежат username (так блокирует
+    # админ-панель) или числовые id, поэтому проверяются оба.
+    def is_blocked(self, user_id: int, username: Optional[str] = None) -> bool:
+        return str(user_id) in self.blocked_ids or (username is not None and username.lower() in self.blocked_ids)
+
+    async def add_suggestion(self, username: str, desired_status: str, proof: str, reason: str, suggested_by: str):
+        await self._write(_add_suggestion, username, desired_status, proof, reason, suggested_by)
+
+    async def get_pending_suggestions(self, after_id: int = 0, limit: int = 20) -> list:
+        return await self._read(_get_pending_suggestions, after_id, limit)
+
+    async def count_pending_suggestions(self) -> int:
+        return await self._read(_count_pending_suggestions)
+
+    # Возвращает одобренные (username, status); все записи - одним коммитом
+    async def approve_suggestions(self, suggestion_ids: list) -> list:
+        approved = await self._write(_approve_suggestions, suggestion_ids)
+        self._apply_user_changes([(username.lower(), status) for username, status in approved])
+        return approved
+
+    async def reject_suggestions(self, suggestion_ids: list) -> int:
+        return await self._write(_reject_suggestions, suggestion_ids)
+
+    async def add_user(self, username: str, status: str):
+        await self._write(_add_user, username, status)
+        self._apply_user_changes([(username.lower(), status)])
+
+    # Одна транзакция на весь переданный пакет
+    async def add_users(self, rows: list):
+        await self._write(_add_users, rows)
+        self._apply_user_changes(rows)
+
+    async def export_users(self, after: str, limit: int) -> list:
+        return await self._read(_export_users, after, limit)
+
+    async def remove_user(self, username: str):
+        await self._write(_remove_user, username)
+        self._apply_user_changes([(username.lower(), None)])
+
+    def has_status_history(self, username: str) -> bool:
+        return username.lower() in self.history_usernames
+
+    # Пустой список без запроса к базе, если показывать нечего
+    async def get_status_history(self, username: str, limit: int = STATUS_HISTORY_LIMIT) -> list:
+        if not self.has_status_history(username):
+            return []
+        return await self._read(_get_status_history, username, limit)
+
+    async def search_usernames(self, prefix: str, limit: int) -> list:
+        return await self._read(_search_usernames, prefix.lower(), limit)
+
+    async def get_users_page(self, after: tuple, limit: int, excluded: tuple = ()) -> list:
+        return await self._read(_get_users_page, after, limit, excluded)
+
+    async def skip_users(self, after: tuple, count: int, excluded: tuple = ()) -> Optional[tuple]:
+        return await self._read(_skip_users, after, count, excluded)
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self._watcher.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+# Буфер отложенной записи для bot_users: /start только отмечает пользователя
+# в памяти, а в базу накопленное уходит одной транзакцией по таймеру
+# или при заполнении буфера.
+class BotUserBuffer:
+    def __init__(self, db: Database, flush_interval_ms: int = BOT_USERS_FLUSH_INTERVAL_MS,
+                 flush_size: int = BOT_USERS_FLUSH_SIZE):
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_size = flush_size
+        self._pending = {}  # user_id -> (first_seen, last_seen)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def touch(self, user_id: str):
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        pending = self._pending.get(user_id)
+        self._pending[user_id] = (pending[0] if pending else now, now)
+
+        if len(self._pending) >= self.flush_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        try:
+            await self.db.touch_bot_users([
+                (user_id, first_seen, last_seen)
+                for user_id, (first_seen, last_seen) in batch.items()
+            ])
+        except Exception as e:
+            print(f"Ошибка записи пользователей бота: {e}")
+            # Возвращаем записи в буфер, чтобы не потерять их
+            for user_id, (first_seen, last_seen) in batch.items():
+                pending = self._pending.get(user_id)
+                self._pending[user_id] = (first_seen, pending[1] if pending else last_seen)
+
+    async def stop(self):
+        # Останавливаем цикл флагом, а не cancel(): так не прервётся запись
+        # посреди транзакции
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+# Фоновый опрос журнала изменений: держит индекс статусов, блокировки и
+# зависящие от них кэши согласованными с другими процессами
+class ChangeLogWatcher:
+    def __init__(self, db: Database, poll_interval: float = CHANGELOG_POLL_INTERVAL,
+                 prune_interval: float = CHANGELOG_PRUNE_INTERVAL):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.prune_interval = prune_interval
+        self.applied = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        pruned_at = time.monotonic()
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping:
+                break
+            try:
+                self.applied += await self.db.apply_changelog()
+                if time.monotonic() - pruned_at >= self.prune_interval:
+                    pruned_at = time.monotonic()
+                    await self.db.prune_changelog()
+            except Exception as e:
+                print(f"Ошибка чтения журнала изменений: {e}")
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
@@ -0,0 +1,87 @@
+import re
+import time
+from typing import Optional
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from cache import LRUCache
+from metrics import FLOOD_LIMITED
+from config import ADMIN_IDS, FLOOD_LIMITS, FLOOD_TRACKED_BUCKETS
+
+SUGGESTION_PATTERN = re.compile(r'^\s*1\.\s*Желаемый статус:', re.IGNORECASE)
+
+# Готовые ответы при превышении лимита: отправляются один раз, пока
+# у пользователя не накопится хотя бы один токен
+SLOW_DOWN_NOTICES = {
+    'lookup': "⏳ Слишком много проверок подряд. Подождите немного и попробуйте снова.",
+    'navigation': "⏳ Слишком часто. Подождите пару секунд.",
+    'suggestion': "⏳ Предложки можно отправлять не так часто. Попробуйте позже."
+}
+
+
+# Категория лимита для обновления; None - не ограничивается
+def flood_category(update: Update) -> Optional[str]:
+    if update.callback_query:
+        return 'suggestion' if update.callback_query.data == 'suggest_user' else 'navigation'
+    message = update.message
+    if message is None or message.text is None:
+        return None
+    if message.text.startswith('/'):
+        return 'navigation'
+    return 'suggestion' if SUGGESTION_PATTERN.match(message.text) else 'lookup'
+
+
+# Token bucket на пару (пользователь, категория). Корзины лежат в LRU-кэше
+# ограниченного размера: вытесненная корзина просто начинается заново полной.
+# Стоит в группе -1 до остальных обработчиков и останавливает обработку
+# через ApplicationHandlerStop, так что лишние обновления не доходят до базы
+# и Bot API.
+class FloodControl:
+    def __init__(self, limits: dict = FLOOD_LIMITS, max_buckets: int = FLOOD_TRACKED_BUCKETS):
+        self.limits = limits
+        self.buckets = LRUCache(max_buckets)  # (user_id, категория) -> [токены, время, предупреждён]
+
+    def allow(self, user_id: int, category: str) -> tuple:
+        capacity, rate = self.limits[category]
+        now = time.monotonic()
+        key = (user_id, category)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [float(capacity), now, False]
+            self.buckets.set(key, bucket)
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = False
+            return True, False
+
+        # Предупреждаем только о первом отклонённом обновлении
+        notify = not bucket[2]
+        bucket[2] = True
+        return False, notify
+
+    async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is None or user.id in ADMIN_IDS:
+            return
+        category = flood_category(update)
+        if category is None:
+            return
+
+        allowed, notify = self.allow(user.id, category)
+        if allowed:
+            return
+
+        FLOOD_LIMITED.inc((category,))
+        try:
+            if update.callback_query:
+                # На нажатие Telegram ждёт ответа в любом случае, иначе у
+                # пользователя крутится индикатор загрузки
+                await update.callback_query.answer(SLOW_DOWN_NOTICES[category] if notify else None)
+            elif notify:
+                await update.message.reply_text(SLOW_DOWN_NOTICES[category])
+        except Exception as e:
+            print(f"Ошибка отправки предупреждения о флуде: {e}")
+        raise ApplicationHandlerStop
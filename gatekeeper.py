@@ -0,0 +1,59 @@
+from typing import Optional
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from cache import LRUCache
+from database import Database
+from metrics import GATEKEEPER_REJECTED
+from config import ADMIN_IDS, GATEKEEPER_NOTICE_INTERVAL, GATEKEEPER_TRACKED_USERS
+
+# Ответы на отклонённые обновления: не чаще раза в notice_interval
+GATE_NOTICES = {
+    'blocked': "🚫 Ваш аккаунт заблокирован. Обратитесь к администратору.",
+    'maintenance': "🔧 Бот временно недоступен из-за технических работ. Пожалуйста, попробуйте позже."
+}
+
+
+# Проверка до всех обработчиков: стоит в группе -2, раньше ограничителя
+# флуда. Заблокированных пользователей и, во время техработ, всех, кроме
+# администраторов, останавливает через ApplicationHandlerStop. Блокировки
+# и флаг техработ берутся из памяти Database, так что отклонённое
+# обновление не стоит ни одного запроса к SQLite и не больше одного ответа.
+# Изменения статуса бота в чате (my_chat_member) пропускаются всегда: по ним
+# track_bot_membership отмечает, что пользователь заблокировал бота или
+# разблокировал его.
+class Gatekeeper:
+    def __init__(self, db: Database, notice_interval: float = GATEKEEPER_NOTICE_INTERVAL,
+                 max_tracked: int = GATEKEEPER_TRACKED_USERS):
+        self.db = db
+        self.notice_interval = notice_interval
+        self.notified = LRUCache(max_tracked)  # user_id -> True, пока не истёк notice_interval
+
+    def reason(self, update: Update) -> Optional[str]:
+        user = update.effective_user
+        if user is None or user.id in ADMIN_IDS or update.my_chat_member:
+            return None
+        if self.db.is_blocked(user.id, user.username):
+            return 'blocked'
+        if self.db.maintenance:
+            return 'maintenance'
+        return None
+
+    async def check(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        reason = self.reason(update)
+        if reason is None:
+            return
+
+        GATEKEEPER_REJECTED.inc((reason,))
+        user_id = update.effective_user.id
+        notify = self.notified.get(user_id) is None
+        if notify:
+            self.notified.set(user_id, True, ttl=self.notice_interval)
+        try:
+            if update.callback_query:
+                # На нажатие Telegram ждёт ответа в любом случае
+                await update.callback_query.answer(GATE_NOTICES[reason] if notify else None, show_alert=notify)
+            elif notify and update.effective_message:
+                await update.effective_message.reply_text(GATE_NOTICES[reason])
+        except Exception as e:
+            print(f"Ошибка ответа на отклонённое обновление: {e}")
+        raise ApplicationHandlerStop
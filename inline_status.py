@@ -0,0 +1,155 @@
+import re
+import asyncio
+from datetime import datetime
+from typing import Optional
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+from config import (
+    STATUS_EMOJIS,
+    STATUS_NAMES,
+    STATUS_DESCRIPTIONS,
+    INLINE_RESULTS,
+    INLINE_CACHE_TTL,
+    INLINE_CACHE_TIME,
+    INLINE_DEBOUNCE
+)
+from database import Database
+from username_search import UsernameIndex, QueryNeighbours
+from cache import LRUCache
+
+QUERY_PATTERN = re.compile(r'\W')
+
+
+# Карточка статуса - та же, что отвечает check_user; history - из
+# Database.get_status_history, в инлайн-режиме не показывается
+def status_card(username: str, status: str, history: Optional[list] = None) -> str:
+    emoji = STATUS_EMOJIS.get(status, '')
+    status_name = STATUS_NAMES.get(status, status.capitalize())
+    description = STATUS_DESCRIPTIONS.get(status, 'Неизвестный статус')
+    return (
+        f"🔍 Результат проверки: @{username}\n\n"
+        f"{emoji} Статус: {status_name}\n"
+        f"📝 Описание: {description}"
+        f"{status_timeline(history)}"
+    )
+
+
+# История статусов, новые изменения первыми. Одна запись - это только
+# текущий статус, её не показываем.
+def status_timeline(history: Optional[list]) -> str:
+    if not history or len(history) < 2:
+        return ""
+    lines = []
+    for status, changed_at in history:
+        when = datetime.fromtimestamp(changed_at).strftime('%d.%m.%Y') if changed_at else "ранее"
+        if status is None:
+            lines.append(f"• {when}: ❌ Удалён из базы\n")
+        else:
+            lines.append(f"• {when}: {STATUS_EMOJIS.get(status, '')} {STATUS_NAMES.get(status, status.capitalize())}\n")
+    return "\n\n📜 История статусов:\n" + "".join(lines).rstrip('\n')
+
+
+def normalize_query(text: str) -> str:
+    return QUERY_PATTERN.sub('', text.strip().lstrip('@')).lower()[:32]
+
+
+# Инлайн-проверка статуса: "@bot username" в любом чате. Ответы кэшируются
+# по нормализованному запросу; промах ждёт INLINE_DEBOUNCE и уходит в базу,
+# только если за это время пользователь не напечатал следующий символ.
+class InlineStatusSearch:
+    def __init__(self, db: Database, search: UsernameIndex, cache: LRUCache):
+        self.db = db
+        self.search = search
+        self.cache = cache  # нормализованный запрос -> список результатов
+        self._neighbours = QueryNeighbours()  # закэшированные запросы для подсказок
+        self._latest = {}  # user_id -> id последнего инлайн-запроса
+
+        # Статусы в закэшированных карточках должны быть актуальными
+        db.add_listener(self.on_users_changed)
+
+    # Ответ зависит от имени, только если запрос - его префикс (точное
+    # совпадение и поиск по префиксу) или отличается от него на одну правку
+    # (подсказки); остальные закэшированные ответы не трогаем
+    def on_users_changed(self, changes: list):
+        for username, _, _ in changes:
+            for end in range(1, len(username) + 1):
+                self.cache.pop(username[:end])
+            for query in self._neighbours.near(username):
+                self.cache.pop(query)
+                self._neighbours.discard(query)
+
+    def _remember(self, text: str, results: list):
+        self.cache.set(text, results, INLINE_CACHE_TTL)
+        self._neighbours.add(text)
+        # Вытесненные и истёкшие записи кэша из обратного индекса сами не
+        # уходят - время от времени собираем его заново по кэшу
+        if len(self._neighbours) > 2 * self.cache.max_size:
+            self._neighbours = QueryNeighbours(query for query, _ in self.cache.items())
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        inline_query = update.inline_query
+        text = normalize_query(inline_query.query)
+
+        results = self.cache.get(text)
+        if results is None:
+            user_id = inline_query.from_user.id
+            self._latest[user_id] = inline_query.id
+            await asyncio.sleep(INLINE_DEBOUNCE)
+            if self._latest.get(user_id) != inline_query.id:
+                # Запрос устарел - ответ уйдёт на следующий
+                return
+            del self._latest[user_id]
+
+            # Пока ждали, результат мог посчитать другой пользователь
+            results = self.cache.get(text)
+            if results is None:
+                results = await self._build(text)
+                self._remember(text, results)
+
+        try:
+            await inline_query.answer(results, cache_time=INLINE_CACHE_TIME)
+        except TelegramError as e:
+            print(f"Ошибка ответа на инлайн-запрос: {e}")
+
+    async def _build(self, text: str) -> list:
+        if not text:
+            return []
+
+        # Точное совпадение (включая администраторов) берётся из индекса в памяти
+        matches = []
+        status = self.db.lookup_status(text)
+        if status:
+            matches.append((self.db.admin_usernames.get(text, text), status))
+
+        for username, status in await self.db.search_usernames(text, INLINE_RESULTS):
+            if username != text:
+                matches.append((username, status))
+
+        if len(matches) < INLINE_RESULTS:
+            listed = {username.lower() for username, _ in matches}
+            matches += [
+                (self.db.admin_usernames.get(username, username), status)
+                for username, status in self.search.suggest(text)
+                if username not in listed
+            ]
+
+        if not matches:
+            return [InlineQueryResultArticle(
+                id='not_found',
+                title=f"@{text} не найден",
+                description="Пользователя нет в нашей базе данных",
+                input_message_content=InputTextMessageContent(
+                    f"🔍 Пользователь @{text} не найден в нашей базе данных."
+                )
+            )]
+
+        return [
+            InlineQueryResultArticle(
+                id=username.lower(),
+                title=f"{STATUS_EMOJIS.get(status, '')} @{username}",
+                description=STATUS_NAMES.get(status, status.capitalize()),
+                input_message_content=InputTextMessageContent(status_card(username, status))
+            )
+            for username, status in matches[:INLINE_RESULTS]
+        ]
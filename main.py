@@ -1,9 +1,9 @@
 import re
-import os
 import asyncio
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.constants import ChatMemberStatus, ChatType
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,10 +11,30 @@ from telegram.ext import (
     MessageHandler,
     filters,
     ContextTypes,
-    ConversationHandler
+    ConversationHandler,
+    InlineQueryHandler,
+    TypeHandler,
+    ChatMemberHandler
 )
-from config import BOT_TOKEN, ADMIN_IDS, STATUS_EMOJIS, STATUS_DESCRIPTIONS, STATUS_NAMES, ADMIN_USERNAMES, CHANNEL_IDS, LOG_CHANNEL_ID, SUGGESTION_CHANNEL_ID
-from database import Database
+from config import BOT_TOKEN, ADMIN_IDS, STATUS_EMOJIS, STATUS_DESCRIPTIONS, STATUS_NAMES, CHANNEL_IDS, LOG_CHANNEL_ID, SUGGESTION_CHANNEL_ID
+from config import SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_CACHE_NEGATIVE_TTL, SUBSCRIPTION_CACHE_SIZE, USER_LIST_CACHE_SIZE, INLINE_CACHE_SIZE, WEBHOOK_URL
+from database import Database, BotUserBuffer, ChangeLogWatcher
+from broadcast import BroadcastEngine
+from action_log import ActionLogQueue
+from user_list import UserListPager
+from stats_report import StatisticsReport
+from suggestion_review import SuggestionReview, parse_action
+from user_transfer import UserImport, export_users, file_format, FORMATS
+from username_search import UsernameIndex
+from inline_status import InlineStatusSearch, status_card, status_timeline
+from webhook import run_webhook
+from update_processor import OrderedUpdateProcessor
+from flood_control import FloodControl, SUGGESTION_PATTERN
+from gatekeeper import Gatekeeper
+from callback_router import CallbackRouter, CallbackAnswer
+from persistence import SQLitePersistence
+from metrics import MetricsServer, InstrumentedRequest, register_cache, timed, callback_family
+from cache import LRUCache
 
 # Состояния для обработки предложений
 SUGGESTION_STATUS, SUGGESTION_DESIRED_STATUS, SUGGESTION_PROOF, SUGGESTION_REASON, SUGGESTION_USERNAME, SUGGESTION_DATA = range(6)
@@ -29,44 +49,128 @@ CHANNELS = {
     }
 }
 
-# Глобальный флаг техработ
-MAINTENANCE_MODE = False
+MAINTENANCE_NOTICE = "🔧 Внимание! Бот временно недоступен из-за технических работ. Приносим извинения за неудобства."
 
-async def check_subscription(user_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
-    for channel in CHANNELS.values():
-        try:
-            member = await context.bot.get_chat_member(
-                chat_id=channel["chat_id"], 
-                user_id=user_id
-            )
-            if member.status in ["left", "kicked"]:
-                return False
-        except Exception as e:
-            print(f"Ошибка проверки подписки: {e}")
-            return False
-    return True
+action_log = ActionLogQueue(LOG_CHANNEL_ID)
 
-async def send_subscription_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [InlineKeyboardButton(channel["title"], url=channel["url"])]
-        for channel in CHANNELS.values()
-    ]
-    keyboard.append([InlineKeyboardButton("✅ Я подписался", callback_data="check_subscription")])
+# Кэш результатов проверки подписки: user_id -> bool
+SUBSCRIPTION_CACHE = LRUCache(SUBSCRIPTION_CACHE_SIZE)
+
+async def _check_channel(user_id: int, chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> Optional[bool]:
+    try:
+        member = await context.bot.get_chat_member(
+            chat_id=chat_id, 
+            user_id=user_id
+        )
+        return member.status not in ["left", "kicked"]
+    except Exception as e:
+        print(f"Ошибка проверки подписки: {e}")
+        return None
+
+async def check_subscription(user_id: int, context: ContextTypes.DEFAULT_TYPE, force: bool = False) -> bool:
+    if not force:
+        cached = SUBSCRIPTION_CACHE.get(user_id)
+        if cached is not None:
+            return cached
+    
+    channels = list(CHANNELS.values())
+    if len(channels) == 1:
+        results = [await _check_channel(user_id, channels[0]["chat_id"], context)]
+    else:
+        results = await asyncio.gather(
+            *(_check_channel(user_id, channel["chat_id"], context) for channel in channels)
+        )
     
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    # Ошибки API не кэшируем, чтобы не запереть пользователя на время TTL
+    if None in results:
+        SUBSCRIPTION_CACHE.pop(user_id)
+        return False
     
+    subscribed = all(results)
+    ttl = SUBSCRIPTION_CACHE_TTL if subscribed else SUBSCRIPTION_CACHE_NEGATIVE_TTL
+    SUBSCRIPTION_CACHE.set(user_id, subscribed, ttl)
+    return subscribed
+
+# Клавиатуры не зависят от пользователя и собираются один раз при импорте
+SUBSCRIPTION_MARKUP = InlineKeyboardMarkup(
+    [[InlineKeyboardButton(channel["title"], url=channel["url"])] for channel in CHANNELS.values()]
+    + [[InlineKeyboardButton("✅ Я подписался", callback_data="check_subscription")]]
+)
+MAIN_MENU_BUTTONS = [
+    [InlineKeyboardButton("🔍 Проверить пользователя", callback_data='check_user')],
+    [InlineKeyboardButton("📋 Список пользователей", callback_data='user_list_1')],
+    [InlineKeyboardButton("👤 Мой профиль", callback_data='my_profile')],
+    [InlineKeyboardButton("📨 Предложить пользователя", callback_data='suggest_user')]
+]
+MAIN_MENU_MARKUP = InlineKeyboardMarkup(MAIN_MENU_BUTTONS)
+ADMIN_MAIN_MENU_MARKUP = InlineKeyboardMarkup(
+    MAIN_MENU_BUTTONS + [[InlineKeyboardButton("🛠️ Админ панель", callback_data='admin_panel')]]
+)
+def _admin_panel_markup(maintenance_label: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("➕ Добавить пользователя", callback_data='add_user'),
+         InlineKeyboardButton("➖ Удалить пользователя", callback_data='remove_user')],
+        [InlineKeyboardButton("📢 Рассылка", callback_data='broadcast'),
+         InlineKeyboardButton("📊 Статистика", callback_data='statistics')],
+        [InlineKeyboardButton(maintenance_label, callback_data='maintenance'),
+         InlineKeyboardButton("⛔ Заблокировать", callback_data='block_user')],
+        [InlineKeyboardButton("✅ Разблокировать", callback_data='unblock_user'),
+         InlineKeyboardButton("📥 Предложки", callback_data='review_0')],
+        [InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')]
+    ])
+
+# Кнопка техработ включает или выключает режим, подпись зависит от него
+ADMIN_PANEL_MARKUP = _admin_panel_markup("🔧 Тех работы")
+ADMIN_PANEL_MAINTENANCE_MARKUP = _admin_panel_markup("✅ Завершить тех работы")
+BACK_TO_MAIN_MARKUP = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')]])
+
+def main_menu_markup(user_id: int) -> InlineKeyboardMarkup:
+    return ADMIN_MAIN_MENU_MARKUP if user_id in ADMIN_IDS else MAIN_MENU_MARKUP
+
+def admin_panel_markup() -> InlineKeyboardMarkup:
+    return ADMIN_PANEL_MAINTENANCE_MARKUP if db.maintenance else ADMIN_PANEL_MARKUP
+
+# Регулярные выражения компилируются один раз
+SUGGESTION_FORM_PATTERN = re.compile(
+    r"1\.\s*Желаемый статус:\s*(.+?)\s*"
+    r"2\.\s*Доказательство \(фото или ссылка\):\s*(.+?)\s*"
+    r"3\.\s*Причина\/Обоснование:\s*([\s\S]+?)\s*"
+    r"4\.\s*Юзернейм \(если предлагаете другого пользователя\):\s*@?(\w+)",
+    re.IGNORECASE
+)
+# Команда необязательна: в ответ на приглашение админ-панели пишут просто "@username status"
+ADD_COMMAND_PATTERN = re.compile(r'^(?:/add\s+)?@?(\w+)\s+(verify|garant|scam|beach|new|pdf|media|fame)$', re.IGNORECASE)
+REMOVE_COMMAND_PATTERN = re.compile(r'^(?:/remove\s+)?@?(\w+)$', re.IGNORECASE)
+LEADING_AT_PATTERN = re.compile(r'^@')
+
+# Нормализация статусов из предложек
+SUGGESTION_STATUS_ALIASES = {
+    'медийка': 'media',
+    'фейм': 'fame',
+    'верифи': 'verify',
+    'верификация': 'verify',
+    'гарант': 'garant',
+    'скам': 'scam',
+    'бомж': 'beach',
+    'нью': 'new',
+    'педофил': 'pdf'
+}
+SUGGESTION_STATUSES = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
+
+async def send_subscription_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
     message = (
         "👋 Наш бот является абсолютно бесплатным, поэтому пожалуйста,\n"
         "📢 Для использования бота необходимо подписаться на наши каналы:"
     )
     
     if update.callback_query:
-        await update.callback_query.edit_message_text(message, reply_markup=reply_markup)
+        await update.callback_query.edit_message_text(message, reply_markup=SUBSCRIPTION_MARKUP)
     else:
-        await update.message.reply_text(message, reply_markup=reply_markup)
+        await update.message.reply_text(message, reply_markup=SUBSCRIPTION_MARKUP)
 
-# Функция для логирования действий
-async def log_action(action: str, user: dict, context: ContextTypes.DEFAULT_TYPE, details: str = ""):
+# Функция для логирования действий: запись только ставится в очередь,
+# отправкой в LOG_CHANNEL_ID занимается ActionLogQueue в фоне
+def log_action(action: str, user: dict, details: str = ""):
     log_message = (
         f"🛠️ Действие: {action}\n"
         f"👤 Пользователь: {user.get('full_name', 'N/A')} (@{user.get('username', 'N/A')})\n"
@@ -76,54 +180,44 @@ async def log_action(action: str, user: dict, context: ContextTypes.DEFAULT_TYPE
     if details:
         log_message += f"📝 Детали: {details}\n"
     
-    try:
-        await context.bot.send_message(
-            chat_id=LOG_CHANNEL_ID,
-            text=log_message
-        )
-    except Exception as e:
-        print(f"Ошибка при отправке лога: {e}")
+    action_log.put(log_message)
 
 # Состояния для админских действий
 ADD_USER, REMOVE_USER = range(2)
 
 db = Database()
-USER_PAGE_CACHE: Dict[int, int] = {}
-USER_LIST_CACHE = {}
+bot_users = BotUserBuffer(db)
+changelog = ChangeLogWatcher(db)
+broadcasts = BroadcastEngine(db)
+# Кэш отрисованных страниц списка пользователей
+USER_LIST_CACHE = LRUCache(USER_LIST_CACHE_SIZE)
+user_list = UserListPager(db, USER_LIST_CACHE)
+statistics = StatisticsReport(db)
+review = SuggestionReview(db)
+username_search = UsernameIndex(db)
+INLINE_CACHE = LRUCache(INLINE_CACHE_SIZE)
+inline_search = InlineStatusSearch(db, username_search, INLINE_CACHE)
+metrics_server = MetricsServer()
+flood_control = FloodControl()
+gatekeeper = Gatekeeper(db)
+register_cache('user_list', USER_LIST_CACHE)
+register_cache('subscription', SUBSCRIPTION_CACHE)
+register_cache('inline', INLINE_CACHE)
 
 # Команда /start
+@timed('start')
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
-    # Проверка на блокировку
-    if db.is_user_blocked(str(user.id)):
-        await update.message.reply_text("🚫 Ваш аккаунт заблокирован. Обратитесь к администратору.")
-        return
-    
-    # Проверка техработ
-    global MAINTENANCE_MODE
-    if MAINTENANCE_MODE:
-        await update.message.reply_text("🔧 Бот временно недоступен из-за технических работ. Пожалуйста, попробуйте позже.")
-        return
-    
+    # Блокировки и техработы уже проверил Gatekeeper
     if not await check_subscription(user.id, context):
         await send_subscription_request(update, context)
         return
     
-    # Добавляем пользователя в базу бота
-    db.add_bot_user(str(user.id))
+    # Добавляем пользователя в базу бота (запись уйдёт в базу пакетом)
+    bot_users.touch(str(user.id))
     
-    keyboard = [
-        [InlineKeyboardButton("🔍 Проверить пользователя", callback_data='check_user')],
-        [InlineKeyboardButton("📋 Список пользователей", callback_data='user_list_1')],
-        [InlineKeyboardButton("👤 Мой профиль", callback_data='my_profile')],
-        [InlineKeyboardButton("📨 Предложить пользователя", callback_data='suggest_user')]
-    ]
-    
-    if update.effective_user.id in ADMIN_IDS:
-        keyboard.append([InlineKeyboardButton("🛠️ Админ панель", callback_data='admin_panel')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = main_menu_markup(user.id)
     
     message = (
         "👋 Добро пожаловать в бота 'Кодекс обмана'!\n"
@@ -141,13 +235,22 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'username': user.username,
         'full_name': user.full_name
     }
-    await log_action("Пользователь запустил бота", user_data, context)
+    log_action("Пользователь запустил бота", user_data)
+
+# Пользователь заблокировал или разблокировал бота: рассылки его пропускают
+# и не тратят на него запросы
+async def track_bot_membership(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    member = update.my_chat_member
+    if member.chat.type != ChatType.PRIVATE:
+        return
+    blocked = member.new_chat_member.status == ChatMemberStatus.BANNED
+    # /start мог ещё лежать в буфере - иначе отметка не найдёт строку
+    await bot_users.flush()
+    await db.set_bot_blocked(str(member.from_user.id), blocked)
 
 # Обработчик предложения пользователя
-async def suggest_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def suggest_user(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
     query = update.callback_query
-    await query.answer()
-    
     await query.edit_message_text(
         "📨 Вы можете предложить себя или другого пользователя для внесения в список.\n\n"
         "Отправьте сообщение в следующем формате:\n\n"
@@ -164,18 +267,11 @@ async def suggest_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return SUGGESTION_DATA
 
 # Обработка данных предложения
+@timed('handle_suggestion_data')
 async def handle_suggestion_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
     
-    pattern = re.compile(
-        r"1\.\s*Желаемый статус:\s*(.+?)\s*"
-        r"2\.\s*Доказательство \(фото или ссылка\):\s*(.+?)\s*"
-        r"3\.\s*Причина\/Обоснование:\s*([\s\S]+?)\s*"
-        r"4\.\s*Юзернейм \(если предлагаете другого пользователя\):\s*@?(\w+)",
-        re.IGNORECASE
-    )
-    
-    match = pattern.search(text)
+    match = SUGGESTION_FORM_PATTERN.search(text)
     if not match:
         await update.message.reply_text(
             "❌ Неверный формат. Пожалуйста, отправьте данные в следующем формате:\n\n"
@@ -195,26 +291,12 @@ async def handle_suggestion_data(update: Update, context: ContextTypes.DEFAULT_T
     desired_status = desired_status.strip().lower()
     username = username.strip().lower()
     
-    # Нормализация статусов
-    status_mapping = {
-        'медийка': 'media',
-        'фейм': 'fame',
-        'верифи': 'verify',
-        'верификация': 'verify',
-        'гарант': 'garant',
-        'скам': 'scam',
-        'бомж': 'beach',
-        'нью': 'new',
-        'педофил': 'pdf'
-    }
-    
-    desired_status = status_mapping.get(desired_status, desired_status)
+    desired_status = SUGGESTION_STATUS_ALIASES.get(desired_status, desired_status)
     
     # Проверка валидности статуса
-    valid_statuses = ['verify', 'garant', 'media', 'fame', 'scam', 'beach', 'new', 'pdf']
-    if desired_status not in valid_statuses:
+    if desired_status not in SUGGESTION_STATUSES:
         await update.message.reply_text(
-            f"❌ Неверный статус. Доступные варианты: {', '.join(valid_statuses)}.\n"
+            f"❌ Неверный статус. Доступные варианты: {', '.join(SUGGESTION_STATUSES)}.\n"
             "Пожалуйста, укажите корректный статус:"
         )
         return SUGGESTION_DATA
@@ -222,7 +304,7 @@ async def handle_suggestion_data(update: Update, context: ContextTypes.DEFAULT_T
     suggested_by = update.effective_user.username or str(update.effective_user.id)
     
     # Сохранение предложки в базу
-    db.add_suggestion(
+    await db.add_suggestion(
         username=username,
         desired_status=desired_status,
         proof=proof,
@@ -262,7 +344,7 @@ async def handle_suggestion_data(update: Update, context: ContextTypes.DEFAULT_T
             'full_name': update.effective_user.full_name
         }
         details = f"Предложил @{username} на статус {desired_status}"
-        await log_action("Пользователь отправил предложку", user_data, context, details)
+        log_action("Пользователь отправил предложку", user_data, details)
         
     except Exception as e:
         print(f"Ошибка при отправке предложки: {e}")
@@ -273,69 +355,29 @@ async def handle_suggestion_data(update: Update, context: ContextTypes.DEFAULT_T
     return ConversationHandler.END
 
 # Показать список пользователей
-async def show_user_list(update: Update, page: int = 1):
+async def show_user_list(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
     query = update.callback_query
-    await query.answer()
-    
-    # Используем кэш если есть
-    if not USER_LIST_CACHE:
-        USER_LIST_CACHE['users'] = db.get_all_users()
-        USER_LIST_CACHE['timestamp'] = datetime.now()
+    page = int(query.data.split('_')[-1])
     
-    # Если кэш устарел (старше 5 минут)
-    elif (datetime.now() - USER_LIST_CACHE['timestamp']).total_seconds() > 300:
-        USER_LIST_CACHE['users'] = db.get_all_users()
-        USER_LIST_CACHE['timestamp'] = datetime.now()
-    
-    users = USER_LIST_CACHE['users']
-    
-    if not users:
+    rendered = await user_list.render(page)
+    if rendered is None:
         await query.edit_message_text("Список пользователей пуст.")
         return
     
-    total_pages = (len(users) // 20 + (1 if len(users) % 20 else 0))
-    page = max(1, min(page, total_pages))
-    
-    start_idx = (page - 1) * 20
-    end_idx = start_idx + 20
-    page_users = users[start_idx:end_idx]
-    
-    message = f"📋 Список пользователей (Страница {page}/{total_pages}):\n\n"
-    prev_status = None
-    
-    for username, status in page_users:
-        if status != prev_status:
-            if prev_status is not None:
-                message += "——————————————————\n"
-            prev_status = status
-        
-        emoji = STATUS_EMOJIS.get(status, '')
-        status_name = STATUS_NAMES.get(status, status.capitalize())
-        message += f"{emoji} {status_name} - @{username}\n"
-    
-    keyboard = []
-    if page > 1:
-        keyboard.append(InlineKeyboardButton("⬅️ Назад", callback_data=f'user_list_{page-1}'))
-    if page < total_pages:
-        keyboard.append(InlineKeyboardButton("➡️ Вперед", callback_data=f'user_list_{page+1}'))
-    
-    keyboard = [keyboard] if keyboard else []
-    keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    message, reply_markup, _ = rendered
     await query.edit_message_text(message, reply_markup=reply_markup)
 
 # Показать профиль пользователя
-async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
     query = update.callback_query
-    await query.answer()
     user = update.effective_user
     
     # Получение статуса пользователя
     if user.id in ADMIN_IDS:
         status = 'admin'
     else:
-        status = db.get_user_status(user.username or str(user.id))
+        status = db.lookup_status(user.username or str(user.id))
+    history = await db.get_status_history(user.username or str(user.id))
     
     # Определение эмодзи и названия статуса
     if status:
@@ -352,381 +394,182 @@ async def show_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"🪪 Имя: {user.full_name}\n"
         f"{emoji} Статус: {status_name}\n"
         f"🆔 ID: {user.id}\n"
-        f"📃 Username: @{user.username if user.username else 'Отсутствует'}\n"
+        f"📃 Username: @{user.username if user.username else 'Отсутствует'}"
+        f"{status_timeline(history)}"
     )
     
-    keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(message, reply_markup=reply_markup)
+    await query.edit_message_text(message, reply_markup=BACK_TO_MAIN_MARKUP)
 
-# Функция для генерации и отправки статистики
-async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# Очередь предложек: просмотр страниц, одобрение и отклонение
+async def handle_review(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
     query = update.callback_query
-    await query.answer()
+    data = query.data
     
-    try:
-        total_bot_users = db.get_total_bot_users()
-        total_listed_users = db.get_total_listed_users()
-        total_admins = len(ADMIN_IDS)
-        status_counts = db.get_status_counts()
-    except Exception as e:
-        print(f"Ошибка получения статистики: {e}")
-        await query.edit_message_text("❌ Ошибка получения статистики")
+    if data.startswith('review_'):
+        text, reply_markup = await review.render(int(data.split('_')[-1]))
+        await query.edit_message_text(text, reply_markup=reply_markup)
         return
+    
+    parsed = parse_action(data)
+    if parsed is None:
+        return
+    action, suggestion_ids, after_id = parsed
+    
+    if action == 'no':
+        rejected = await db.reject_suggestions(suggestion_ids)
+        notice = f"❌ Предложка #{suggestion_ids[0]} отклонена." if rejected else "ℹ️ Предложка уже рассмотрена."
+        details = f"Отклонена предложка #{suggestion_ids[0]}"
+    else:
+        # Одобрение всех предложек страницы - одна транзакция
+        approved = await db.approve_suggestions(suggestion_ids)
+        if approved:
+            notice = "✅ Одобрено: " + ", ".join(
+                f"@{username} ({STATUS_NAMES.get(status, status)})" for username, status in approved
+            )
+        else:
+            notice = "ℹ️ Предложки уже рассмотрены."
+        details = f"Одобрено {len(approved)} из {len(suggestion_ids)}: " + ", ".join(
+            f"@{username} -> {status}" for username, status in approved
+        )
+    
+    text, reply_markup = await review.render(after_id, notice)
+    await query.edit_message_text(text, reply_markup=reply_markup)
+    
+    admin_data = {
+        'id': update.effective_user.id,
+        'username': update.effective_user.username,
+        'full_name': update.effective_user.full_name
+    }
+    log_action("Рассмотрение предложек", admin_data, details)
 
-    # Генерация HTML
-    status_table = ""
-    for status, count in status_counts.items():
-        status_name = STATUS_NAMES.get(status, status.capitalize())
-        emoji = STATUS_EMOJIS.get(status, '')
-        status_table += f"""
-        <tr>
-            <td>{emoji} {status_name}</td>
-            <td>{count}</td>
-        </tr>
-        """
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Статистика бота</title>
-        <style>
-            body {{
-                background-color: #0a0a0a;
-                background-image: url('https://i.pinimg.com/originals/1b/3b/8f/1b3b8f7a8e2a1e4e7b0e7d0a3b3e3e3e.jpg');
-                background-size: cover;
-                color: #00ff00;
-                font-family: 'Courier New', monospace;
-                padding: 20px;
-            }}
-            .container {{
-                background-color: rgba(0, 0, 0, 0.85);
-                border: 1px solid #00ff00;
-                border-radius: 10px;
-                padding: 30px;
-                margin: 20px auto;
-                width: 80%;
-                max-width: 600px;
-                box-shadow: 0 0 20px rgba(0, 255, 0, 0.3);
-            }}
-            h1 {{
-                text-align: center;
-                color: #00ff00;
-                text-shadow: 0 0 10px #00ff00;
-                margin-bottom: 30px;
-                font-size: 28px;
-                border-bottom: 2px solid #00ff00;
-                padding-bottom: 10px;
-            }}
-            .stat-item {{
-                margin: 20px 0;
-                padding: 15px;
-                background-color: rgba(0, 30, 0, 0.4);
-                border-left: 4px solid #00ff00;
-                border-radius: 5px;
-                transition: all 0.3s;
-            }}
-            .stat-item:hover {{
-                background-color: rgba(0, 50, 0, 0.6);
-                transform: translateX(10px);
-            }}
-            .stat-label {{
-                font-size: 18px;
-                margin-bottom: 8px;
-                color: #00cc00;
-            }}
-            .stat-value {{
-                font-size: 32px;
-                font-weight: bold;
-                color: #ffffff;
-                text-shadow: 0 0 8px #00ff00;
-            }}
-            .status-table {{
-                width: 100%;
-                margin-top: 20px;
-                border-collapse: collapse;
-            }}
-            .status-table th, .status-table td {{
-                padding: 12px;
-                text-align: left;
-                border-bottom: 1px solid #00ff00;
-            }}
-            .status-table th {{
-                background-color: rgba(0, 50, 0, 0.5);
-            }}
-            .footer {{
-                text-align: center;
-                margin-top: 30px;
-                font-size: 14px;
-                color: #008800;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>📊 СТАТИСТИКА БОТА</h1>
-            
-            <div class="stat-item">
-                <div class="stat-label">👤 Всего пользователей бота</div>
-                <div class="stat-value">{total_bot_users}</div>
-            </div>
-            
-            <div class="stat-item">
-                <div class="stat-label">📝 Пользователей в базе</div>
-                <div class="stat-value">{total_listed_users}</div>
-            </div>
-            
-            <div class="stat-item">
-                <div class="stat-label">👑 Администраторов</div>
-                <div class="stat-value">{total_admins}</div>
-            </div>
-            
-            <table class="status-table">
-                <thead>
-                    <tr>
-                        <th>Статус</th>
-                        <th>Количество</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {status_table}
-                </tbody>
-            </table>
-            
-            <div class="footer">
-                {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    # Сохранение в файл
-    filename = "statistics.html"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html_content)
-    
-    # Отправка файла
+# Функция для отправки статистики: отчёт берётся из памяти (кроме числа
+# пользователей бота), без временных файлов
+async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
+    query = update.callback_query
+    # Отвечаем сразу: отправка документа занимает время
+    await answer()
+    
     try:
         await context.bot.send_document(
             chat_id=update.effective_user.id,
-            document=open(filename, "rb"),
+            document=await statistics.render(),
+            filename="statistics.html",
             caption="📊 Статистика бота"
         )
-        os.remove(filename)  # Удаление временного файла
     except Exception as e:
         print(f"Ошибка отправки статистики: {e}")
         await query.edit_message_text("❌ Ошибка отправки статистики")
 
-# Обработчик кнопок
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+# Кнопка "Я подписался": проверка без кэша
+async def recheck_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
+    if await check_subscription(update.effective_user.id, context, force=True):
+        await start(update, context)
+    else:
+        await answer("Вы не подписаны на все каналы!", show_alert=True)
+
+# Проверка подписки перед остальными кнопками
+async def require_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer) -> bool:
+    if await check_subscription(update.effective_user.id, context):
+        return True
+    await send_subscription_request(update, context)
+    return False
+
+# Переключение техработ. Флаг хранится в базе и переживает перезапуск;
+# при включении уведомление рассылается через движок рассылок, прогресс -
+# в этом же сообщении
+async def toggle_maintenance(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
     query = update.callback_query
-    await query.answer()
-    
-    # Проверка подписки
-    if query.data == 'check_subscription':
-        if await check_subscription(query.from_user.id, context):
-            await start(update, context)
-        else:
-            await query.answer("Вы не подписаны на все каналы!", show_alert=True)
-        return
-    
-    # Проверка подписки для других действий
-    if not await check_subscription(query.from_user.id, context):
-        await send_subscription_request(update, context)
-        return
-    
-    # Обработка кнопки предложки
-    if query.data == 'suggest_user':
-        await suggest_user(update, context)
-        return SUGGESTION_DATA
-    
-    # Обработка админских кнопок
-    if query.data == 'statistics':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        await show_statistics(update, context)
-        return
-    
-    if query.data == 'maintenance':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        # Рассылка уведомления
-        users = db.get_all_bot_users()
-        for user_id in users:
-            try:
-                await context.bot.send_message(
-                    chat_id=user_id,
-                    text="🔧 Внимание! Бот временно недоступен из-за технических работ. Приносим извинения за неудобства."
-                )
-                await asyncio.sleep(0.05)  # Задержка между сообщениями
-            except Exception as e:
-                print(f"Ошибка рассылки техработ: {e}")
-        
-        await query.edit_message_text(
-            "✅ Уведомление о технических работах разослано всем пользователям."
-        )
-        
-        # Логирование
-        admin_data = {
-            'id': update.effective_user.id,
-            'username': update.effective_user.username,
-            'full_name': update.effective_user.full_name
-        }
-        await log_action("Рассылка о техработах", admin_data, context)
-        return
-    
-    if query.data == 'broadcast':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        await query.edit_message_text("📢 Введите сообщение для рассылки всем пользователям:")
-        return BROADCAST_MESSAGE
-    
-    if query.data == 'block_user':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        await query.edit_message_text(
-            "⛔ Введите username пользователя для блокировки:\n"
-            "Пример: @username"
-        )
-        return BLOCK_USER
-    
-    if query.data == 'unblock_user':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        await query.edit_message_text(
-            "✅ Введите username пользователя для разблокировки:\n"
-            "Пример: @username"
-        )
-        return UNBLOCK_USER
-    
-    if query.data == 'add_user':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        await query.edit_message_text(
-            "➕ Введите username и статус пользователя:\n"
-            "Пример: @username status\n\n"
-            "Доступные статусы: verify, garant, media, fame, scam, beach, new, pdf"
-        )
-        return ADD_USER
-    
-    if query.data == 'remove_user':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.answer("❌ У вас нет прав для выполнения этой команды.", show_alert=True)
-            return
-        
-        await query.edit_message_text(
-            "➖ Введите username пользователя для удаления:\n"
-            "Пример: @username"
-        )
-        return REMOVE_USER
-    
-    # Обработка других кнопок
-    if query.data == 'check_user':
+    admin_data = {
+        'id': update.effective_user.id,
+        'username': update.effective_user.username,
+        'full_name': update.effective_user.full_name
+    }
+    if db.maintenance:
+        await db.set_maintenance(False)
         await query.edit_message_text(
-            "Введите username пользователя для проверки (например, @username или просто username):"
+            "✅ Технические работы завершены, бот снова доступен пользователям.",
+            reply_markup=admin_panel_markup()
         )
-        return
-    
-    if query.data.startswith('user_list_'):
-        page = int(query.data.split('_')[-1])
-        await show_user_list(update, page)
-        return
-    
-    if query.data == 'my_profile':
-        await show_profile(update, context)
-        return
-    
-    if query.data == 'admin_panel':
-        if update.effective_user.id not in ADMIN_IDS:
-            await query.edit_message_text("❌ У вас нет доступа к админ-панели.")
-            return
-        
-        keyboard = [
-            [InlineKeyboardButton("➕ Добавить пользователя", callback_data='add_user'),
-             InlineKeyboardButton("➖ Удалить пользователя", callback_data='remove_user')],
-            [InlineKeyboardButton("📢 Рассылка", callback_data='broadcast'),
-             InlineKeyboardButton("📊 Статистика", callback_data='statistics')],
-            [InlineKeyboardButton("🔧 Тех работы", callback_data='maintenance'),
-             InlineKeyboardButton("⛔ Заблокировать", callback_data='block_user')],
-            [InlineKeyboardButton("✅ Разблокировать", callback_data='unblock_user')],
-            [InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text("🛠️ Админ панель:", reply_markup=reply_markup)
-        return
-    
-    if query.data == 'back_to_main':
-        keyboard = [
-            [InlineKeyboardButton("🔍 Проверить пользователя", callback_data='check_user')],
-            [InlineKeyboardButton("📋 Список пользователей", callback_data='user_list_1')],
-            [InlineKeyboardButton("👤 Мой профиль", callback_data='my_profile')],
-            [InlineKeyboardButton("📨 Предложить пользователя", callback_data='suggest_user')]
-        ]
-        if update.effective_user.id in ADMIN_IDS:
-            keyboard.append([InlineKeyboardButton("🛠️ Админ панель", callback_data='admin_panel')])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text("Главное меню:", reply_markup=reply_markup)
+        log_action("Завершение техработ", admin_data)
         return
 
+    await db.set_maintenance(True)
+    await bot_users.flush()
+    total_users, skipped = await db.count_broadcast_audience()
+    await query.edit_message_text(
+        f"🔧 Рассылка уведомления о техработах на {total_users} пользователей..."
+    )
+    await broadcasts.start_job(
+        context.bot,
+        'maintenance',
+        MAINTENANCE_NOTICE,
+        query.message.chat_id,
+        query.message.message_id,
+        total_users,
+        skipped
+    )
+    log_action("Рассылка о техработах", admin_data)
+
+# Кнопка, которая только просит ввести данные
+def prompt(text: str, state: Optional[int] = None):
+    async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
+        await update.callback_query.edit_message_text(text)
+        return state
+    return handler
+
+async def show_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
+    await update.callback_query.edit_message_text("🛠️ Админ панель:", reply_markup=admin_panel_markup())
+
+async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE, answer: CallbackAnswer):
+    await update.callback_query.edit_message_text(
+        "Главное меню:", reply_markup=main_menu_markup(update.effective_user.id)
+    )
+
 # Проверка пользователя
+@timed('check_user')
 async def check_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
-    if re.match(r'^\s*1\.\s*Желаемый статус:', text, re.IGNORECASE):
+    if SUGGESTION_PATTERN.match(text):
         return
     
-    username = re.sub(r'^@', '', text).lower()
+    username = LEADING_AT_PATTERN.sub('', text).lower()
     
-    # Проверка на администратора
-    if username in ADMIN_USERNAMES.values():
-        for admin_id, admin_username in ADMIN_USERNAMES.items():
-            if admin_username.lower() == username.lower():
-                status = 'admin'
-                username = admin_username
-                break
-    else:
-        status = db.get_user_status(username)
+    # Поиск по индексу в памяти (администраторы уже внесены в него)
+    status = db.lookup_status(username)
+    if status == 'admin':
+        username = db.admin_usernames.get(username, username)
     
     if not status:
+        # Подсказки по индексу похожих имён; username в Telegram не длиннее
+        # 32 символов, как и запрос в инлайн-режиме
+        suggestions = ""
+        matches = username_search.suggest(username[:32])
+        if matches:
+            suggestions = "🤔 Возможно, вы имели в виду:\n" + "".join(
+                f"{STATUS_EMOJIS.get(status, '')} @{db.admin_usernames.get(match, match)} - "
+                f"{STATUS_NAMES.get(status, status.capitalize())}\n"
+                for match, status in matches
+            ) + "\n"
+        
         await update.message.reply_text(
             f"🔍 Пользователь @{username} не найден в нашей базе данных.\n\n"
+            f"{suggestions}"
             "Вы можете предложить их внесение нашим Администраторам:\n"
             "@dev_sv4, @godkivalovskiy"
         )
         return
     
-    emoji = STATUS_EMOJIS.get(status, '')
-    status_name = STATUS_NAMES.get(status, status.capitalize())
-    description = STATUS_DESCRIPTIONS.get(status, 'Неизвестный статус')
-    
-    await update.message.reply_text(
-        f"🔍 Результат проверки: @{username}\n\n"
-        f"{emoji} Статус: {status_name}\n"
-        f"📝 Описание: {description}"
-    )
+    history = await db.get_status_history(username)
+    await update.message.reply_text(status_card(username, status, history))
 
 # Добавление пользователя
 async def handle_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id not in ADMIN_IDS:
         await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
-        return
+        return ConversationHandler.END
     
     text = update.message.text.strip()
-    match = re.match(r'^/add\s+@?(\w+)\s+(verify|garant|scam|beach|new|pdf|media|fame)$', text, re.IGNORECASE)
+    match = ADD_COMMAND_PATTERN.match(text)
     
     if not match:
         await update.message.reply_text(
@@ -735,26 +578,25 @@ async def handle_add_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             "Доступные статусы: verify, garant, scam, beach, new, pdf, media, fame\n\n"
             "Пример: /add @username scam"
         )
-        return
+        return ConversationHandler.END
     
     username, status = match.groups()
-    db.add_user(username, status.lower())
-    
-    # Сброс кэша списка пользователей
-    if USER_LIST_CACHE:
-        USER_LIST_CACHE.clear()
+    status = status.lower()
+    # Затронутые страницы списка сбросит UserListPager
+    await db.add_user(username, status)
     
     status_name = STATUS_NAMES.get(status, status.capitalize())
     await update.message.reply_text(f"✅ Пользователь @{username} успешно добавлен с статусом: {status_name}")
+    return ConversationHandler.END
 
 # Удаление пользователя
 async def remove_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id not in ADMIN_IDS:
         await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
-        return
+        return ConversationHandler.END
     
     text = update.message.text.strip()
-    match = re.match(r'^/remove\s+@?(\w+)$', text, re.IGNORECASE)
+    match = REMOVE_COMMAND_PATTERN.match(text)
     
     if not match:
         await update.message.reply_text(
@@ -762,20 +604,79 @@ async def remove_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "/remove @username\n\n"
             "Пример: /remove @username"
         )
-        return
+        return ConversationHandler.END
     
     username = match.group(1)
     
-    if db.get_user_status(username):
-        db.remove_user(username)
+    if db.is_listed(username):
+        await db.remove_user(username)
         
-        # Сброс кэша списка пользователей
-        if USER_LIST_CACHE:
-            USER_LIST_CACHE.clear()
-            
         await update.message.reply_text(f"✅ Пользователь @{username} успешно удален из базы данных.")
     else:
         await update.message.reply_text(f"❌ Пользователь @{username} не найден в базе данных.")
+    return ConversationHandler.END
+
+# Импорт списка пользователей из CSV/JSONL, присланного администратором документом
+async def handle_users_import(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        return
+    
+    document = update.message.document
+    fmt = file_format(document.file_name)
+    if fmt is None:
+        await update.message.reply_text("❌ Поддерживаются файлы .csv (username,status) и .jsonl")
+        return
+    
+    progress_message = await update.message.reply_text("⏳ Импорт пользователей...")
+    
+    async def report(text: str):
+        try:
+            await progress_message.edit_text(text)
+        except Exception as e:
+            print(f"Ошибка обновления прогресса импорта: {e}")
+    
+    users_import = UserImport(db, fmt)
+    try:
+        await users_import.run(await document.get_file(), report)
+        text = users_import.summary_text()
+    except Exception as e:
+        print(f"Ошибка импорта пользователей: {e}")
+        text = f"❌ Импорт прерван: {e}\n\n{users_import.summary_text()}"
+    await report(text)
+    
+    admin_data = {
+        'id': update.effective_user.id,
+        'username': update.effective_user.username,
+        'full_name': update.effective_user.full_name
+    }
+    details = f"{document.file_name}: записано {users_import.imported}, ошибок {users_import.error_count}"
+    log_action("Импорт пользователей", admin_data, details)
+
+# Выгрузка списка пользователей: /export [csv|jsonl]
+async def handle_users_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("❌ У вас нет прав для выполнения этой команды.")
+        return
+    
+    fmt = context.args[0].lower() if context.args else 'csv'
+    if fmt not in FORMATS:
+        await update.message.reply_text("❌ Неверный формат. Используйте: /export csv или /export jsonl")
+        return
+    
+    buffer = await export_users(db, fmt)
+    try:
+        await context.bot.send_document(
+            chat_id=update.effective_chat.id,
+            document=buffer,
+            filename=f"users.{fmt}",
+            caption=f"📤 Список пользователей: {len(db.status_index)}"
+        )
+    except Exception as e:
+        print(f"Ошибка выгрузки пользователей: {e}")
+        await update.message.reply_text("❌ Ошибка выгрузки пользователей")
+    finally:
+        buffer.close()
 
 # Рассылка сообщений
 async def handle_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -784,54 +685,28 @@ async def handle_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     message_text = update.message.text
-    users = db.get_all_bot_users()
-    total_users = len(users)
+    
+    # Учитываем пользователей, ещё не сброшенных из буфера; заблокировавшие
+    # бота и недоступные не считаются
+    await bot_users.flush()
+    total_users, skipped = await db.count_broadcast_audience()
     
     if total_users == 0:
         await update.message.reply_text("❌ Нет пользователей для рассылки.")
         return ConversationHandler.END
     
-    # Статусное сообщение
+    # Статусное сообщение; дальше его обновляет движок рассылок по таймеру
     status_msg = await update.message.reply_text(f"📢 Начата рассылка на {total_users} пользователей...\n"
                                                 f"🔄 Отправлено: 0/{total_users} (0%)")
     
-    success = 0
-    fail = 0
-    
-    for i, user_id in enumerate(users):
-        try:
-            await context.bot.send_message(
-                chat_id=user_id,
-                text=message_text
-            )
-            success += 1
-        except Exception as e:
-            print(f"Ошибка рассылки: {e}")
-            fail += 1
-        
-        # Обновление статуса каждые 10 сообщений или последнее сообщение
-        if i % 10 == 0 or i == total_users - 1:
-            percent = int((i + 1) / total_users * 100)
-            progress = "🟢" * (percent // 10) + "⚪" * (10 - percent // 10)
-            try:
-                await status_msg.edit_text(
-                    f"📢 Рассылка на {total_users} пользователей...\n"
-                    f"🔄 Отправлено: {i+1}/{total_users} ({percent}%)\n"
-                    f"{progress}\n"
-                    f"✅ Успешно: {success} | ❌ Ошибок: {fail}"
-                )
-            except:
-                pass
-        
-        # Задержка между сообщениями
-        await asyncio.sleep(0.05)  # 50 мс
-    
-    # Итоговое сообщение
-    await status_msg.edit_text(
-        f"📢 Рассылка завершена:\n"
-        f"👤 Всего пользователей: {total_users}\n"
-        f"✅ Успешно: {success}\n"
-        f"❌ Неудачно: {fail}"
+    await broadcasts.start_job(
+        context.bot,
+        'broadcast',
+        message_text,
+        status_msg.chat_id,
+        status_msg.message_id,
+        total_users,
+        skipped
     )
     
     # Логирование
@@ -840,7 +715,7 @@ async def handle_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'username': update.effective_user.username,
         'full_name': update.effective_user.full_name
     }
-    await log_action("Рассылка сообщения", admin_data, context, f"Текст: {message_text[:50]}...")
+    log_action("Рассылка сообщения", admin_data, f"Текст: {message_text[:50]}...")
     return ConversationHandler.END
 
 # Блокировка пользователя
@@ -850,7 +725,7 @@ async def block_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     text = update.message.text.strip()
-    username = re.sub(r'^@', '', text).lower()
+    username = LEADING_AT_PATTERN.sub('', text).lower()
     
     if not username:
         await update.message.reply_text(
@@ -860,7 +735,7 @@ async def block_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ConversationHandler.END
     
-    if db.block_user(username):
+    if await db.block_user(username):
         await update.message.reply_text(f"⛔ Пользователь @{username} успешно заблокирован.")
     else:
         await update.message.reply_text(f"❌ Пользователь @{username} не найден или уже заблокирован.")
@@ -871,7 +746,7 @@ async def block_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'username': update.effective_user.username,
         'full_name': update.effective_user.full_name
     }
-    await log_action("Блокировка пользователя", admin_data, context, f"Пользователь: @{username}")
+    log_action("Блокировка пользователя", admin_data, f"Пользователь: @{username}")
     return ConversationHandler.END
 
 # Разблокировка пользователя
@@ -881,7 +756,7 @@ async def unblock_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     text = update.message.text.strip()
-    username = re.sub(r'^@', '', text).lower()
+    username = LEADING_AT_PATTERN.sub('', text).lower()
     
     if not username:
         await update.message.reply_text(
@@ -891,7 +766,7 @@ async def unblock_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ConversationHandler.END
     
-    if db.unblock_user(username):
+    if await db.unblock_user(username):
         await update.message.reply_text(f"✅ Пользователь @{username} успешно разблокирован.")
     else:
         await update.message.reply_text(f"❌ Пользователь @{username} не найден или не был заблокирован.")
@@ -902,7 +777,7 @@ async def unblock_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         'username': update.effective_user.username,
         'full_name': update.effective_user.full_name
     }
-    await log_action("Разблокировка пользователя", admin_data, context, f"Пользователь: @{username}")
+    log_action("Разблокировка пользователя", admin_data, f"Пользователь: @{username}")
     return ConversationHandler.END
 
 # Отмена действия
@@ -919,28 +794,86 @@ async def panel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("❌ У вас нет доступа к админ-панели.")
         return
     
-    keyboard = [
-        [InlineKeyboardButton("➕ Добавить пользователя", callback_data='add_user'),
-         InlineKeyboardButton("➖ Удалить пользователя", callback_data='remove_user')],
-        [InlineKeyboardButton("📢 Рассылка", callback_data='broadcast'),
-         InlineKeyboardButton("📊 Статистика", callback_data='statistics')],
-        [InlineKeyboardButton("🔧 Тех работы", callback_data='maintenance'),
-         InlineKeyboardButton("⛔ Заблокировать", callback_data='block_user')],
-        [InlineKeyboardButton("✅ Разблокировать", callback_data='unblock_user')],
-        [InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     if update.callback_query:
-        await update.callback_query.edit_message_text("🛠️ Админ панель:", reply_markup=reply_markup)
+        await update.callback_query.edit_message_text("🛠️ Админ панель:", reply_markup=admin_panel_markup())
     else:
-        await update.message.reply_text("🛠️ Админ панель:", reply_markup=reply_markup)
+        await update.message.reply_text("🛠️ Админ панель:", reply_markup=admin_panel_markup())
     
     return
 
 # Главная функция
-def main():
-    application = Application.builder().token(BOT_TOKEN).build()
+async def on_startup(application: Application):
+    await bot_users.start()
+    await changelog.start()
+    action_log.start(application.bot)
+    await metrics_server.start()
+
+# Незавершённые рассылки возобновляет только основной процесс, иначе в
+# режиме нескольких воркеров (supervisor.py) каждый разослал бы их заново
+async def on_primary_startup(application: Application):
+    await on_startup(application)
+    await broadcasts.resume(application.bot)
+
+# Вызывается до shutdown, пока бот ещё может отправлять сообщения:
+# сохраняем прогресс рассылок и отправляем накопленные записи
+async def on_stop(application: Application):
+    await metrics_server.stop()
+    await broadcasts.stop()
+    await bot_users.stop()
+    await changelog.stop()
+    await action_log.stop()
+
+async def on_shutdown(application: Application):
+    db.close()
+
+# Маршруты кнопок: callback_data -> обработчик. Каждое нажатие получает
+# ровно один answerCallbackQuery, права администратора проверяет роутер.
+callbacks = CallbackRouter(guard=require_subscription)
+callbacks.route('check_subscription', recheck_subscription, guarded=False)
+callbacks.route('suggest_user', suggest_user)
+callbacks.route('check_user', prompt(
+    "Введите username пользователя для проверки (например, @username или просто username):"
+))
+callbacks.route('user_list_', show_user_list, prefix=True)
+callbacks.route('my_profile', show_profile)
+callbacks.route('back_to_main', back_to_main)
+callbacks.route('admin_panel', show_admin_panel, admin=True)
+callbacks.route('statistics', show_statistics, admin=True)
+callbacks.route('maintenance', toggle_maintenance, admin=True)
+callbacks.route('broadcast', prompt("📢 Введите сообщение для рассылки всем пользователям:", BROADCAST_MESSAGE), admin=True)
+callbacks.route('block_user', prompt("⛔ Введите username пользователя для блокировки:\nПример: @username", BLOCK_USER), admin=True)
+callbacks.route('unblock_user', prompt("✅ Введите username пользователя для разблокировки:\nПример: @username", UNBLOCK_USER), admin=True)
+callbacks.route('add_user', prompt(
+    "➕ Введите username и статус пользователя:\n"
+    "Пример: @username status\n\n"
+    "Доступные статусы: verify, garant, media, fame, scam, beach, new, pdf",
+    ADD_USER
+), admin=True)
+callbacks.route('remove_user', prompt("➖ Введите username пользователя для удаления:\nПример: @username", REMOVE_USER), admin=True)
+callbacks.route('review_', handle_review, admin=True, prefix=True)
+callbacks.route('rv_', handle_review, admin=True, prefix=True)
+button_handler = timed('button_handler', lambda update: callback_family(update.callback_query.data))(callbacks.handle)
+
+# Сборка приложения со всеми обработчиками; base_url позволяет направить
+# запросы к Bot API на другой сервер (например, на локальный для бенчмарков),
+# primary=False - для воркеров supervisor.py, кроме первого
+def build_application(token: str = BOT_TOKEN, base_url: Optional[str] = None, primary: bool = True) -> Application:
+    builder = (
+        Application.builder().token(token)
+        .concurrent_updates(OrderedUpdateProcessor())
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .get_updates_request(InstrumentedRequest())
+        .persistence(SQLitePersistence(db, bot_data=primary))
+        .post_init(on_primary_startup if primary else on_startup)
+        .post_stop(on_stop).post_shutdown(on_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    
+    # Блокировки и техработы, затем ограничение флуда - до всех остальных обработчиков
+    application.add_handler(TypeHandler(Update, gatekeeper.check), group=-2)
+    application.add_handler(TypeHandler(Update, flood_control.check), group=-1)
     
     # Регистрация обработчиков команд
     application.add_handler(CommandHandler('start', start))
@@ -950,22 +883,34 @@ def main():
     application.add_handler(CommandHandler('block', block_user))
     application.add_handler(CommandHandler('unblock', unblock_user))
     application.add_handler(CommandHandler('broadcast', handle_broadcast))
+    application.add_handler(CommandHandler('export', handle_users_export))
+    application.add_handler(ChatMemberHandler(track_bot_membership, ChatMemberHandler.MY_CHAT_MEMBER))
+    # Инлайн-режим: block=False, чтобы ожидание debounce не задерживало другие обновления
+    application.add_handler(InlineQueryHandler(inline_search.handle, block=False))
+    application.add_handler(MessageHandler(
+        filters.Document.FileExtension('csv') | filters.Document.FileExtension('jsonl'),
+        handle_users_import
+    ))
     
     # Обработчик предложений
     suggestion_conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(suggest_user, pattern='^suggest_user$')],
+        entry_points=[CallbackQueryHandler(button_handler, pattern='^suggest_user$')],
         states={
             SUGGESTION_DATA: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_suggestion_data)
             ],
         },
         fallbacks=[CommandHandler('cancel', cancel)],
-        per_message=True
+        name='suggestion',
+        persistent=True
     )
     
-    # Обработчик админских действий
+    # Обработчик админских действий: кнопки-приглашения админ-панели через
+    # роутер (он же проверяет права) переводят в состояние ввода
     admin_conv_handler = ConversationHandler(
-        entry_points=[],
+        entry_points=[CallbackQueryHandler(
+            button_handler, pattern='^(broadcast|block_user|unblock_user|add_user|remove_user)$'
+        )],
         states={
             BROADCAST_MESSAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_broadcast)],
             BLOCK_USER: [MessageHandler(filters.TEXT & ~filters.COMMAND, block_user)],
@@ -974,6 +919,8 @@ def main():
             REMOVE_USER: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_user)],
         },
         fallbacks=[CommandHandler('cancel', cancel)],
+        name='admin_action',
+        persistent=True
     )
     
     # Регистрируем обработчики с приоритетом
@@ -983,11 +930,18 @@ def main():
     
     # Обработчик проверки пользователя (низкий приоритет)
     application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & ~filters.Regex(r'^\s*1\.\s*Желаемый статус:'), 
+        filters.TEXT & ~filters.COMMAND & ~filters.Regex(SUGGESTION_PATTERN),
         check_user
     ))
     
-    application.run_polling()
+    return application
+
+def main():
+    application = build_application()
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
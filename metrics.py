@@ -0,0 +1,233 @@
+import time
+import asyncio
+import functools
+import threading
+from bisect import bisect_left
+from typing import Callable, Optional
+from telegram.request import HTTPXRequest
+from cache import LRUCache
+from webhook import read_request, write_response
+from config import METRICS_LISTEN, METRICS_PORT, METRICS_PATH
+
+# Границы корзин гистограмм в секундах: от запроса к индексу SQLite
+# до медленного вызова Bot API
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+# Метрики пишутся и из event loop, и из потоков базы, поэтому изменение
+# серии идёт под блокировкой; сама запись - индекс корзины и два сложения
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}  # значения меток -> счётчик
+        self._lock = threading.Lock()
+
+    def inc(self, values: tuple = (), amount: int = 1):
+        with self._lock:
+            self.series[values] = self.series.get(values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = sorted(self.series.items())
+        for values, count in series:
+            lines.append(f"{self.name}{_label_text(self.labels, values)} {count}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # значения меток -> [число наблюдений по корзинам..., сверх последней, сумма]
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, values: tuple, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((values, list(series)) for values, series in self.series.items())
+
+        for values, series in snapshot:
+            total = 0
+            bounds = [f'{bound:g}' for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, series):
+                total += count
+                bucket = _label_text(self.labels, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{bucket} {total}")
+            labels = _label_text(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+HANDLER_LATENCY = Histogram(
+    'bot_handler_duration_seconds', "Время работы обработчика обновления", ('handler',)
+)
+HANDLER_ERRORS = Counter(
+    'bot_handler_errors_total', "Обработчики, завершившиеся исключением", ('handler',)
+)
+BOT_API_LATENCY = Histogram(
+    'bot_api_request_duration_seconds', "Время запроса к Bot API", ('method',)
+)
+BOT_API_REQUESTS = Counter(
+    'bot_api_requests_total', "Запросы к Bot API по HTTP-статусу ответа", ('method', 'status')
+)
+DB_QUERY_LATENCY = Histogram(
+    'bot_db_query_duration_seconds', "Время запроса к SQLite в потоке базы", ('query',)
+)
+DB_QUERY_ERRORS = Counter(
+    'bot_db_query_errors_total', "Запросы к SQLite, завершившиеся исключением", ('query',)
+)
+FLOOD_LIMITED = Counter(
+    'bot_flood_limited_total', "Обновления, отброшенные ограничителем флуда", ('category',)
+)
+GATEKEEPER_REJECTED = Counter(
+    'bot_gatekeeper_rejected_total', "Обновления от заблокированных и во время техработ", ('reason',)
+)
+METRICS = [
+    HANDLER_LATENCY, HANDLER_ERRORS, BOT_API_LATENCY, BOT_API_REQUESTS,
+    DB_QUERY_LATENCY, DB_QUERY_ERRORS, FLOOD_LIMITED, GATEKEEPER_REJECTED
+]
+CACHES = {}  # имя -> LRUCache
+
+
+def register_cache(name: str, cache: LRUCache):
+    CACHES[name] = cache
+
+
+def _render_caches() -> list:
+    lines = []
+    for metric, kind, documentation, read in (
+        ('bot_cache_hits_total', 'counter', "Попадания в кэш", lambda cache: cache.hits),
+        ('bot_cache_misses_total', 'counter', "Промахи кэша", lambda cache: cache.misses),
+        ('bot_cache_entries', 'gauge', "Записей в кэше", len)
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        for name, cache in sorted(CACHES.items()):
+            lines.append(f'{metric}{{cache="{name}"}} {read(cache)}')
+    return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    lines += _render_caches()
+    return '\n'.join(lines) + '\n'
+
+
+# Семейство callback_data без изменяемых частей: 'user_list_5' -> 'user_list',
+# 'rv_all_0_3-4' -> 'rv_all'; иначе у гистограммы будет серия на каждую страницу
+def callback_family(data: Optional[str]) -> str:
+    family = []
+    for part in (data or '').split('_'):
+        if not part or part[0].isdigit() or '-' in part:
+            break
+        family.append(part)
+    return '_'.join(family) or 'other'
+
+
+# Декоратор обработчика: время работы в HANDLER_LATENCY. family(update)
+# уточняет метку, например семейством callback_data для button_handler
+def timed(handler: str, family: Optional[Callable] = None):
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(update, context):
+            name = f"{handler}/{family(update)}" if family else handler
+            started = time.perf_counter()
+            try:
+                return await fn(update, context)
+            except Exception:
+                HANDLER_ERRORS.inc((name,))
+                raise
+            finally:
+                HANDLER_LATENCY.observe((name,), time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# HTTPXRequest с учётом каждого вызова Bot API; метод берётся из конца URL
+class InstrumentedRequest(HTTPXRequest):
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs) -> tuple:
+        endpoint = url.rsplit('/', 1)[-1]
+        status = 'error'
+        started = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, method, request_data, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            BOT_API_LATENCY.observe((endpoint,), time.perf_counter() - started)
+            BOT_API_REQUESTS.inc((endpoint, status))
+
+
+# Отдаёт METRICS_PATH в текстовом формате Prometheus; по умолчанию слушает
+# только localhost, наружу метрики не публикуются
+class MetricsServer:
+    def __init__(self, listen: str = METRICS_LISTEN, port: int = METRICS_PORT, path: str = METRICS_PATH):
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self._server = None
+
+    async def start(self):
+        if not self.port:
+            return
+        self._server = await asyncio.start_server(self._serve, self.listen, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, _, body = request
+                if path != self.path:
+                    write_response(writer, 404)
+                elif method != 'GET':
+                    write_response(writer, 405)
+                else:
+                    write_response(writer, 200, render().encode(), CONTENT_TYPE)
+                await writer.drain()
+                if body is None:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,140 @@
+import json
+import pickle
+import asyncio
+from typing import Optional
+from telegram.ext import BasePersistence, PersistenceInput
+from database import Database
+from config import PERSISTENCE_UPDATE_INTERVAL
+
+
+# Persistence PTB в таблицах users.db: user_data, chat_data, bot_data и
+# состояния ConversationHandler переживают перезапуск бота.
+# Application раз в update_interval вызывает update_* для всех затронутых
+# пользователей и чатов; здесь изменения только копятся, а запись идёт одной
+# транзакцией после этого прохода. Словарь, pickle которого совпадает с уже
+# записанным, не пишется вовсе, пустой - удаляется.
+# bot_data общие для всех процессов supervisor.py, поэтому их хранит только
+# основной процесс (bot_data=True), иначе воркеры затирали бы одну строку.
+class SQLitePersistence(BasePersistence):
+    def __init__(self, db: Database, update_interval: float = PERSISTENCE_UPDATE_INTERVAL, bot_data: bool = True):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=bot_data, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db
+        self._written = {}  # (kind, id) -> hash записанного или записываемого pickle
+        self._pending = {}  # (kind, id) -> pickle или None для удаления
+        self._pending_states = {}  # (name, key) -> pickle или None для удаления
+        self._flush_task = None
+
+    async def _load(self, kind: str) -> dict:
+        data = {}
+        for entity_id, blob in await self.db.get_persistence_data(kind):
+            data[entity_id] = pickle.loads(blob)
+            self._written[(kind, entity_id)] = hash(blob)
+        return data
+
+    def _store(self, kind: str, entity_id: int, data: Optional[dict]):
+        key = (kind, entity_id)
+        blob = pickle.dumps(data, pickle.HIGHEST_PROTOCOL) if data else None
+        if (hash(blob) if blob is not None else None) == self._written.get(key):
+            self._pending.pop(key, None)
+            return
+        self._pending[key] = blob
+        self._schedule_flush()
+
+    # Все update_* одного прохода Application собраны в один gather и ничего
+    # не ждут, поэтому задача записи выполнится уже после них
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._write_pending())
+
+    async def get_user_data(self) -> dict:
+        return await self._load('user')
+
+    async def get_chat_data(self) -> dict:
+        return await self._load('chat')
+
+    async def get_bot_data(self) -> dict:
+        return (await self._load('bot')).get(0, {})
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {
+            tuple(json.loads(key)): pickle.loads(state)
+            for key, state in await self.db.get_conversations(name)
+        }
+
+    async def update_user_data(self, user_id: int, data: dict):
+        self._store('user', user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        self._store('chat', chat_id, data)
+
+    async def update_bot_data(self, data: dict):
+        self._store('bot', 0, data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]):
+        state = pickle.dumps(new_state, pickle.HIGHEST_PROTOCOL) if new_state is not None else None
+        self._pending_states[(name, json.dumps(list(key)))] = state
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int):
+        self._store('user', user_id, None)
+
+    async def drop_chat_data(self, chat_id: int):
+        self._store('chat', chat_id, None)
+
+    # Данные всегда берутся из памяти Application, перечитывать нечего
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
+
+    # Дожидается уже запущенной записи и пишет всё, что накопилось после неё
+    async def flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._write_pending()
+
+    async def _write_pending(self):
+        if not self._pending and not self._pending_states:
+            return
+        pending, self._pending = self._pending, {}
+        pending_states, self._pending_states = self._pending_states, {}
+
+        data = [(kind, entity_id, blob) for (kind, entity_id), blob in pending.items()]
+        conversations = [(name, key, state) for (name, key), state in pending_states.items()]
+
+        # _written обновляется до записи: значение, изменённое во время неё
+        # (в том числе обратно на прежнее), сравнивается уже с записываемым
+        # и снова попадёт в очередь
+        previous = {key: self._written.get(key) for key in pending}
+        for key, blob in pending.items():
+            if blob is None:
+                self._written.pop(key, None)
+            else:
+                self._written[key] = hash(blob)
+        try:
+            await self.db.save_persistence(data, conversations)
+        except Exception as e:
+            # Не записанное вернётся в очередь, если его не успели изменить снова
+            print(f"Ошибка сохранения persistence: {e}")
+            for key, blob in pending.items():
+                if self._written.get(key) == (hash(blob) if blob is not None else None):
+                    if previous[key] is None:
+                        self._written.pop(key, None)
+                    else:
+                        self._written[key] = previous[key]
+                self._pending.setdefault(key, blob)
+            for key, state in pending_states.items():
+                self._pending_states.setdefault(key, state)
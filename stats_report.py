@@ -0,0 +1,187 @@
+from datetime import datetime
+from config import ADMIN_IDS, STATUS_EMOJIS, STATUS_NAMES
+from database import Database
+
+
+# Место времени генерации в закэшированном отчёте
+GENERATED_AT_MARK = '\x00generated_at\x00'
+
+
+def _render_html(total_bot_users: int, total_listed_users: int, total_admins: int, status_counts: dict,
+                 generated_at: str) -> str:
+    # Генерация HTML
+    status_table = ""
+    for status, count in status_counts.items():
+        status_name = STATUS_NAMES.get(status, status.capitalize())
+        emoji = STATUS_EMOJIS.get(status, '')
+        status_table += f"""
+        <tr>
+            <td>{emoji} {status_name}</td>
+            <td>{count}</td>
+        </tr>
+        """
+
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>Статистика бота</title>
+        <style>
+            body {{
+                background-color: #0a0a0a;
+                background-image: url('https://i.pinimg.com/originals/1b/3b/8f/1b3b8f7a8e2a1e4e7b0e7d0a3b3e3e3e.jpg');
+                background-size: cover;
+                color: #00ff00;
+                font-family: 'Courier New', monospace;
+                padding: 20px;
+            }}
+            .container {{
+                background-color: rgba(0, 0, 0, 0.85);
+                border: 1px solid #00ff00;
+                border-radius: 10px;
+                padding: 30px;
+                margin: 20px auto;
+                width: 80%;
+                max-width: 600px;
+                box-shadow: 0 0 20px rgba(0, 255, 0, 0.3);
+            }}
+            h1 {{
+                text-align: center;
+                color: #00ff00;
+                text-shadow: 0 0 10px #00ff00;
+                margin-bottom: 30px;
+                font-size: 28px;
+                border-bottom: 2px solid #00ff00;
+                padding-bottom: 10px;
+            }}
+            .stat-item {{
+                margin: 20px 0;
+                padding: 15px;
+                background-color: rgba(0, 30, 0, 0.4);
+                border-left: 4px solid #00ff00;
+                border-radius: 5px;
+                transition: all 0.3s;
+            }}
+            .stat-item:hover {{
+                background-color: rgba(0, 50, 0, 0.6);
+                transform: translateX(10px);
+            }}
+            .stat-label {{
+                font-size: 18px;
+                margin-bottom: 8px;
+                color: #00cc00;
+            }}
+            .stat-value {{
+                font-size: 32px;
+                font-weight: bold;
+                color: #ffffff;
+                text-shadow: 0 0 8px #00ff00;
+            }}
+            .status-table {{
+                width: 100%;
+                margin-top: 20px;
+                border-collapse: collapse;
+            }}
+            .status-table th, .status-table td {{
+                padding: 12px;
+                text-align: left;
+                border-bottom: 1px solid #00ff00;
+            }}
+            .status-table th {{
+                background-color: rgba(0, 50, 0, 0.5);
+            }}
+            .footer {{
+                text-align: center;
+                margin-top: 30px;
+                font-size: 14px;
+                color: #008800;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>📊 СТАТИСТИКА БОТА</h1>
+            
+            <div class="stat-item">
+                <div class="stat-label">👤 Всего пользователей бота</div>
+                <div class="stat-value">{total_bot_users}</div>
+            </div>
+            
+            <div class="stat-item">
+                <div class="stat-label">📝 Пользователей в базе</div>
+                <div class="stat-value">{total_listed_users}</div>
+            </div>
+            
+            <div class="stat-item">
+                <div class="stat-label">👑 Администраторов</div>
+                <div class="stat-value">{total_admins}</div>
+            </div>
+            
+            <table class="status-table">
+                <thead>
+                    <tr>
+                        <th>Статус</th>
+                        <th>Количество</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {status_table}
+                </tbody>
+            </table>
+            
+            <div class="footer">
+                {generated_at}
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+
+    return html_content
+
+
+# Счётчики статистики в памяти. Количество по статусам обновляется при
+# каждом добавлении и удалении пользователя. Число пользователей бота -
+# строка counters, которую ведёт триггер на bot_users: одно чтение по ключу,
+# общее для всех процессов (новые /start попадают туда со сбросом буфера).
+# HTML-отчёт перерисовывается только после изменения счётчиков, время
+# генерации подставляется при каждой отправке.
+class StatisticsReport:
+    def __init__(self, db: Database):
+        self.db = db
+        self.status_counts = {}
+        for status in db.status_index.values():
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+        self._version = 0
+        self._rendered = None  # (ключ счётчиков, bytes до времени, bytes после)
+        db.add_listener(self.on_users_changed)
+
+    def on_users_changed(self, changes: list):
+        for _, old_status, new_status in changes:
+            if old_status is not None:
+                self.status_counts[old_status] -= 1
+                if not self.status_counts[old_status]:
+                    del self.status_counts[old_status]
+            if new_status is not None:
+                self.status_counts[new_status] = self.status_counts.get(new_status, 0) + 1
+        self._version += 1
+
+    def counters(self, total_bot_users: int) -> dict:
+        return {
+            'total_bot_users': total_bot_users,
+            'total_listed_users': len(self.db.status_index),
+            'total_admins': len(ADMIN_IDS),
+            'status_counts': dict(self.status_counts)
+        }
+
+    async def render(self) -> bytes:
+        total_bot_users = await self.db.get_total_bot_users()
+        key = (self._version, total_bot_users)
+        if self._rendered is None or self._rendered[0] != key:
+            html_content = _render_html(**self.counters(total_bot_users), generated_at=GENERATED_AT_MARK)
+            before, after = html_content.encode('utf-8').split(GENERATED_AT_MARK.encode('utf-8'))
+            self._rendered = (key, before, after)
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S').encode('utf-8')
+        return self._rendered[1] + generated_at + self._rendered[2]
@@ -0,0 +1,94 @@
+from typing import Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import STATUS_EMOJIS, STATUS_NAMES, REVIEW_PAGE_SIZE
+from database import Database
+
+# Сколько символов причины и доказательства показывать в очереди
+FIELD_PREVIEW = 250
+
+
+# Очередь предложек для администраторов. Страницы читаются keyset-запросами
+# по индексу (status, suggested_at), курсор - id последней предложки
+# предыдущей страницы, поэтому переход не зависит от длины очереди.
+# Одобренные и отклонённые предложки выпадают из выборки, так что после
+# действия та же страница перечитывается с тем же курсором.
+class SuggestionReview:
+    def __init__(self, db: Database, page_size: int = REVIEW_PAGE_SIZE):
+        self.db = db
+        self.page_size = page_size
+
+    async def render(self, after_id: int = 0, notice: str = "") -> tuple:
+        # Лишняя строка показывает, есть ли следующая страница
+        rows = await self.db.get_pending_suggestions(after_id, self.page_size + 1)
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        pending = await self.db.count_pending_suggestions()
+
+        if not rows and after_id:
+            # Страница опустела - возвращаемся в начало очереди
+            return await self.render(0, notice)
+
+        return self._render_text(rows, pending, notice), self._render_markup(rows, after_id, has_next)
+
+    def _render_text(self, rows: list, pending: int, notice: str) -> str:
+        message = f"{notice}\n\n" if notice else ""
+        message += f"📥 Предложки на рассмотрении: {pending}\n"
+        if not rows:
+            return message + "\nОчередь пуста."
+
+        for row in rows:
+            status = row['desired_status']
+            emoji = STATUS_EMOJIS.get(status, '')
+            status_name = STATUS_NAMES.get(status, status)
+            message += (
+                f"\n#{row['id']} 👤 @{row['username']} → {emoji} {status_name}\n"
+                f"📝 Причина: {_preview(row['reason'])}\n"
+                f"📎 Доказательство: {_preview(row['proof'])}\n"
+                f"🤵 Предложил: @{row['suggested_by']} ({row['suggested_at']})\n"
+            )
+        return message
+
+    def _render_markup(self, rows: list, after_id: int, has_next: bool) -> InlineKeyboardMarkup:
+        keyboard = [
+            [InlineKeyboardButton(f"✅ #{row['id']}", callback_data=f"rv_ok_{row['id']}_{after_id}"),
+             InlineKeyboardButton(f"❌ #{row['id']}", callback_data=f"rv_no_{row['id']}_{after_id}")]
+            for row in rows
+        ]
+        if rows:
+            ids = '-'.join(str(row['id']) for row in rows)
+            keyboard.append([
+                InlineKeyboardButton("✅ Одобрить все на странице", callback_data=f"rv_all_{after_id}_{ids}")
+            ])
+
+        navigation = []
+        if after_id:
+            navigation.append(InlineKeyboardButton("⏮ В начало", callback_data='review_0'))
+        if has_next:
+            navigation.append(InlineKeyboardButton("➡️ Далее", callback_data=f"review_{rows[-1]['id']}"))
+        if navigation:
+            keyboard.append(navigation)
+
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data='admin_panel')])
+        return InlineKeyboardMarkup(keyboard)
+
+
+# Разбор callback_data кнопок действий: (действие, id предложек, курсор страницы)
+def parse_action(data: str) -> Optional[tuple]:
+    parts = data.split('_')
+    if len(parts) != 4:
+        return None
+
+    _, action, first, second = parts
+    try:
+        if action in ('ok', 'no'):
+            return action, [int(first)], int(second)
+        if action == 'all':
+            return action, [int(suggestion_id) for suggestion_id in second.split('-')], int(first)
+    except ValueError:
+        return None
+    return None
+
+
+def _preview(text: str) -> str:
+    text = text or ''
+    return text if len(text) <= FIELD_PREVIEW else text[:FIELD_PREVIEW - 1] + "…"
@@ -0,0 +1,224 @@
+# Режим нескольких процессов: фронт принимает webhook от Telegram и раздаёт
+# обновления воркерам по user_id (или chat_id), так что разговоры, лимиты
+# флуда и очередь одного пользователя всегда живут в одном процессе.
+# Каждый воркер - обычное Application из main.build_application() над общим
+# users.db (WAL, у каждого процесса свой поток-писатель, busy_timeout).
+# Запуск вместо main.py:
+#   python supervisor.py
+import json
+import time
+import signal
+import asyncio
+import threading
+import multiprocessing
+from typing import Optional
+from telegram import Bot, Update
+from webhook import WebhookServer, stop_application
+from config import ADMIN_IDS, BOT_TOKEN, WEBHOOK_URL, WEBHOOK_MAX_CONNECTIONS, WORKERS, WORKER_RESTART_DELAY, METRICS_PORT
+
+
+# Ключ шардирования: id пользователя, от которого обновление, иначе id чата
+def shard_key(update: dict) -> int:
+    for name, value in update.items():
+        if name == 'update_id' or not isinstance(value, dict):
+            continue
+        user = value.get('from') or value.get('user')
+        if user:
+            return user['id']
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+    return 0
+
+
+def run_worker(index: int, queue, ready, token: str, base_url: Optional[str]):
+    # Остановкой воркеров управляет supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, queue, ready, token, base_url))
+
+
+async def _worker_main(index: int, queue, ready, token: str, base_url: Optional[str]):
+    import main
+    if METRICS_PORT:
+        main.metrics_server.port = METRICS_PORT + 1 + index
+    application = main.build_application(token, base_url, primary=index == 0)
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+
+    def deliver(body: Optional[bytes]):
+        if body is None:
+            stopped.set()
+            return
+        try:
+            application.update_queue.put_nowait(Update.de_json(json.loads(body), application.bot))
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Воркер {index}: некорректное обновление: {e}")
+
+    # multiprocessing.Queue блокирующая, читаем её в отдельном потоке
+    def receive():
+        while True:
+            body = queue.get()
+            loop.call_soon_threadsafe(deliver, body)
+            if body is None:
+                return
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        threading.Thread(target=receive, name=f'worker-{index}-receiver', daemon=True).start()
+        ready.set()
+        await stopped.wait()
+    finally:
+        # Обновления, полученные до сигнала остановки, успеют обработаться
+        await stop_application(application)
+
+
+# Процессы-воркеры и их очереди. У каждого воркера постоянная очередь:
+# упавший воркер перезапускается и продолжает с того же места.
+class Supervisor:
+    def __init__(self, workers: int = WORKERS, token: str = BOT_TOKEN, base_url: Optional[str] = None):
+        self.workers = workers
+        self.token = token
+        self.base_url = base_url
+        # spawn: воркеры не наследуют потоки и соединения фронта
+        self._context = multiprocessing.get_context('spawn')
+        self.queues = [self._context.Queue() for _ in range(workers)]
+        self.ready = [self._context.Event() for _ in range(workers)]
+        self.processes = [None] * workers
+        self.dispatched = [0] * workers
+        self.restarts = 0
+        self._stopping = False
+
+    def _spawn(self, index: int):
+        self.ready[index].clear()
+        process = self._context.Process(
+            target=run_worker,
+            args=(index, self.queues[index], self.ready[index], self.token, self.base_url),
+            name=f'bot-worker-{index}'
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+
+    async def wait_ready(self, timeout: float = 60) -> bool:
+        deadline = time.monotonic() + timeout
+        while not all(event.is_set() for event in self.ready):
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    # Обновления администраторов идут в основной воркер (0): рассылки
+    # запускает и возобновляет только он, так что лимит Bot API на все
+    # процессы держит одна корзина
+    def dispatch(self, body: bytes, update: dict):
+        key = shard_key(update)
+        index = 0 if key in ADMIN_IDS else key % self.workers
+        self.dispatched[index] += 1
+        self.queues[index].put(body)
+
+    async def monitor(self):
+        while not self._stopping:
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+            for index, process in enumerate(self.processes):
+                if not self._stopping and process is not None and not process.is_alive():
+                    print(f"Воркер {index} завершился с кодом {process.exitcode}, перезапуск")
+                    self.restarts += 1
+                    self._spawn(index)
+
+    async def stop(self, timeout: float = 30):
+        self._stopping = True
+        loop = asyncio.get_running_loop()
+        for queue in self.queues:
+            queue.put(None)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                print(f"Воркер {index} не остановился за {timeout} с, завершаем принудительно")
+                process.terminate()
+
+    def health(self) -> list:
+        return [
+            {
+                'alive': process is not None and process.is_alive(),
+                'ready': self.ready[index].is_set(),
+                'dispatched': self.dispatched[index],
+                'queue': self.queues[index].qsize()
+            }
+            for index, process in enumerate(self.processes)
+        ]
+
+
+# Фронт: те же проверки, что у WebhookServer, но тело обновления не
+# разбирается в Update, а целиком уходит воркеру своего шарда
+class ShardingWebhookServer(WebhookServer):
+    def __init__(self, supervisor: Supervisor, **kwargs):
+        super().__init__(None, **kwargs)
+        self.supervisor = supervisor
+
+    async def deliver(self, body: bytes) -> int:
+        try:
+            update = json.loads(body)
+        except ValueError as e:
+            print(f"Некорректное обновление в webhook: {e}")
+            return 400
+        if not isinstance(update, dict):
+            return 400
+
+        self.received += 1
+        self.supervisor.dispatch(body, update)
+        return 200
+
+    def health(self) -> dict:
+        workers = self.supervisor.health()
+        return {
+            'status': 'ok' if all(worker['ready'] and worker['alive'] for worker in workers) else 'starting',
+            'uptime': int(time.monotonic() - self.started_at),
+            'received': self.received,
+            'rejected': self.rejected,
+            'restarts': self.supervisor.restarts,
+            'workers': workers
+        }
+
+
+async def run_supervisor(webhook_url: str = WEBHOOK_URL, workers: int = WORKERS, token: str = BOT_TOKEN):
+    if not webhook_url:
+        raise SystemExit("Для режима нескольких воркеров нужен WEBHOOK_URL")
+
+    supervisor = Supervisor(workers, token)
+    server = ShardingWebhookServer(supervisor)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with Bot(token) as bot:
+        await bot.set_webhook(
+            url=webhook_url.rstrip('/') + server.path,
+            secret_token=server.secret_token,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+
+    supervisor.start()
+    monitor = asyncio.create_task(supervisor.monitor())
+    try:
+        await server.start()
+        print(f"Webhook слушает {server.listen}:{server.port}{server.path}, воркеров: {workers}")
+        await stop.wait()
+    finally:
+        await server.stop()
+        await supervisor.stop()
+        monitor.cancel()
+
+
+if __name__ == '__main__':
+    asyncio.run(run_supervisor())
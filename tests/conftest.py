@@ -0,0 +1,75 @@
+import os
+import sys
+import pytest
+from telegram import CallbackQuery, Message, Update
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'users.db')
+
+
+# Отдельная база на каждый тест: миграции создают схему с нуля
+@pytest.fixture
+def db(db_path):
+    database = Database(db_path)
+    yield database
+    database.close()
+
+
+def _user(user_id: int, username: str) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': username, 'username': username}
+
+
+def _chat(user_id: int) -> dict:
+    return {'id': user_id, 'type': 'private'}
+
+
+@pytest.fixture
+def make_message():
+    def make(user_id: int = 42, text: str = '/start', username: str = 'someone') -> Update:
+        return Update.de_json({'update_id': 1, 'message': {
+            'message_id': 1, 'date': 0, 'chat': _chat(user_id), 'from': _user(user_id, username), 'text': text
+        }}, None)
+    return make
+
+
+@pytest.fixture
+def make_callback():
+    def make(user_id: int = 42, data: str = 'user_list_1', username: str = 'someone') -> Update:
+        return Update.de_json({'update_id': 1, 'callback_query': {
+            'id': '1', 'chat_instance': '1', 'from': _user(user_id, username), 'data': data
+        }}, None)
+    return make
+
+
+@pytest.fixture
+def make_my_chat_member():
+    def make(user_id: int = 42, status: str = 'kicked', username: str = 'someone') -> Update:
+        bot = {'id': 1, 'is_bot': True, 'first_name': 'bot'}
+        return Update.de_json({'update_id': 1, 'my_chat_member': {
+            'chat': _chat(user_id), 'from': _user(user_id, username), 'date': 0,
+            'old_chat_member': {'user': bot, 'status': 'member'},
+            'new_chat_member': {'user': bot, 'status': status, 'until_date': 0}
+        }}, None)
+    return make
+
+
+# Ответы бота без Bot API: [(метод, текст, именованные аргументы)]
+@pytest.fixture
+def replies(monkeypatch):
+    sent = []
+
+    async def answer(self, text=None, **kwargs):
+        sent.append(('answer', text, kwargs))
+
+    async def reply_text(self, text, **kwargs):
+        sent.append(('reply_text', text, kwargs))
+
+    monkeypatch.setattr(CallbackQuery, 'answer', answer)
+    monkeypatch.setattr(Message, 'reply_text', reply_text)
+    return sent
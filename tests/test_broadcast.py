@@ -0,0 +1,48 @@
+import time
+import asyncio
+from broadcast import TokenBucket
+from supervisor import Supervisor, shard_key
+from config import ADMIN_IDS
+
+
+# Пустая корзина с ёмкостью в один токен: без всплеска в начале, за секунду
+# не больше rate отправок
+def test_bucket_does_not_burst_at_start():
+    async def acquire_during(bucket: TokenBucket, seconds: float) -> int:
+        acquired = 0
+        deadline = time.monotonic() + seconds
+        while True:
+            await bucket.acquire()
+            if time.monotonic() > deadline:
+                return acquired
+            acquired += 1
+
+    bucket = TokenBucket(rate=50)
+    assert asyncio.run(acquire_during(bucket, 0.2)) <= 11
+
+
+def test_bucket_pause_stops_all_senders():
+    async def scenario():
+        bucket = TokenBucket(rate=1000)
+        bucket.pause(0.1)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.1
+
+
+# Рассылки запускает только основной воркер, поэтому туда же идут все
+# обновления администраторов
+def test_admin_updates_go_to_primary_worker():
+    supervisor = Supervisor(workers=4)
+    updates = [
+        {'update_id': 1, 'message': {'from': {'id': admin_id}, 'chat': {'id': admin_id}}}
+        for admin_id in ADMIN_IDS
+    ] + [{'update_id': 2, 'message': {'from': {'id': 7}, 'chat': {'id': 7}}}]
+
+    for update in updates:
+        supervisor.dispatch(b'{}', update)
+
+    assert supervisor.dispatched[0] == len(ADMIN_IDS)
+    assert supervisor.dispatched[shard_key(updates[-1]) % 4] == 1
@@ -0,0 +1,190 @@
+import asyncio
+import sqlite3
+from database import status_rank
+from config import STATUS_NAMES
+
+
+def connect(db_path):
+    return sqlite3.connect(db_path, isolation_level=None)
+
+
+# status_rank считает сама SQLite, поэтому строка, записанная в обход
+# Database, тоже попадает в список пользователей
+def test_status_rank_computed_for_direct_insert(db_path, db):
+    conn = connect(db_path)
+    statuses = list(STATUS_NAMES) + ['unknown']
+    conn.executemany(
+        'INSERT INTO users (username, status) VALUES (?, ?)',
+        [(f'user_{status}', status) for status in statuses]
+    )
+    rows = dict(conn.execute('SELECT status, status_rank FROM users'))
+    conn.close()
+
+    assert rows == {status: status_rank(status) for status in statuses}
+
+
+def test_users_page_includes_direct_insert(db_path, db):
+    conn = connect(db_path)
+    conn.execute("INSERT INTO users (username, status) VALUES ('direct_user', 'user')")
+    conn.close()
+
+    rows = asyncio.run(db.get_users_page((-1, ''), 10))
+    assert (status_rank('user'), 'direct_user', 'user') in rows
+
+
+def test_changelog_propagates_other_process_writes(db_path, db):
+    conn = connect(db_path)
+    conn.execute("INSERT INTO users (username, status) VALUES ('Other_Process', 'user')")
+    conn.execute("INSERT INTO blocked_users (user_id) VALUES ('12345')")
+    conn.execute("INSERT INTO settings (key, value) VALUES ('maintenance', '1')")
+
+    changed = asyncio.run(db.apply_changelog())
+    assert changed == 1
+    assert db.lookup_status('other_process') == 'user'
+    assert db.is_blocked(12345)
+    assert db.maintenance
+
+    conn.execute("UPDATE users SET status = 'scam' WHERE username = 'Other_Process'")
+    conn.execute("DELETE FROM blocked_users WHERE user_id = '12345'")
+    conn.close()
+
+    asyncio.run(db.apply_changelog())
+    assert db.lookup_status('other_process') == 'scam'
+    assert not db.is_blocked(12345)
+
+
+# Если нужные записи журнала уже удалены, состояние перечитывается целиком
+def test_changelog_gap_falls_back_to_full_reload(db_path, db):
+    asyncio.run(db.add_user('stale_user', 'user'))
+
+    conn = connect(db_path)
+    conn.execute("DELETE FROM users WHERE username = 'stale_user'")
+    conn.execute("INSERT INTO users (username, status) VALUES ('fresh_user', 'user')")
+    conn.execute('DELETE FROM changelog')
+    conn.close()
+
+    asyncio.run(db.apply_changelog())
+    assert db.lookup_status('stale_user') is None
+    assert db.lookup_status('fresh_user') == 'user'
+
+
+def test_own_writes_are_not_applied_twice(db):
+    changes = []
+    db.add_listener(changes.extend)
+
+    async def scenario():
+        await db.add_user('own_user', 'user')
+        return await db.apply_changelog()
+
+    assert asyncio.run(scenario()) == 0
+    assert changes == [('own_user', None, 'user')]
+
+
+def test_status_history_records_changes(db):
+    async def scenario():
+        await db.add_user('history_user', 'user')
+        # Повторная запись того же статуса истории не меняет
+        await db.add_users([('history_user', 'user')])
+        await db.add_user('history_user', 'scam')
+        await db.remove_user('history_user')
+        return await db.get_status_history('history_user')
+
+    history = asyncio.run(scenario())
+    assert [status for status, _ in history] == [None, 'scam', 'user']
+    assert db.has_status_history('History_User')
+
+
+# INSERT OR REPLACE снаружи не должен перенумеровывать коды статусов
+def test_status_codes_stable_under_replace(db_path, db):
+    def codes():
+        conn = connect(db_path)
+        try:
+            return dict(conn.execute('SELECT status, code FROM status_codes'))
+        finally:
+            conn.close()
+
+    asyncio.run(db.add_users([('first', 'custom'), ('second', 'scam')]))
+    before = codes()
+    asyncio.run(db.add_users([('first', 'scam'), ('second', 'custom')]))
+    asyncio.run(db.add_users([('first', 'custom')]))
+
+    assert 'custom' in before
+    assert codes() == before
+
+
+def test_status_history_skips_query_without_history(db, monkeypatch):
+    async def no_read(*args):
+        raise AssertionError("запрос к базе")
+
+    monkeypatch.setattr(db, '_read', no_read)
+    assert asyncio.run(db.get_status_history('nobody')) == []
+
+
+def test_startup_loads_state_from_database(db_path, db):
+    asyncio.run(db.add_user('loaded_user', 'user'))
+    asyncio.run(db.add_user('loaded_user', 'scam'))
+    asyncio.run(db.block_user('blocked_user'))
+    asyncio.run(db.set_maintenance(True))
+
+    reopened = type(db)(db_path)
+    try:
+        assert reopened.lookup_status('loaded_user') == 'scam'
+        assert reopened.is_blocked(0, 'Blocked_User')
+        assert reopened.maintenance
+        assert reopened.has_status_history('loaded_user')
+        # Снимок и номер журнала согласованы: догонять нечего
+        assert asyncio.run(reopened.apply_changelog()) == 0
+    finally:
+        reopened.close()
+
+
+# my_chat_member не добавляет в bot_users тех, кто не запускал бота
+def test_bot_block_marks_only_known_users(db):
+    async def scenario():
+        await db.touch_bot_users([('1', '2024-01-01 00:00:00', '2024-01-01 00:00:00')])
+        await db.set_bot_blocked('1', True)
+        await db.set_bot_blocked('2', True)
+        await db.set_bot_blocked('3', False)
+        return await db.get_total_bot_users(), await db.count_broadcast_audience()
+
+    assert asyncio.run(scenario()) == (1, (0, 1))
+
+
+# Число пользователей бота ведёт триггер: повторный /start его не меняет,
+# запись другого процесса учитывается
+def test_bot_users_counter_follows_inserts(db_path, db):
+    seen = '2024-01-01 00:00:00'
+
+    async def scenario():
+        await db.touch_bot_users([('1', seen, seen), ('2', seen, seen)])
+        await db.touch_bot_users([('1', seen, seen)])
+        return await db.get_total_bot_users()
+
+    assert asyncio.run(scenario()) == 2
+
+    conn = connect(db_path)
+    conn.execute("INSERT INTO bot_users (user_id, first_seen, last_seen) VALUES ('3', ?, ?)", (seen, seen))
+    conn.execute("DELETE FROM bot_users WHERE user_id = '1'")
+    conn.close()
+    assert asyncio.run(db.get_total_bot_users()) == 2
+
+
+# Миграция заполняет счётчик по уже существующим строкам
+def test_bot_users_counter_migration_counts_existing_rows(db_path, db):
+    db.close()
+    conn = connect(db_path)
+    conn.execute('DROP TRIGGER counters_bot_users_insert')
+    conn.execute('DROP TRIGGER counters_bot_users_delete')
+    conn.execute('DROP TABLE counters')
+    conn.executemany(
+        "INSERT INTO bot_users (user_id, first_seen, last_seen) VALUES (?, '', '')",
+        [(str(user_id),) for user_id in range(5)]
+    )
+    conn.execute('PRAGMA user_version = 12')
+    conn.close()
+
+    reopened = type(db)(db_path)
+    try:
+        assert asyncio.run(reopened.get_total_bot_users()) == 5
+    finally:
+        reopened.close()
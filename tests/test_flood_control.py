@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from telegram.ext import ApplicationHandlerStop
+from flood_control import FloodControl, SLOW_DOWN_NOTICES
+from config import ADMIN_IDS
+
+# Одно обновление на категорию, пополнение практически нулевое
+LIMITS = {'lookup': (1, 1e-9), 'navigation': (1, 1e-9), 'suggestion': (1, 1e-9)}
+
+
+def check(flood: FloodControl, update) -> bool:
+    try:
+        asyncio.run(flood.check(update, None))
+    except ApplicationHandlerStop:
+        return False
+    return True
+
+
+# На каждое отклонённое нажатие кнопки есть ответ, текст - только у первого
+def test_limited_callbacks_are_always_answered(make_callback, replies):
+    flood = FloodControl(LIMITS)
+    assert check(flood, make_callback())
+    assert not check(flood, make_callback())
+    assert not check(flood, make_callback())
+
+    assert replies == [
+        ('answer', SLOW_DOWN_NOTICES['navigation'], {}),
+        ('answer', None, {})
+    ]
+
+
+def test_limited_messages_are_warned_once(make_message, replies):
+    flood = FloodControl(LIMITS)
+    assert check(flood, make_message(text='durov'))
+    assert not check(flood, make_message(text='durov'))
+    assert not check(flood, make_message(text='durov'))
+
+    assert replies == [('reply_text', SLOW_DOWN_NOTICES['lookup'], {})]
+
+
+def test_categories_have_separate_buckets(make_message, make_callback, replies):
+    flood = FloodControl(LIMITS)
+    assert check(flood, make_message(text='durov'))
+    assert check(flood, make_callback())
+    assert check(flood, make_callback(data='suggest_user'))
+    assert replies == []
+
+
+@pytest.mark.parametrize('update_fixture', ['make_callback', 'make_message'])
+def test_admins_are_not_limited(update_fixture, request, replies):
+    make = request.getfixturevalue(update_fixture)
+    flood = FloodControl(LIMITS)
+    for _ in range(3):
+        assert check(flood, make(user_id=ADMIN_IDS[0]))
+    assert replies == []
+
+
+def test_membership_updates_are_not_limited(make_my_chat_member, replies):
+    flood = FloodControl(LIMITS)
+    for _ in range(3):
+        assert check(flood, make_my_chat_member())
@@ -0,0 +1,74 @@
+import asyncio
+from telegram.ext import ApplicationHandlerStop
+from gatekeeper import Gatekeeper, GATE_NOTICES
+from config import ADMIN_IDS
+
+
+def check(gatekeeper: Gatekeeper, update) -> bool:
+    try:
+        asyncio.run(gatekeeper.check(update, None))
+    except ApplicationHandlerStop:
+        return False
+    return True
+
+
+# Каждое нажатие заблокированного пользователя получает ответ, объяснение -
+# не чаще раза в notice_interval
+def test_blocked_callbacks_are_always_answered(db, make_callback, replies):
+    asyncio.run(db.block_user('spammer'))
+    gatekeeper = Gatekeeper(db)
+
+    assert not check(gatekeeper, make_callback(username='Spammer'))
+    assert not check(gatekeeper, make_callback(username='Spammer'))
+
+    assert replies == [
+        ('answer', GATE_NOTICES['blocked'], {'show_alert': True}),
+        ('answer', None, {'show_alert': False})
+    ]
+
+
+def test_blocked_by_id(db, make_message, replies):
+    asyncio.run(db.block_user('42'))
+    gatekeeper = Gatekeeper(db)
+
+    assert not check(gatekeeper, make_message(user_id=42))
+    assert not check(gatekeeper, make_message(user_id=42))
+    assert replies == [('reply_text', GATE_NOTICES['blocked'], {})]
+
+
+def test_notice_repeats_after_interval(db, make_message, replies):
+    asyncio.run(db.set_maintenance(True))
+    gatekeeper = Gatekeeper(db, notice_interval=0)
+
+    assert not check(gatekeeper, make_message())
+    assert not check(gatekeeper, make_message())
+    assert replies == [('reply_text', GATE_NOTICES['maintenance'], {})] * 2
+
+
+def test_maintenance_lets_admins_through(db, make_message, make_callback, replies):
+    asyncio.run(db.set_maintenance(True))
+    gatekeeper = Gatekeeper(db)
+
+    assert check(gatekeeper, make_message(user_id=ADMIN_IDS[0]))
+    assert check(gatekeeper, make_callback(user_id=ADMIN_IDS[0]))
+    assert not check(gatekeeper, make_callback())
+    assert replies == [('answer', GATE_NOTICES['maintenance'], {'show_alert': True})]
+
+
+# По my_chat_member track_bot_membership отмечает блокировку бота, поэтому
+# такие обновления проходят и во время техработ, и от заблокированных
+def test_membership_updates_pass(db, make_my_chat_member, replies):
+    asyncio.run(db.block_user('spammer'))
+    asyncio.run(db.set_maintenance(True))
+    gatekeeper = Gatekeeper(db)
+
+    assert check(gatekeeper, make_my_chat_member(username='spammer'))
+    assert check(gatekeeper, make_my_chat_member(status='member'))
+    assert replies == []
+
+
+def test_regular_users_pass(db, make_message, make_callback, replies):
+    gatekeeper = Gatekeeper(db)
+    assert check(gatekeeper, make_message())
+    assert check(gatekeeper, make_callback())
+    assert replies == []
@@ -0,0 +1,70 @@
+import asyncio
+import sqlite3
+import pytest
+import inline_status
+from telegram import InlineQuery, Update
+from cache import LRUCache
+from inline_status import InlineStatusSearch
+from username_search import UsernameIndex, QueryNeighbours
+
+QUERIES = ['ali', 'alice', 'alise', 'bob', 'carol', 'zzz']
+
+
+@pytest.fixture
+def search(db, monkeypatch):
+    monkeypatch.setattr(inline_status, 'INLINE_DEBOUNCE', 0)
+
+    async def answer(self, results, **kwargs):
+        pass
+
+    monkeypatch.setattr(InlineQuery, 'answer', answer)
+    asyncio.run(db.add_users([('alice', 'scam'), ('alicia', 'verify'), ('bob', 'media'), ('carol', 'fame')]))
+    search = InlineStatusSearch(db, UsernameIndex(db), LRUCache(100))
+    for index, query in enumerate(QUERIES):
+        asyncio.run(search.handle(Update.de_json({'update_id': index, 'inline_query': {
+            'id': str(index), 'from': {'id': 1, 'is_bot': False, 'first_name': 'a'}, 'query': query, 'offset': ''
+        }}, None), None))
+    return search
+
+
+def cached(search: InlineStatusSearch) -> set:
+    return {query for query, _ in search.cache.items()}
+
+
+# Сбрасываются только запросы, чей ответ зависит от изменённого имени:
+# его префиксы и соседи на одну правку
+def test_status_change_evicts_only_affected_queries(db, search):
+    assert cached(search) == set(QUERIES)
+    asyncio.run(db.add_user('alice', 'verify'))
+    assert cached(search) == {'bob', 'carol', 'zzz'}
+
+
+def test_new_user_evicts_prefixes_and_neighbours(db, search):
+    asyncio.run(db.add_users([('bobby', 'scam'), ('zzy', 'new')]))
+    assert cached(search) == {'ali', 'alice', 'alise', 'carol'}
+
+
+def test_other_process_change_evicts_affected_queries(db_path, db, search):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("DELETE FROM users WHERE username = 'carol'")
+    conn.close()
+
+    asyncio.run(db.apply_changelog())
+    assert cached(search) == {'ali', 'alice', 'alise', 'bob', 'zzz'}
+
+
+# Обратный индекс не растёт вместе с вытесненными из кэша запросами
+def test_query_neighbours_stay_bounded(db):
+    search = InlineStatusSearch(db, UsernameIndex(db), LRUCache(2))
+    for index in range(20):
+        search._remember(f'query{index}', [])
+    assert len(search._neighbours) <= 4
+
+
+def test_query_neighbours_match_suggestions():
+    neighbours = QueryNeighbours(['alice', 'a1ice', 'alcie', 'alic', 'alicez', 'bob', 'alxxe'])
+    assert sorted(neighbours.near('alice')) == ['a1ice', 'alcie', 'alic', 'alice', 'alicez']
+
+    neighbours.discard('alic')
+    assert 'alic' not in neighbours.near('alice')
+    assert len(neighbours) == 6
@@ -0,0 +1,101 @@
+import asyncio
+import pickle
+from persistence import SQLitePersistence
+
+
+async def stored(db, kind: str) -> dict:
+    return {entity_id: pickle.loads(blob) for entity_id, blob in await db.get_persistence_data(kind)}
+
+
+# Во время записи данные меняются: новое значение должно дойти до базы,
+# а не потеряться из-за того, что хеш записанного обновился после неё
+def test_change_during_write_is_not_lost(db, monkeypatch):
+    persistence = SQLitePersistence(db)
+    save = db.save_persistence
+    calls = []
+
+    async def save_and_change(data, conversations):
+        calls.append(data)
+        if len(calls) == 1:
+            await persistence.update_user_data(1, {'value': 2})
+        await save(data, conversations)
+
+    monkeypatch.setattr(db, 'save_persistence', save_and_change)
+
+    async def scenario():
+        await persistence.update_user_data(1, {'value': 1})
+        await persistence.flush()
+        return await stored(db, 'user')
+
+    assert asyncio.run(scenario()) == {1: {'value': 2}}
+    assert len(calls) == 2
+
+
+# Значение, вернувшееся во время записи к уже записанному раньше, тоже
+# пишется: в базе к этому моменту лежит промежуточное
+def test_change_back_during_write_is_written(db, monkeypatch):
+    persistence = SQLitePersistence(db)
+    save = db.save_persistence
+
+    async def scenario():
+        await persistence.update_user_data(1, {'value': 1})
+        await persistence.flush()
+
+        async def save_and_revert(data, conversations):
+            monkeypatch.setattr(db, 'save_persistence', save)
+            await persistence.update_user_data(1, {'value': 1})
+            await save(data, conversations)
+
+        monkeypatch.setattr(db, 'save_persistence', save_and_revert)
+        await persistence.update_user_data(1, {'value': 2})
+        await persistence.flush()
+        return await stored(db, 'user')
+
+    assert asyncio.run(scenario()) == {1: {'value': 1}}
+
+
+def test_failed_write_is_retried(db, monkeypatch):
+    persistence = SQLitePersistence(db)
+    save = db.save_persistence
+
+    async def fail_once(data, conversations):
+        monkeypatch.setattr(db, 'save_persistence', save)
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(db, 'save_persistence', fail_once)
+
+    async def scenario():
+        await persistence.update_chat_data(5, {'value': 1})
+        await persistence.update_conversation('admin', (5, 5), 3)
+        await persistence.flush()
+        await persistence.flush()
+        return await stored(db, 'chat'), await persistence.get_conversations('admin')
+
+    assert asyncio.run(scenario()) == ({5: {'value': 1}}, {(5, 5): 3})
+
+
+def test_unchanged_data_is_not_rewritten(db, monkeypatch):
+    persistence = SQLitePersistence(db)
+    calls = []
+    save = db.save_persistence
+
+    async def counting_save(data, conversations):
+        calls.append(data)
+        await save(data, conversations)
+
+    monkeypatch.setattr(db, 'save_persistence', counting_save)
+
+    async def scenario():
+        await persistence.update_user_data(1, {'value': 1})
+        await persistence.flush()
+        await persistence.update_user_data(1, {'value': 1})
+        await persistence.flush()
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+# Воркеры supervisor.py не хранят bot_data, иначе затирали бы общую строку
+def test_worker_does_not_store_bot_data(db):
+    assert SQLitePersistence(db, bot_data=False).store_data.bot_data is False
+    assert SQLitePersistence(db).store_data.bot_data is True
@@ -0,0 +1,106 @@
+import re
+import asyncio
+import sqlite3
+from cache import LRUCache
+from database import status_rank
+from user_list import UserListPager
+
+USERNAME = re.compile(r'@(\w+)')
+PAGE_SIZE = 3
+
+
+def expected(pager: UserListPager, db) -> list:
+    listed = sorted(
+        (status_rank(status), username)
+        for username, status in db.status_index.items() if username not in pager.excluded
+    )
+    return [username for username, _ in pager.admin_rows] + [username for _, username in listed]
+
+
+async def walk(pager: UserListPager, pages=None) -> list:
+    usernames = []
+    for page in pages or range(1, pager.total_pages() + 1):
+        text, _, _ = await pager.render(page)
+        usernames += USERNAME.findall(text)
+    return usernames
+
+
+def make_pager(db) -> UserListPager:
+    # Почти все пользователи с одним статусом: ключи сортировки совпадают
+    # по status_rank и различаются только username
+    asyncio.run(db.add_users(
+        [(f'u{index:02d}', 'scam') for index in range(0, 20, 2)] + [('v1', 'verify'), ('v2', 'verify')]
+    ))
+    return UserListPager(db, LRUCache(100), page_size=PAGE_SIZE)
+
+
+def test_pages_cover_all_users_in_order(db):
+    pager = make_pager(db)
+    assert asyncio.run(walk(pager)) == expected(pager, db)
+
+
+# Страница из середины без известной границы: переход через OFFSET по индексу
+def test_jump_to_page_without_known_boundary(db):
+    pager = make_pager(db)
+    last = pager.total_pages()
+    usernames = asyncio.run(walk(pager, [last, 2]))
+    full = expected(pager, db)
+    last_page = full[(last - 1) * PAGE_SIZE:]
+    assert usernames == last_page + full[PAGE_SIZE:2 * PAGE_SIZE]
+
+
+def test_cached_pages_follow_inserts_and_deletes(db):
+    pager = make_pager(db)
+
+    async def scenario():
+        await walk(pager)
+        # Вставки между соседями с тем же статусом, в начало и удаление
+        await db.add_users([('u05', 'scam'), ('u00a', 'scam'), ('a', 'scam')])
+        await db.remove_user('u10')
+        after_change = await walk(pager)
+        # Смена статуса двигает строку между группами
+        await db.add_user('u18', 'verify')
+        return after_change, await walk(pager)
+
+    after_change, after_move = asyncio.run(scenario())
+    assert after_move == expected(pager, db)
+    assert 'u10' not in after_change and 'u05' in after_change
+
+
+# Изменения другого процесса приходят через журнал и сбрасывают те же страницы
+def test_cached_pages_follow_other_process_changes(db_path, db):
+    pager = make_pager(db)
+    asyncio.run(walk(pager))
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("INSERT INTO users (username, status) VALUES ('u03', 'scam')")
+    conn.execute("DELETE FROM users WHERE username = 'u12'")
+    conn.close()
+
+    async def scenario():
+        await db.apply_changelog()
+        return await walk(pager)
+
+    assert asyncio.run(scenario()) == expected(pager, db)
+
+
+# Страница, прочитанная во время изменения, отдаётся, но не кэшируется
+def test_page_read_across_change_is_not_cached(db, monkeypatch):
+    pager = make_pager(db)
+    first = expected(pager, db)[len(pager.admin_rows)]
+    get_users_page = db.get_users_page
+
+    async def page_then_change(*args):
+        rows = await get_users_page(*args)
+        await db.remove_user(first)
+        return rows
+
+    async def scenario():
+        monkeypatch.setattr(db, 'get_users_page', page_then_change)
+        await pager.render(1)
+        monkeypatch.setattr(db, 'get_users_page', get_users_page)
+        return await walk(pager)
+
+    usernames = asyncio.run(scenario())
+    assert first not in usernames
+    assert usernames == expected(pager, db)
@@ -0,0 +1,39 @@
+import json
+import asyncio
+from webhook import WebhookServer
+from config import WEBHOOK_PATH
+
+UPDATE = json.dumps({'update_id': 1}).encode()
+
+
+class StubApplication:
+    def __init__(self):
+        self.bot = None
+        self.update_queue = asyncio.Queue()
+
+
+def post(server: WebhookServer, headers: dict) -> int:
+    status, _ = asyncio.run(server._handle('POST', WEBHOOK_PATH, headers, UPDATE))
+    return status
+
+
+# Без токена в конфиге он генерируется: поддельный запрос без заголовка
+# или с пустым заголовком не проходит
+def test_generated_secret_rejects_forged_updates():
+    server = WebhookServer(StubApplication(), secret_token='')
+    assert server.secret_token
+    assert post(server, {}) == 403
+    assert post(server, {'x-telegram-bot-api-secret-token': ''}) == 403
+    assert server.rejected == 2
+    assert server.application.update_queue.empty()
+
+
+def test_generated_secret_differs_per_server():
+    assert WebhookServer(StubApplication()).secret_token != WebhookServer(StubApplication()).secret_token
+
+
+def test_configured_secret_accepts_matching_header():
+    server = WebhookServer(StubApplication(), secret_token='s3cret')
+    assert post(server, {'x-telegram-bot-api-secret-token': 'wrong'}) == 403
+    assert post(server, {'x-telegram-bot-api-secret-token': 's3cret'}) == 200
+    assert server.received == 1
@@ -0,0 +1,94 @@
+import asyncio
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from config import ADMIN_IDS, UPDATE_CONCURRENCY, UPDATE_MAX_PENDING, ADMIN_JOB_CONCURRENCY
+
+# Действия администраторов, которые надолго занимают обработчик
+ADMIN_JOB_COMMANDS = ('/export', '/broadcast')
+ADMIN_JOB_CALLBACKS = ('statistics', 'maintenance')
+ADMIN_JOB_CALLBACK_PREFIXES = ('rv_all_',)
+
+
+def is_admin_job(update: object) -> bool:
+    if not isinstance(update, Update) or not update.effective_user or update.effective_user.id not in ADMIN_IDS:
+        return False
+
+    if update.callback_query:
+        data = update.callback_query.data or ''
+        return data in ADMIN_JOB_CALLBACKS or data.startswith(ADMIN_JOB_CALLBACK_PREFIXES)
+    message = update.message
+    if message is None:
+        return False
+    if message.document:
+        return True
+    return (message.text or '').split(' ', 1)[0] in ADMIN_JOB_COMMANDS
+
+
+# Ключи упорядочивания: обновления одного пользователя и одного чата идут
+# строго по очереди, иначе ConversationHandler увидит их не в том порядке
+def ordering_keys(update: object) -> list:
+    if not isinstance(update, Update):
+        return []
+    keys = []
+    if update.effective_user:
+        keys.append(('user', update.effective_user.id))
+    chat = update.effective_chat
+    if chat and not (update.effective_user and chat.id == update.effective_user.id):
+        keys.append(('chat', chat.id))
+    return sorted(keys)
+
+
+# Параллельная обработка обновлений разных пользователей (до UPDATE_CONCURRENCY
+# одновременно) с сохранением порядка внутри пользователя и чата.
+# Семафор базового класса ограничивает только число ожидающих обновлений:
+# обновление, которое ждёт своей очереди у пользователя, не занимает слот
+# обработки. Долгие действия администраторов дополнительно ограничены
+# ADMIN_JOB_CONCURRENCY.
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, max_pending: int = UPDATE_MAX_PENDING,
+                 admin_jobs: int = ADMIN_JOB_CONCURRENCY):
+        super().__init__(max(max_pending, concurrency))
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._admin_jobs = asyncio.Semaphore(admin_jobs)
+        self._locks = {}  # ключ -> [asyncio.Lock, число обновлений, которые его держат или ждут]
+
+    async def do_process_update(self, update: object, coroutine):
+        keys = ordering_keys(update)
+        locks = [self._acquire_ref(key) for key in keys]
+        try:
+            for lock in locks:
+                await lock.acquire()
+            try:
+                if is_admin_job(update):
+                    async with self._admin_jobs, self._slots:
+                        await coroutine
+                else:
+                    async with self._slots:
+                        await coroutine
+            finally:
+                for lock in locks:
+                    if lock.locked():
+                        lock.release()
+        finally:
+            for key in keys:
+                self._release_ref(key)
+
+    def _acquire_ref(self, key: tuple) -> asyncio.Lock:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_ref(self, key: tuple):
+        entry = self._locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,180 @@
+from typing import Optional
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from config import (
+    ADMIN_IDS,
+    ADMIN_USERNAMES,
+    STATUS_EMOJIS,
+    STATUS_NAMES,
+    USER_LIST_PAGE_SIZE,
+    USER_LIST_BOUNDARIES
+)
+from database import Database, status_rank
+from cache import LRUCache
+
+# Ключ, с которого начинается выборка первой страницы
+FIRST_KEY = (-1, '')
+
+
+# Постраничный список пользователей. Страницы читаются keyset-запросами
+# по индексу (status_rank, username), отрисованные страницы лежат в
+# ограниченном кэше, и при изменении пользователя сбрасываются только
+# страницы, которые это изменение задевает.
+class UserListPager:
+    def __init__(self, db: Database, pages: LRUCache, page_size: int = USER_LIST_PAGE_SIZE):
+        self.db = db
+        self.page_size = page_size
+        self.pages = pages  # page -> (text, reply_markup, last_key)
+        self._after = LRUCache(USER_LIST_BOUNDARIES)  # page -> ключ последней строки перед страницей
+        # Растёт при каждом сбросе: страница или граница, прочитанная до
+        # сброса, не попадает в кэш после него
+        self._generation = 0
+
+        # Администраторы из конфига идут первыми и в базе не хранятся
+        self.admin_rows = [
+            (ADMIN_USERNAMES.get(str(admin_id), str(admin_id)), 'admin')
+            for admin_id in ADMIN_IDS
+        ]
+        self.excluded = tuple(str(admin_id) for admin_id in ADMIN_IDS)
+
+        db.add_listener(self.on_users_changed)
+
+    # Число строк берётся из индекса статусов в памяти, без COUNT(*)
+    def listed_count(self) -> int:
+        index = self.db.status_index
+        return len(index) - sum(1 for username in self.excluded if username in index)
+
+    def total_pages(self) -> int:
+        return self._page_count(self.listed_count())
+
+    def _page_count(self, listed: int) -> int:
+        return (len(self.admin_rows) + listed + self.page_size - 1) // self.page_size
+
+    async def render(self, page: int) -> Optional[tuple]:
+        total_pages = self.total_pages()
+        if total_pages == 0:
+            return None
+
+        page = max(1, min(page, total_pages))
+        cached = self.pages.get(page)
+        if cached is not None:
+            return cached
+
+        generation = self._generation
+        rows, last_key = await self._fetch(page)
+        text = self._render_text(page, total_pages, rows)
+        rendered = (text, self._render_markup(page, total_pages), last_key)
+        if generation == self._generation:
+            self.pages.set(page, rendered)
+        return rendered
+
+    async def _fetch(self, page: int) -> tuple:
+        start = (page - 1) * self.page_size
+        rows = self.admin_rows[start:start + self.page_size]
+        limit = self.page_size - len(rows)
+        if limit == 0:
+            return rows, None
+
+        after = await self._page_start(page)
+        if after is None:
+            return rows, None
+
+        generation = self._generation
+        db_rows = await self.db.get_users_page(after, limit, self.excluded)
+        rows += [(username, status) for _, username, status in db_rows]
+        last_key = (db_rows[-1][0], db_rows[-1][1]) if db_rows else None
+        if last_key is not None and generation == self._generation:
+            self._after.set(page + 1, last_key)
+        return rows, last_key
+
+    # Ключ строки, после которой начинается страница. Если границы нет
+    # в кэше, доходим до неё от ближайшей известной через OFFSET по индексу.
+    async def _page_start(self, page: int) -> Optional[tuple]:
+        admins = len(self.admin_rows)
+        first_db_page = admins // self.page_size + 1
+        if page <= first_db_page:
+            return FIRST_KEY
+
+        after = self._after.get(page)
+        if after is not None:
+            return after
+
+        known_page, after = first_db_page, FIRST_KEY
+        for candidate in range(page - 1, first_db_page, -1):
+            key = self._after.get(candidate)
+            if key is not None:
+                known_page, after = candidate, key
+                break
+
+        skip = self._db_offset(page) - self._db_offset(known_page)
+        generation = self._generation
+        after = await self.db.skip_users(after, skip, self.excluded)
+        if after is not None and generation == self._generation:
+            self._after.set(page, after)
+        return after
+
+    def _db_offset(self, page: int) -> int:
+        return max(0, (page - 1) * self.page_size - len(self.admin_rows))
+
+    def _render_text(self, page: int, total_pages: int, rows: list) -> str:
+        message = f"📋 Список пользователей (Страница {page}/{total_pages}):\n\n"
+        prev_status = None
+
+        for username, status in rows:
+            if status != prev_status:
+                if prev_status is not None:
+                    message += "——————————————————\n"
+                prev_status = status
+
+            emoji = STATUS_EMOJIS.get(status, '')
+            status_name = STATUS_NAMES.get(status, status.capitalize())
+            message += f"{emoji} {status_name} - @{username}\n"
+        return message
+
+    def _render_markup(self, page: int, total_pages: int) -> InlineKeyboardMarkup:
+        keyboard = []
+        if page > 1:
+            keyboard.append(InlineKeyboardButton("⬅️ Назад", callback_data=f'user_list_{page-1}'))
+        if page < total_pages:
+            keyboard.append(InlineKeyboardButton("➡️ Вперед", callback_data=f'user_list_{page+1}'))
+
+        keyboard = [keyboard] if keyboard else []
+        keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data='back_to_main')])
+        return InlineKeyboardMarkup(keyboard)
+
+    def on_users_changed(self, changes: list):
+        changes = [change for change in changes if change[0] not in self.excluded]
+        if not changes:
+            return
+
+        # Индекс уже обновлён; число страниц выводится в заголовке и кнопках
+        # каждой страницы, поэтому при его изменении сбрасываем всё
+        listed = self.listed_count()
+        old_listed = listed - sum(
+            (new_status is not None) - (old_status is not None) for _, old_status, new_status in changes
+        )
+        if self._page_count(listed) != self._page_count(old_listed):
+            self.invalidate_all()
+            return
+
+        keys = [
+            (status_rank(status), username)
+            for username, old_status, new_status in changes
+            for status in (old_status, new_status) if status is not None
+        ]
+        self.invalidate_from(min(keys))
+
+    # Сбрасывает страницы и границы, которые лежат не раньше ключа key
+    def invalidate_from(self, key: tuple):
+        self._generation += 1
+        for page, (_, _, last_key) in self.pages.items():
+            if last_key is None or last_key >= key:
+                self.pages.pop(page)
+
+        for page, after in self._after.items():
+            if after >= key:
+                self._after.pop(page)
+
+    def invalidate_all(self):
+        self._generation += 1
+        self.pages.clear()
+        self._after.clear()
@@ -0,0 +1,176 @@
+import io
+import re
+import csv
+import json
+import time
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+from telegram import File
+from config import (
+    STATUS_NAMES,
+    USERS_IMPORT_CHUNK,
+    USERS_IMPORT_PROGRESS_INTERVAL,
+    USERS_IMPORT_MAX_ERRORS,
+    USERS_EXPORT_CHUNK,
+    USERS_EXPORT_SPOOL_SIZE
+)
+from database import Database
+
+# Статус admin выдаётся только через конфиг
+IMPORT_STATUSES = [status for status in STATUS_NAMES if status != 'admin']
+USERNAME_PATTERN = re.compile(r'^@?(\w+)$')
+FORMATS = ('csv', 'jsonl')
+
+
+def file_format(file_name: Optional[str]) -> Optional[str]:
+    extension = (file_name or '').rsplit('.', 1)[-1].lower()
+    return extension if extension in FORMATS else None
+
+
+# Импорт списка из CSV (username,status) или JSONL ({"username": ..., "status": ...}).
+# Файл читается построчно, строки пишутся пачками по USERS_IMPORT_CHUNK
+# через executemany - одна транзакция на пачку.
+class UserImport:
+    def __init__(self, db: Database, fmt: str):
+        self.db = db
+        self.fmt = fmt
+        self.lines = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # первые USERS_IMPORT_MAX_ERRORS: (номер строки, причина)
+
+    async def run(self, file: File, on_progress=None):
+        with SpooledTemporaryFile(max_size=USERS_EXPORT_SPOOL_SIZE) as buffer:
+            await file.download_to_memory(out=buffer)
+            buffer.seek(0)
+            stream = io.TextIOWrapper(buffer, encoding='utf-8-sig', errors='replace', newline='')
+            try:
+                await self._import(stream, on_progress)
+            finally:
+                stream.detach()
+
+    async def _import(self, stream, on_progress):
+        chunk = []
+        reported_at = time.monotonic()
+        for line_number, username, status in self._records(stream):
+            chunk.append((username, status))
+            if len(chunk) < USERS_IMPORT_CHUNK:
+                continue
+
+            await self._write(chunk)
+            chunk = []
+            if on_progress and time.monotonic() - reported_at >= USERS_IMPORT_PROGRESS_INTERVAL:
+                reported_at = time.monotonic()
+                await on_progress(self.progress_text())
+
+        if chunk:
+            await self._write(chunk)
+
+    # Повторы username внутри чанка схлопываются до последней строки, как
+    # при построчной записи: в историю статусов и в сброс страниц списка не
+    # попадают промежуточные статусы
+    async def _write(self, chunk: list):
+        rows = list(dict(chunk).items())
+        await self.db.add_users(rows)
+        self.imported += len(rows)
+
+    def _records(self, stream):
+        if self.fmt == 'csv':
+            reader = csv.reader(stream)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = enumerate(stream, 1)
+
+        for line_number, row in rows:
+            self.lines = line_number
+            try:
+                fields = self._fields(row)
+            except ValueError as e:
+                self._error(line_number, str(e))
+                continue
+            if fields is None:
+                continue
+
+            username, status = fields
+            match = USERNAME_PATTERN.match(username.strip())
+            status = status.strip().lower()
+            if not match:
+                self._error(line_number, f"неверный username: {username[:64]}")
+            elif status not in IMPORT_STATUSES:
+                self._error(line_number, f"неизвестный статус: {status[:32]}")
+            else:
+                yield line_number, match.group(1).lower(), status
+
+    # Возвращает (username, status) или None для пустой строки и заголовка CSV
+    def _fields(self, row) -> Optional[tuple]:
+        if self.fmt == 'csv':
+            if not any(field.strip() for field in row):
+                return None
+            if len(row) != 2:
+                raise ValueError("ожидается два столбца: username,status")
+            if row[0].strip().lower() == 'username' and row[1].strip().lower() == 'status':
+                return None
+            return row[0], row[1]
+
+        if not row.strip():
+            return None
+        try:
+            record = json.loads(row)
+        except json.JSONDecodeError:
+            raise ValueError("некорректный JSON")
+        if not isinstance(record, dict) or not isinstance(record.get('username'), str) \
+                or not isinstance(record.get('status'), str):
+            raise ValueError("ожидается объект с полями username и status")
+        return record['username'], record['status']
+
+    def _error(self, line_number: int, reason: str):
+        self.error_count += 1
+        if len(self.errors) < USERS_IMPORT_MAX_ERRORS:
+            self.errors.append((line_number, reason))
+
+    def progress_text(self) -> str:
+        return (
+            f"⏳ Импорт пользователей...\n"
+            f"📄 Обработано строк: {self.lines}\n"
+            f"✅ Записано: {self.imported} | ❌ Ошибок: {self.error_count}"
+        )
+
+    def summary_text(self) -> str:
+        message = (
+            f"📥 Импорт завершён:\n"
+            f"📄 Обработано строк: {self.lines}\n"
+            f"✅ Записано: {self.imported}\n"
+            f"❌ Ошибок: {self.error_count}"
+        )
+        if self.errors:
+            message += "\n\n" + "\n".join(f"Строка {line}: {reason}" for line, reason in self.errors)
+            if self.error_count > len(self.errors):
+                message += f"\n…и ещё {self.error_count - len(self.errors)}"
+        return message
+
+
+# Выгрузка списка keyset-запросами по username прямо в буфер: строки
+# не собираются в список, большой файл уходит во временный файл на диске
+async def export_users(db: Database, fmt: str) -> SpooledTemporaryFile:
+    buffer = SpooledTemporaryFile(max_size=USERS_EXPORT_SPOOL_SIZE)
+    stream = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(('username', 'status'))
+
+    after = ''
+    while True:
+        rows = await db.export_users(after, USERS_EXPORT_CHUNK)
+        if not rows:
+            break
+        for username, status in rows:
+            if writer:
+                writer.writerow((username, status))
+            else:
+                stream.write(json.dumps({'username': username, 'status': status}, ensure_ascii=False) + '\n')
+        after = rows[-1][0]
+
+    stream.flush()
+    stream.detach()
+    buffer.seek(0)
+    return buffer
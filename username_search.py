@@ -0,0 +1,189 @@
+from config import USERNAME_SUGGESTIONS
+from database import Database
+
+# Похожие по написанию символы сводятся к одному, чтобы l/1, o/0 и т.п.
+# считались совпадением, а не опечаткой
+LOOKALIKES = str.maketrans({
+    '0': 'o',
+    '1': 'l',
+    'i': 'l',
+    '3': 'e',
+    '4': 'a',
+    '5': 's',
+    '7': 't',
+    '8': 'b'
+})
+
+
+def fold(username: str) -> str:
+    return username.lower().translate(LOOKALIKES)
+
+
+# Индекс для подсказок "возможно, вы имели в виду". Имя (после fold) делится
+# на части по три символа, и для каждой части кладётся ключ: длина + имя без
+# этой части. У строки на расстоянии Дамерау-Левенштейна не больше 1 правка
+# задевает одну часть, остальные совпадают с кусками запроса - кандидаты
+# находятся парой десятков обращений к словарю, без перебора всех имён, а
+# корзины остаются маленькими даже у имён с общим префиксом вроде shop123.
+# Индекс обновляется слушателем изменений users.
+class UsernameIndex:
+    def __init__(self, db: Database, limit: int = USERNAME_SUGGESTIONS):
+        self.db = db
+        self.limit = limit
+        self._buckets = {}  # ключ -> username или set(username)
+
+        for username in db.status_index:
+            self.add(username)
+        for username in db.admin_usernames:
+            self.add(username)
+
+        db.add_listener(self.on_users_changed)
+
+    def on_users_changed(self, changes: list):
+        for username, old_status, new_status in changes:
+            if old_status is None and new_status is not None:
+                self.add(username)
+            elif new_status is None and username not in self.db.admin_usernames:
+                self.remove(username)
+
+    def add(self, username: str):
+        for key in _keys(fold(username)):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = username
+            elif isinstance(bucket, set):
+                bucket.add(username)
+            elif bucket != username:
+                self._buckets[key] = {bucket, username}
+
+    def remove(self, username: str):
+        for key in _keys(fold(username)):
+            bucket = self._buckets.get(key)
+            if bucket == username:
+                del self._buckets[key]
+            elif isinstance(bucket, set):
+                bucket.discard(username)
+                if len(bucket) == 1:
+                    self._buckets[key] = bucket.pop()
+
+    # Ближайшие имена: [(username, status)]. Сначала совпадения с точностью
+    # до похожих символов, затем одна правка без учёта похожих символов
+    def suggest(self, query: str) -> list:
+        query = query.lower()
+        folded = fold(query)
+        candidates = set()
+        for key in _query_keys(folded):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, set):
+                candidates.update(bucket)
+            else:
+                candidates.add(bucket)
+        candidates.discard(query)
+
+        matches = []
+        for username in candidates:
+            folded_username = fold(username)
+            if _within_one(folded, folded_username):
+                matches.append((folded_username != folded, not _within_one(query, username), username))
+        matches.sort()
+        return [(username, self.db.lookup_status(username)) for _, _, username in matches[:self.limit]]
+
+
+# Обратная задача для кэша ответов: по изменённому имени найти запросы,
+# в подсказках к которым оно есть или могло бы появиться. Запросы лежат под
+# теми же ключами, по которым UsernameIndex.suggest ищет имена, поэтому
+# соседей имени находит поиск по ключам самого имени.
+class QueryNeighbours:
+    def __init__(self, queries=()):
+        self._buckets = {}  # ключ -> set(запрос)
+        self._queries = set()
+        for query in queries:
+            self.add(query)
+
+    def add(self, query: str):
+        if query in self._queries:
+            return
+        self._queries.add(query)
+        for key in _query_keys(fold(query)):
+            self._buckets.setdefault(key, set()).add(query)
+
+    def discard(self, query: str):
+        if query not in self._queries:
+            return
+        self._queries.discard(query)
+        for key in _query_keys(fold(query)):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(query)
+                if not bucket:
+                    del self._buckets[key]
+
+    # Запросы на расстоянии не больше одной правки от имени (после fold)
+    def near(self, username: str) -> list:
+        folded = fold(username)
+        candidates = set()
+        for key in _keys(folded):
+            candidates.update(self._buckets.get(key, ()))
+        return [query for query in candidates if _within_one(fold(query), folded)]
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+
+# Границы частей: по 3 символа на часть, но не меньше двух частей
+def _bounds(length: int) -> list:
+    pieces = max(2, (length + 2) // 3)
+    return [length * piece // pieces for piece in range(pieces + 1)]
+
+
+# Ключ - длина имени и всё имя, кроме части [start:end]. Хранится только
+# hash строки ключа, без самой строки; коллизии отсеет проверка кандидатов
+def _piece_keys(folded: str, length: int) -> list:
+    bounds = _bounds(length)
+    tail = len(folded) - length
+    return [
+        hash(f"{length}|{folded[:start]}|{folded[end + tail:]}")
+        for start, end in zip(bounds, bounds[1:])
+    ]
+
+
+def _keys(folded: str) -> list:
+    return _piece_keys(folded, len(folded))
+
+
+# Ключи всех имён длиной len(query) +- 1, которые могут быть на расстоянии 1.
+# Части до правки совпадают с началом запроса, после неё - с концом:
+# вставка и удаление сдвигают только то, что идёт после правки.
+def _query_keys(folded: str) -> list:
+    size = len(folded)
+    keys = []
+    for length in (size - 1, size, size + 1):
+        if length > 0:
+            keys += _piece_keys(folded, length)
+
+    # Перестановка соседних символов на стыке частей задевает две из них
+    for boundary in _bounds(size)[1:-1]:
+        if 0 < boundary < size:
+            swapped = folded[:boundary - 1] + folded[boundary] + folded[boundary - 1] + folded[boundary + 1:]
+            keys.append(_keys(swapped)[0])
+    return keys
+
+
+# Не больше одной правки: замена, вставка, удаление или перестановка соседних
+def _within_one(a: str, b: str) -> bool:
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) != len(b):
+        return a[i:] == b[i + 1:]
+    if i >= len(a) - 1:
+        return True
+    return a[i + 1:] == b[i + 1:] or (a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+
@@ -0,0 +1,185 @@
+import hmac
+import json
+import secrets
+import time
+import signal
+import asyncio
+from typing import Optional
+from telegram import Update
+from telegram.ext import Application
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    HEALTH_PATH
+)
+
+MAX_BODY_SIZE = 1024 * 1024
+STATUS_TEXTS = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large'
+}
+
+
+# Минимальный HTTP/1.1 с keep-alive поверх asyncio: Telegram шлёт только
+# POST с JSON, а здоровье проверяется GET-запросом, так что веб-фреймворк
+# не нужен
+async def read_request(reader: asyncio.StreamReader) -> Optional[tuple]:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_SIZE:
+        return method, path.split('?', 1)[0], headers, None
+    body = await reader.readexactly(length)
+    return method, path.split('?', 1)[0], headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload: bytes = b'',
+                   content_type: str = 'application/json'):
+    writer.write(
+        f"HTTP/1.1 {status} {STATUS_TEXTS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload
+    )
+
+
+# Приём обновлений от Telegram: проверяет секретный токен из заголовка
+# X-Telegram-Bot-Api-Secret-Token и кладёт обновление в update_queue
+# приложения - дальше работают те же обработчики, что и при polling.
+# Без токена в конфиге он генерируется при запуске: set_webhook каждый раз
+# регистрирует текущий, а запросы без него не принимаются никогда
+class WebhookServer:
+    def __init__(self, application: Application, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, secret_token: str = WEBHOOK_SECRET_TOKEN):
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token or secrets.token_urlsafe(32)
+        self.started_at = time.monotonic()
+        self._server = None
+
+        # Счётчики для /health
+        self.received = 0
+        self.rejected = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.listen, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started_at = time.monotonic()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                status, payload = await self._handle(*request)
+                write_response(writer, status, payload)
+                await writer.drain()
+                if status == 413:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, method: str, path: str, headers: dict, body: Optional[bytes]) -> tuple:
+        if path == HEALTH_PATH:
+            return 200, json.dumps(self.health()).encode()
+        if path != self.path:
+            return 404, b''
+        if method != 'POST':
+            return 405, b''
+
+        secret = headers.get('x-telegram-bot-api-secret-token', '')
+        if not hmac.compare_digest(secret.encode(), self.secret_token.encode()):
+            self.rejected += 1
+            return 403, b''
+        if body is None:
+            return 413, b''
+        return await self.deliver(body), b''
+
+    # Передача проверенного тела запроса обработчикам; возвращает HTTP-статус
+    async def deliver(self, body: bytes) -> int:
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Некорректное обновление в webhook: {e}")
+            return 400
+
+        self.received += 1
+        await self.application.update_queue.put(update)
+        return 200
+
+    def health(self) -> dict:
+        return {
+            'status': 'ok' if self.application.running else 'starting',
+            'uptime': int(time.monotonic() - self.started_at),
+            'received': self.received,
+            'rejected': self.rejected,
+            'update_queue': self.application.update_queue.qsize()
+        }
+
+
+# Тот же порядок остановки, что в run_polling
+async def stop_application(application: Application):
+    if application.running:
+        await application.stop()
+    if application.post_stop:
+        await application.post_stop(application)
+    await application.shutdown()
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+
+
+# Замена run_polling для режима webhook: тот же порядок инициализации и
+# остановки приложения (post_init, post_stop, post_shutdown)
+async def run_webhook(application: Application, webhook_url: str = WEBHOOK_URL):
+    server = WebhookServer(application)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip('/') + server.path,
+            secret_token=server.secret_token,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES
+        )
+        await application.start()
+        await server.start()
+        print(f"Webhook слушает {server.listen}:{server.port}{server.path}")
+        await stop.wait()
+    finally:
+        await server.stop()
+        await stop_application(application)